@@ -10,6 +10,7 @@ Mejoras:
 
 import os
 import logging
+import click
 from logging.handlers import RotatingFileHandler
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
@@ -238,6 +239,118 @@ def register_cli_commands(app):
         except Exception as e:
             click.secho(f"Error al realizar la importación: {str(e)}", err=True, fg='red')
 
+    @app.cli.command("reconstruir-resumenes")
+    def reconstruir_resumenes_cmd():
+        """Reconstruye las tablas de resumen de producción desde los cortes."""
+        import click
+        from app.reportes.mantenimiento import reconstruir_resumenes
+        
+        try:
+            reconstruir_resumenes()
+            click.secho("Tablas de resumen reconstruidas correctamente", fg='green')
+        except Exception as e:
+            db.session.rollback()
+            click.secho(f"Error al reconstruir resúmenes: {str(e)}", err=True, fg='red')
+
+    @app.cli.command("ajustar-curvas")
+    @click.option('--forzar', is_flag=True, help='Ajustar también los modelos vigentes')
+    def ajustar_curvas_cmd(forzar):
+        """Ajusta los modelos de curva de producción de las variedades con siembras."""
+        from app.models import Siembra
+        from app.reportes.modelos_curva import obtener_modelos
+
+        try:
+            variedad_ids = [v for v, in db.session.query(Siembra.variedad_id).distinct()]
+            curvas = obtener_modelos(variedad_ids, forzar=forzar, guardar=True)
+            con_modelo = sum(1 for curva in curvas.values() if curva.tck is not None)
+            click.secho(f"Modelos de curva vigentes: {con_modelo} de {len(curvas)} variedades", fg='green')
+        except Exception as e:
+            db.session.rollback()
+            click.secho(f"Error al ajustar curvas: {str(e)}", err=True, fg='red')
+
+    @app.cli.command("pronostico")
+    @click.option('--semanas', default=None, type=int, help='Semanas a pronosticar (incluida la actual)')
+    @click.option('--agrupar', default='flor', type=click.Choice(['bloque', 'variedad', 'flor']),
+                  help='Agrupación de los totales')
+    def pronostico_cmd(semanas, agrupar):
+        """Pronostica los tallos de las siembras activas para las próximas semanas."""
+        import time
+        from app.reportes.pronostico import pronosticar, agrupar_pronostico
+
+        inicio = time.perf_counter()
+        datos = pronosticar(semanas)
+        duracion = time.perf_counter() - inicio
+
+        etiquetas = [s['semana'] for s in datos['semanas']]
+        click.echo(f"{agrupar.capitalize():<20}" + ''.join(f"{e:>10}" for e in etiquetas) + f"{'Total':>12}")
+        for grupo in agrupar_pronostico(datos, agrupar):
+            click.echo(f"{str(grupo[agrupar])[:20]:<20}" + ''.join(f"{t:>10}" for t in grupo['tallos'])
+                       + f"{grupo['total']:>12}")
+        click.echo(f"{'Total':<20}" + ''.join(f"{t:>10}" for t in datos['totales_semana'])
+                   + f"{sum(datos['totales_semana']):>12}")
+        click.secho(
+            f"{datos['siembras_activas']} siembras activas "
+            f"({datos['siembras_sin_curva']} sin curva) en {duracion:.2f} s",
+            fg='green'
+        )
+
+    @app.cli.command("warm-reports")
+    @click.option('--hilos', default=None, type=int, help='Hilos para calcular las curvas')
+    def warm_reports_cmd(hilos):
+        """Precalcula curvas, días de producción y resúmenes para dejar calientes las cachés."""
+        import time
+        from app.reportes.precalculo import calentar_reportes
+
+        inicio = time.perf_counter()
+        try:
+            with click.progressbar(length=1, label='Precalculando reportes', show_pos=True) as barra:
+                def progreso(pasos, total, etiqueta):
+                    barra.length = total
+                    barra.update(pasos)
+
+                resumen = calentar_reportes(hilos=hilos, progreso=progreso)
+        except Exception as e:
+            db.session.rollback()
+            click.secho(f"Error al precalcular reportes: {str(e)}", err=True, fg='red')
+            return
+
+        trabajos = ', '.join(f"{tipo}: {estado}" for tipo, estado in resumen['trabajos'].items())
+        click.secho(
+            f"{resumen['variedades']} variedades, {resumen['graficos']} gráficos en caché "
+            f"({resumen['procesos']} procesos de renderizado), trabajos [{trabajos}] "
+            f"en {time.perf_counter() - inicio:.1f} s",
+            fg='green'
+        )
+
+    @app.cli.command("benchmark-dashboard")
+    @click.option('--cortes', 'tamanos', multiple=True, type=int, default=(10000, 100000, 1000000),
+                  show_default=True, help='Cortes de los datos sintéticos (se puede repetir)')
+    @click.option('--repeticiones', default=3, type=int, show_default=True, help='Mediciones por paso')
+    def benchmark_dashboard_cmd(tamanos, repeticiones):
+        """Mide la latencia del dashboard en la base de datos actual y con datos sintéticos."""
+        from app.main.dashboard_benchmark import medir_base_datos, medir_sintetico
+
+        try:
+            actual = medir_base_datos(repeticiones)
+        except Exception as e:
+            db.session.rollback()
+            click.secho(f"Error al medir la base de datos: {str(e)}", err=True, fg='red')
+        else:
+            click.secho(f"Base de datos actual: {actual['cortes']:,} cortes, {actual['filas']:,} siembras", bold=True)
+            click.echo(
+                f"  consulta {actual['consulta_ms']:.1f} ms | estadísticas {actual['estadisticas_ms']:.1f} ms | "
+                f"agregación {actual['agregacion_ms']:.1f} ms | gráficos {actual['graficos_ms']:.1f} ms"
+            )
+
+        click.secho("Datos sintéticos (agregación y gráficos):", bold=True)
+        click.echo(f"  {'cortes':>10} {'siembras':>9} {'agregación':>11} {'render':>9} {'en caché':>9}")
+        for num_cortes in tamanos:
+            r = medir_sintetico(num_cortes, repeticiones)
+            click.echo(
+                f"  {r['cortes']:>10,} {r['filas']:>9,} {r['agregacion_ms']:>8.1f} ms "
+                f"{r['graficos_render_ms']:>6.0f} ms {r['graficos_cache_ms']:>6.2f} ms"
+            )
+
 def configure_logging(app):
     """Configura el sistema de logging de la aplicación."""
     if not app.debug and not app.testing:
@@ -262,5 +375,6 @@ from app.models import (
     Documento, Rol, Permiso, Usuario, Bloque, Cama, Lado, BloqueCamaLado,
     Flor, Color, FlorColor, Variedad, Area, Densidad, Siembra, Corte,
     TipoLabor, LaborCultural, CausaPerdida, Perdida,
-    VistaProduccionAcumulada, VistaProduccionPorDia
+    VistaProduccionAcumulada, VistaProduccionPorDia, AcumuladoCurva,
+    ResumenCalidadVariedad, ModeloCurva, ResumenSemanal, VersionDatos, TrabajoReporte
 )
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Medición de la latencia del dashboard.
+
+`flask benchmark-dashboard` mide por separado las dos partes de la vista:
+
+- Consulta, estadísticas, agregación y gráficos sobre la base de datos
+  configurada, sin filtros (solo lectura).
+- Agregación y gráficos sobre filas sintéticas con el formato de
+  get_filtered_data para distintos números de cortes (10k, 100k y 1M por
+  defecto), sin tocar la base de datos ni la caché de gráficos.
+"""
+
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from app import db
+from app.models import Corte
+from app.reportes.cache_graficos import clave_grafico, claves_graficos
+from .dashboard_utils import (
+    get_filtered_data, calculate_statistics, aggregate_chart_data,
+    variety_chart_job, block_chart_job, flower_chart_job
+)
+
+# Cortes promedio por siembra de los datos sintéticos
+CORTES_POR_SIEMBRA = 8
+
+# Mismas columnas que las filas de get_filtered_data
+FilaDashboard = namedtuple('FilaDashboard', [
+    'siembra_id', 'fecha_siembra', 'estado', 'variedad_id', 'variedad', 'flor', 'color',
+    'bloque', 'total_cortes', 'total_tallos', 'area', 'densidad'
+])
+
+def filas_sinteticas(num_cortes, semilla=0, variedades=150, bloques=40, flores=6):
+    """
+    Filas por siembra con el formato de get_filtered_data para `num_cortes` cortes.
+
+    Returns:
+        Lista de FilaDashboard (una por siembra)
+    """
+    rng = np.random.default_rng(semilla)
+    n = max(1, num_cortes // CORTES_POR_SIEMBRA)
+    variedad = rng.integers(0, variedades, n)
+    bloque = rng.integers(1, bloques + 1, n)
+    cortes = rng.integers(1, 2 * CORTES_POR_SIEMBRA, n)
+    tallos = cortes * rng.integers(20, 300, n)
+    area = rng.choice([30.0, 45.5, 60.0], n)
+    densidad = rng.choice([60.0, 75.5, 90.0], n)
+    dias = rng.integers(0, 1500, n)
+    base = date(2021, 1, 4)
+
+    return [
+        FilaDashboard(
+            i + 1, base + timedelta(days=int(dias[i])), 'Activa' if dias[i] > 1300 else 'Finalizada',
+            int(variedad[i]) + 1, f'VARIEDAD {variedad[i]:03d}', f'FLOR {variedad[i] % flores}', 'ROJO',
+            f'{bloque[i]:02d}', int(cortes[i]), int(tallos[i]), float(area[i]), float(densidad[i])
+        )
+        for i in range(n)
+    ]
+
+def _medir(funcion, repeticiones):
+    """Mediana en milisegundos de `repeticiones` llamadas, y el último resultado."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tiempos)), resultado
+
+def _trabajos_graficos(aggregates):
+    """Trabajos (función, args) de los tres gráficos del dashboard."""
+    trabajos = {
+        'variedad': variety_chart_job(aggregates, None),
+        'bloque': block_chart_job(aggregates, None),
+        'flor': flower_chart_job(aggregates, None)
+    }
+    return {clave: trabajo for clave, trabajo in trabajos.items() if trabajo}
+
+def medir_sintetico(num_cortes, repeticiones=3):
+    """
+    Latencia de agregación y gráficos para filas sintéticas de `num_cortes` cortes.
+
+    Returns:
+        dict con filas, agregacion_ms, graficos_render_ms (sin caché) y
+        graficos_cache_ms (hash de contenido, lo que cuesta un acierto de caché)
+    """
+    filas = filas_sinteticas(num_cortes)
+    agregacion_ms, aggregates = _medir(lambda: aggregate_chart_data(filas), repeticiones)
+    trabajos = _trabajos_graficos(aggregates)
+
+    render_ms, _ = _medir(
+        lambda: [funcion(*args) for funcion, args in trabajos.values()], 1
+    )
+    cache_ms, _ = _medir(
+        lambda: [clave_grafico(funcion, args) for funcion, args in trabajos.values()], repeticiones
+    )
+    return {
+        'cortes': num_cortes,
+        'filas': len(filas),
+        'agregacion_ms': agregacion_ms,
+        'graficos_render_ms': render_ms,
+        'graficos_cache_ms': cache_ms
+    }
+
+def medir_base_datos(repeticiones=3):
+    """
+    Latencia de cada paso del dashboard sin filtros sobre la base de datos actual.
+
+    Returns:
+        dict con cortes, filas y el tiempo de consulta, estadísticas,
+        agregación y gráficos (estos últimos desde la caché de gráficos)
+    """
+    ahora = datetime.now()
+    filters = {'time': 'todo', 'year': ahora.year, 'month': ahora.month, 'week': None, 'variety_id': None}
+
+    consulta_ms, raw_data = _medir(lambda: get_filtered_data(filters), repeticiones)
+    estadisticas_ms, _ = _medir(lambda: calculate_statistics(filters, None), repeticiones)
+    agregacion_ms, aggregates = _medir(lambda: aggregate_chart_data(raw_data), repeticiones)
+    graficos_ms, _ = _medir(lambda: claves_graficos(_trabajos_graficos(aggregates)), repeticiones)
+
+    return {
+        'cortes': db.session.query(func.count(Corte.corte_id)).scalar() or 0,
+        'filas': len(raw_data),
+        'consulta_ms': consulta_ms,
+        'estadisticas_ms': estadisticas_ms,
+        'agregacion_ms': agregacion_ms,
+        'graficos_ms': graficos_ms
+    }
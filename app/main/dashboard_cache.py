@@ -0,0 +1,181 @@
+"""
+Caché de los datos del dashboard por combinación de filtros.
+
+Cada entrada guarda las estadísticas y la agregación de gráficos de una
+combinación normalizada de filtros (periodo, año, mes, semana, variedad).
+La clave incluye la versión de datos de mantenimiento.version_datos, que
+avanza en la misma transacción de cualquier escritura de siembras, cortes,
+pérdidas o catálogos; una escritura deja así sin uso las entradas anteriores
+en todos los procesos sin necesidad de avisarles.
+
+Almacenes según CACHE_TYPE:
+- 'SimpleCache' (por defecto): diccionario en memoria de cada proceso.
+- 'FileSystemCache': archivos en CACHE_DIR, compartidos entre los workers.
+- 'NullCache': sin caché.
+
+Las entradas caducan tras CACHE_DEFAULT_TIMEOUT segundos y cada almacén
+guarda como máximo CACHE_THRESHOLD entradas (se descartan las más antiguas).
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from app.reportes.mantenimiento import version_datos
+from app.reportes.utils import get_config_value
+from .dashboard_utils import filter_period
+
+CACHE_TYPE = 'SimpleCache'
+CACHE_DEFAULT_TIMEOUT = 300  # segundos
+CACHE_THRESHOLD = 500
+CACHE_DIR = os.path.join('uploads', 'cache_dashboard')
+
+def normalize_filters(filters):
+    """
+    Clave de caché de unos filtros del dashboard.
+
+    Solo se conservan los campos que usa el periodo elegido, de modo que
+    filtros equivalentes (p. ej. 'todo' con distinto mes) comparten entrada.
+
+    Returns:
+        Tupla (periodo, año, mes, semana, variedad_id)
+    """
+    periodo = filter_period(filters)
+    return (
+        periodo,
+        filters['year'] if periodo != 'todo' else None,
+        filters['month'] if periodo == 'month' else None,
+        filters['week'] if periodo == 'week' else None,
+        filters['variety_id'] or None
+    )
+
+# ================ ALMACENES ================
+
+class _MemoryStore:
+    """Entradas en un diccionario del proceso: {clave: (caducidad, valor)}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = {}
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.time():
+                del self._entradas[clave]
+                return None
+            return entrada[1]
+
+    def set(self, clave, valor, timeout):
+        with self._lock:
+            self._entradas.pop(clave, None)
+            # El diccionario conserva el orden de inserción: las primeras son las más antiguas
+            while self._entradas and len(self._entradas) >= get_config_value('CACHE_THRESHOLD', CACHE_THRESHOLD):
+                del self._entradas[next(iter(self._entradas))]
+            self._entradas[clave] = (time.time() + timeout, valor)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+class _FileStore:
+    """Entradas como archivos pickle en un directorio compartido entre procesos."""
+
+    def _directorio(self):
+        directorio = os.path.abspath(get_config_value('CACHE_DIR', CACHE_DIR))
+        os.makedirs(directorio, exist_ok=True)
+        return directorio
+
+    def _ruta(self, clave):
+        nombre = hashlib.sha256(repr(clave).encode('utf-8')).hexdigest()
+        return os.path.join(self._directorio(), f'{nombre}.pkl')
+
+    def get(self, clave):
+        try:
+            with open(self._ruta(clave), 'rb') as archivo:
+                caducidad, guardada, valor = pickle.load(archivo)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        # La clave guardada descarta colisiones de nombre
+        return valor if guardada == clave and caducidad >= time.time() else None
+
+    def set(self, clave, valor, timeout):
+        directorio = self._directorio()
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as archivo:
+            pickle.dump((time.time() + timeout, clave, valor), archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, self._ruta(clave))
+        self._podar(directorio)
+
+    def _podar(self, directorio):
+        """Elimina las entradas más antiguas por encima del límite."""
+        archivos = []
+        with os.scandir(directorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith('.pkl'):
+                    try:
+                        archivos.append((entrada.stat().st_mtime, entrada.path))
+                    except FileNotFoundError:
+                        pass
+        sobrantes = len(archivos) - get_config_value('CACHE_THRESHOLD', CACHE_THRESHOLD)
+        for _, ruta in sorted(archivos)[:max(sobrantes, 0)]:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        directorio = self._directorio()
+        for nombre in os.listdir(directorio):
+            if nombre.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(directorio, nombre))
+                except FileNotFoundError:
+                    pass
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+def _store():
+    """Almacén configurado por CACHE_TYPE (None si la caché está desactivada)."""
+    tipo = get_config_value('CACHE_TYPE', CACHE_TYPE)
+    if tipo == 'NullCache':
+        return None
+    with _almacenes_lock:
+        if tipo not in _almacenes:
+            _almacenes[tipo] = _FileStore() if tipo == 'FileSystemCache' else _MemoryStore()
+        return _almacenes[tipo]
+
+# ================ API ================
+
+def cached_dashboard_data(filters, calcular):
+    """
+    Datos del dashboard para unos filtros, desde la caché si la versión de datos no cambió.
+
+    Args:
+        filters: Filtros del dashboard
+        calcular: Función sin argumentos que calcula el valor (debe poder serializarse)
+
+    Returns:
+        Valor guardado o recién calculado
+    """
+    almacen = _store()
+    if almacen is None:
+        return calcular()
+
+    clave = (version_datos(),) + normalize_filters(filters)
+    valor = almacen.get(clave)
+    if valor is None:
+        valor = calcular()
+        almacen.set(clave, valor, get_config_value('CACHE_DEFAULT_TIMEOUT', CACHE_DEFAULT_TIMEOUT))
+    return valor
+
+def clear_dashboard_cache():
+    """Vacía la caché del dashboard del almacén configurado."""
+    almacen = _store()
+    if almacen is not None:
+        almacen.clear()
@@ -1,8 +1,53 @@
-from sqlalchemy import func, extract, and_, desc
-from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, desc, case
 from app import db
 from app.models import Siembra, Corte, Variedad, Area, Densidad, Flor, Color, Bloque, BloqueCamaLado, FlorColor
-from app.utils.data_utils import safe_int, safe_float
+from app.utils.calendario import en_rango, rango_anio, rango_mes, rango_semana
+from app.reportes.cache_graficos import url_grafico
+from app.reportes.charts import generar_grafico_barras
+from app.reportes.utils import get_config_value
+
+# Variedades del gráfico de aprovechamiento por variedad
+DASHBOARD_TOP_VARIEDADES = 5
+
+# Periodos del formulario del dashboard y su equivalente interno
+TIME_FILTERS = {
+    'todo': 'todo',
+    'anio': 'year', 'year': 'year',
+    'mes': 'month', 'month': 'month',
+    'semana': 'week', 'week': 'week'
+}
+
+def filter_period(filters):
+    """
+    Periodo interno ('todo', 'year', 'month' o 'week') de los filtros.
+
+    Un año, mes o semana fuera de rango equivale a no filtrar por tiempo.
+    """
+    period = TIME_FILTERS.get(filters['time'], 'todo')
+    if period != 'todo' and not 1 <= (filters['year'] or 0) <= 9998:
+        return 'todo'
+    if period == 'month' and not 1 <= (filters['month'] or 0) <= 12:
+        return 'todo'
+    if period == 'week' and not 1 <= (filters['week'] or 0) <= 53:
+        return 'todo'
+    return period
+
+def apply_filters(query, filters):
+    """Aplica a una consulta sobre siembras los filtros de variedad y tiempo del dashboard."""
+    if filters['variety_id']:
+        query = query.filter(Siembra.variedad_id == filters['variety_id'])
+    
+    period = filter_period(filters)
+    if period == 'year':
+        query = query.filter(en_rango(Siembra.fecha_siembra, rango_anio(filters['year'])))
+    elif period == 'month':
+        query = query.filter(en_rango(Siembra.fecha_siembra, rango_mes(filters['year'], filters['month'])))
+    elif period == 'week':
+        query = query.filter(en_rango(Siembra.fecha_siembra, rango_semana(filters['year'], filters['week'])))
+    
+    return query
 
 def get_filtered_data(filters):
     """Obtiene datos filtrados según los parámetros"""
@@ -39,77 +84,179 @@ def get_filtered_data(filters):
         Corte, Siembra.siembra_id == Corte.siembra_id
     )
     
-    # Aplicar filtros
-    if filters['variety_id']:
-        query = query.filter(Variedad.variedad_id == filters['variety_id'])
-    
-    if filters['time'] == 'year':
-        query = query.filter(extract('year', Siembra.fecha_siembra) == filters['year'])
-    elif filters['time'] == 'month':
-        query = query.filter(
-            and_(
-                extract('year', Siembra.fecha_siembra) == filters['year'],
-                extract('month', Siembra.fecha_siembra) == filters['month']
-            )
-        )
-    elif filters['time'] == 'week' and filters['week']:
-        start_date = datetime.strptime(f"{filters['year']}-W{filters['week']}-1", '%Y-W%W-%w')
-        end_date = start_date + timedelta(days=6)
-        query = query.filter(Siembra.fecha_siembra.between(start_date, end_date))
-    
-    query = query.group_by(
+    query = apply_filters(query, filters).group_by(
         Siembra.siembra_id, Variedad.variedad_id, Flor.flor_id, 
         Color.color_id, Bloque.bloque_id, Area.area_id, Densidad.densidad_id
     ).order_by(desc('total_tallos'))
     
-    selected_variety = Variedad.query.get(filters['variety_id']) if filters['variety_id'] else None
-    return query.all(), selected_variety
-
-def calculate_statistics(filters, raw_data, selected_variety):
-    """Calcula las estadísticas principales del dashboard"""
-    # Consultas básicas
-    active_plantings = Siembra.query.filter_by(estado='Activa').count()
-    historical_plantings = Siembra.query.filter_by(estado='Finalizada').count()
+    return query.all()
+
+def calculate_statistics(filters, selected_variety):
+    """
+    Calcula las estadísticas principales del dashboard en una sola consulta.
+
+    Una subconsulta agrupa por siembra (con los filtros activos) sus cortes,
+    tallos y plantas; la consulta externa obtiene con agregados condicionales
+    los conteos por estado, variedades, cortes, tallos y plantas.
+    """
+    por_siembra = apply_filters(
+        db.session.query(
+            Siembra.siembra_id,
+            Siembra.estado,
+            Siembra.variedad_id,
+            (Area.area * Densidad.valor).label('plantas'),
+            func.count(Corte.corte_id).label('cortes'),
+            func.coalesce(func.sum(Corte.cantidad_tallos), 0).label('tallos')
+        ).join(
+            Area, Siembra.area_id == Area.area_id
+        ).join(
+            Densidad, Siembra.densidad_id == Densidad.densidad_id
+        ).outerjoin(
+            Corte, Siembra.siembra_id == Corte.siembra_id
+        ),
+        filters
+    ).group_by(
+        Siembra.siembra_id, Siembra.estado, Siembra.variedad_id, Area.area, Densidad.valor
+    ).subquery()
+
+    totals = db.session.query(
+        func.coalesce(func.sum(case((por_siembra.c.estado == 'Activa', 1), else_=0)), 0).label('active'),
+        func.coalesce(func.sum(case((por_siembra.c.estado == 'Finalizada', 1), else_=0)), 0).label('historical'),
+        func.count(func.distinct(por_siembra.c.variedad_id)).label('varieties'),
+        func.coalesce(func.sum(por_siembra.c.cortes), 0).label('cuts'),
+        func.coalesce(func.sum(por_siembra.c.tallos), 0).label('stems'),
+        func.coalesce(func.sum(por_siembra.c.plantas), 0).label('plants')
+    ).one()
+
+    active_plantings = int(totals.active)
+    historical_plantings = int(totals.historical)
     total_plantings = active_plantings + historical_plantings
-    total_varieties = Variedad.query.count()
-    
-    # Calcular promedio de cortes
-    total_cuts = Corte.query.count()
-    avg_cuts = round(total_cuts / total_plantings, 1) if total_plantings > 0 else 0
-    
-    # Calcular tallos totales
-    total_stems = sum(safe_int(row.total_tallos) for row in raw_data)
-    
-    # Calcular plantas totales
-    total_plants = sum(safe_float(row.area) * safe_float(row.densidad) for row in raw_data if row.area and row.densidad)
-    
-    # Calcular índice de aprovechamiento
-    utilization_index = round((total_stems / total_plants) * 100, 2) if total_plants > 0 else 0
+    total_stems = int(totals.stems)
+    total_plants = float(totals.plants)
     
     return {
         'active_plantings': active_plantings,
         'historical_plantings': historical_plantings,
         'total_plantings': total_plantings,
-        'total_varieties': total_varieties,
-        'avg_cuts': avg_cuts,
-        'utilization_index': utilization_index,
+        'total_varieties': int(totals.varieties),
+        'avg_cuts': round(int(totals.cuts) / total_plantings, 1) if total_plantings > 0 else 0,
+        'utilization_index': round((total_stems / total_plants) * 100, 2) if total_plants > 0 else 0,
         'total_stems': total_stems,
         'filters': filters,
         'selected_variety': selected_variety
     }
 
-def generate_variety_chart(raw_data, selected_variety):
+# ================ GRÁFICOS ================
+
+def aggregate_chart_data(raw_data):
+    """
+    Agrega en una sola pasada las filas de get_filtered_data por variedad,
+    bloque y flor, para los tres gráficos del dashboard.
+
+    Tallos y plantas pasan una sola vez a arreglos NumPy y cada dimensión se
+    agrupa con pd.factorize y np.bincount sobre esos mismos arreglos. Solo
+    cuentan las siembras con plantas (área y densidad mayores que cero).
+
+    Returns:
+        dict {dimensión: {'etiquetas', 'tallos', 'plantas', 'indice'}} con
+        arreglos ordenados por etiqueta
+    """
+    posiciones = {campo: i for i, campo in enumerate(raw_data[0]._fields)} if raw_data else {}
+
+    def columna(campo):
+        i = posiciones.get(campo)
+        return [row[i] for row in raw_data]
+
+    tallos = np.nan_to_num(np.array(columna('total_tallos'), dtype=np.float64))
+    plantas = np.nan_to_num(
+        np.array(columna('area'), dtype=np.float64) * np.array(columna('densidad'), dtype=np.float64)
+    )
+    con_plantas = plantas > 0
+    tallos, plantas = tallos[con_plantas], plantas[con_plantas]
+
+    aggregates = {}
+    for dimension in ('variedad', 'bloque', 'flor'):
+        valores = np.array(columna(dimension), dtype=object)[con_plantas]
+        grupo, etiquetas = pd.factorize(valores, sort=True)
+        etiquetas = np.asarray(etiquetas, dtype=str)
+        tallos_grupo = np.bincount(grupo, weights=tallos, minlength=len(etiquetas)).astype(np.float64)
+        plantas_grupo = np.bincount(grupo, weights=plantas, minlength=len(etiquetas)).astype(np.float64)
+        aggregates[dimension] = {
+            'etiquetas': etiquetas,
+            'tallos': tallos_grupo,
+            'plantas': plantas_grupo,
+            'indice': np.divide(tallos_grupo * 100, plantas_grupo,
+                                out=np.zeros_like(tallos_grupo), where=plantas_grupo > 0)
+        }
+    return aggregates
+
+def build_dashboard_data(filters):
+    """
+    Estadísticas y agregación de gráficos del dashboard para unos filtros.
+
+    El resultado no contiene objetos ORM, de modo que puede guardarse en la
+    caché del dashboard; la variedad seleccionada se añade en la vista.
+    """
+    raw_data = get_filtered_data(filters)
+    return {
+        'stats': calculate_statistics(filters, None),
+        'aggregates': aggregate_chart_data(raw_data)
+    }
+
+def _chart_job(datos, orden, xlabel, titulo, rotar_etiquetas=False):
+    """(función, args) del gráfico de barras de aprovechamiento, o None sin datos."""
+    if not len(orden):
+        return None
+    return generar_grafico_barras, (
+        [str(datos['etiquetas'][i]) for i in orden],
+        [round(float(datos['indice'][i]), 2) for i in orden],
+        xlabel, 'Aprovechamiento (%)', titulo, rotar_etiquetas
+    )
+
+def _chart_url(trabajo):
+    """URL del gráfico en la caché de gráficos (se renderiza solo si no existe)."""
+    return url_grafico(trabajo[0], *trabajo[1]) if trabajo else None
+
+def _title_suffix(selected_variety):
+    """Sufijo del título con la variedad filtrada, si la hay."""
+    return f' - {selected_variety.variedad}' if selected_variety else ''
+
+def variety_chart_job(aggregates, selected_variety):
+    """Gráfico de las variedades con mayor aprovechamiento."""
+    datos = aggregates['variedad']
+    top = get_config_value('DASHBOARD_TOP_VARIEDADES', DASHBOARD_TOP_VARIEDADES)
+    orden = np.argsort(-datos['indice'], kind='stable')[:top]
+    return _chart_job(
+        datos, orden, 'Variedad',
+        f'Top {top} Variedades por Aprovechamiento{_title_suffix(selected_variety)}',
+        rotar_etiquetas=True
+    )
+
+def block_chart_job(aggregates, selected_variety):
+    """Gráfico de aprovechamiento de cada bloque, en orden de bloque."""
+    datos = aggregates['bloque']
+    return _chart_job(
+        datos, np.arange(len(datos['etiquetas'])), 'Bloque',
+        f'Aprovechamiento por Bloque{_title_suffix(selected_variety)}',
+        rotar_etiquetas=len(datos['etiquetas']) > 15
+    )
+
+def flower_chart_job(aggregates, selected_variety):
+    """Gráfico de aprovechamiento por tipo de flor, de mayor a menor."""
+    datos = aggregates['flor']
+    return _chart_job(
+        datos, np.argsort(-datos['indice'], kind='stable'), 'Flor',
+        f'Aprovechamiento por Tipo de Flor{_title_suffix(selected_variety)}'
+    )
+
+def generate_variety_chart(aggregates, selected_variety):
     """Genera el gráfico de aprovechamiento por variedad"""
-    # Procesamiento de datos y generación de gráfico
-    # (Implementación similar a la original pero más modular)
-    pass
+    return _chart_url(variety_chart_job(aggregates, selected_variety))
 
-def generate_block_chart(raw_data, selected_variety):
+def generate_block_chart(aggregates, selected_variety):
     """Genera el gráfico de aprovechamiento por bloque"""
-    # Procesamiento de datos y generación de gráfico
-    pass
+    return _chart_url(block_chart_job(aggregates, selected_variety))
 
-def generate_flower_chart(raw_data, selected_variety):
+def generate_flower_chart(aggregates, selected_variety):
     """Genera el gráfico de aprovechamiento por tipo de flor"""
-    # Procesamiento de datos y generación de gráfico
-    pass
\ No newline at end of file
+    return _chart_url(flower_chart_job(aggregates, selected_variety))
@@ -5,10 +5,11 @@ from datetime import datetime, timedelta
 from app import db
 from app.main import bp
 from app.utils.data_utils import calc_indice_aprovechamiento, safe_int, safe_float
-from app.models import Siembra, Corte, Variedad, Flor, Color, FlorColor, BloqueCamaLado, Bloque, Area, Densidad, Perdida
+from app.models import Siembra, Corte, Variedad, Flor, Color, FlorColor, BloqueCamaLado, Bloque, Area, Densidad, Perdida, AcumuladoCurva, ResumenCalidadVariedad, ModeloCurva, ResumenSemanal
+from app.reportes.mantenimiento import avanzar_version_datos
+from .dashboard_cache import cached_dashboard_data
 from .dashboard_utils import (
-    get_filtered_data,
-    calculate_statistics,
+    build_dashboard_data,
     generate_variety_chart,
     generate_block_chart,
     generate_flower_chart
@@ -33,16 +34,16 @@ def dashboard():
         'variety_id': request.args.get('variedad_id', None, type=int)
     }
 
-    # Obtener datos filtrados
-    raw_data, selected_variety = get_filtered_data(filters)
+    # Estadísticas y agregación de gráficos, desde la caché mientras los datos no cambien
+    selected_variety = Variedad.query.get(filters['variety_id']) if filters['variety_id'] else None
+    data = cached_dashboard_data(filters, lambda: build_dashboard_data(filters))
+    stats = dict(data['stats'], selected_variety=selected_variety)
     
-    # Calcular estadísticas
-    stats = calculate_statistics(filters, raw_data, selected_variety)
-    
-    # Generar gráficos
-    variety_chart = generate_variety_chart(raw_data, selected_variety)
-    block_chart = generate_block_chart(raw_data, selected_variety)
-    flower_chart = generate_flower_chart(raw_data, selected_variety)
+    # Gráficos desde la agregación (la caché de gráficos evita volver a dibujarlos)
+    aggregates = data['aggregates']
+    variety_chart = generate_variety_chart(aggregates, selected_variety)
+    block_chart = generate_block_chart(aggregates, selected_variety)
+    flower_chart = generate_flower_chart(aggregates, selected_variety)
     
     # Obtener registros recientes
     recent_data = {
@@ -58,9 +59,9 @@ def dashboard():
                          stats=stats,
                          recent_data=recent_data,
                          varieties=varieties,
-                         variety_chart=variety_chart,
-                         block_chart=block_chart,
-                         flower_chart=flower_chart)
+                         grafico_aprovechamiento_variedad=variety_chart,
+                         grafico_aprovechamiento_bloque=block_chart,
+                         grafico_aprovechamiento_flor=flower_chart)
 
 def get_recent_cuts(filters):
     """Obtiene los últimos cortes registrados"""
@@ -89,6 +90,12 @@ def limpiar_db():
         db.session.query(Perdida).delete()
         db.session.query(Corte).delete()
         db.session.query(Siembra).delete()
+        db.session.query(AcumuladoCurva).delete()
+        db.session.query(ResumenCalidadVariedad).delete()
+        db.session.query(ModeloCurva).delete()
+        db.session.query(ResumenSemanal).delete()
+        # Los borrados masivos no pasan por los hooks de sesión
+        avanzar_version_datos(db.session)
         db.session.commit()
         flash('Base de datos limpiada correctamente', 'success')
     except Exception as e:
@@ -19,7 +19,8 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import text, func, and_, or_
+from sqlalchemy import text, func, and_, or_, select, case
+from sqlalchemy.orm import aliased
 from decimal import Decimal
 
 class BaseModel(db.Model):
@@ -404,6 +405,12 @@ class Siembra(BaseModel):
     densidad = db.relationship('Densidad', backref=db.backref('siembras', lazy='dynamic'))
     usuario = db.relationship('Usuario', backref=db.backref('siembras', lazy='dynamic'))
     
+    # Los filtros de tiempo se aplican como rangos de fecha (app/utils/calendario.py)
+    __table_args__ = (
+        db.Index('idx_fecha_siembra', 'fecha_siembra'),
+        db.Index('idx_siembra_variedad_fecha', 'variedad_id', 'fecha_siembra'),
+    )
+    
     # Métodos de negocio
     def finalizar(self):
         """Marca la siembra como finalizada."""
@@ -424,26 +431,49 @@ class Siembra(BaseModel):
         """Total de tallos cosechados en esta siembra."""
         return sum(corte.cantidad_tallos for corte in self.cortes)
     
+    @total_tallos.expression
+    def total_tallos(cls):
+        """Total de tallos como subconsulta correlacionada sobre los cortes."""
+        return select(func.coalesce(func.sum(Corte.cantidad_tallos), 0))\
+            .where(Corte.siembra_id == cls.siembra_id)\
+            .scalar_subquery()
+    
     @hybrid_property
     def dias_ciclo(self) -> int:
         """
         Días desde siembra hasta fin de corte o último corte.
         """
-        if self.fecha_fin_corte:
-            fecha_fin = self.fecha_fin_corte
-        elif self.cortes:
-            fecha_fin = max(corte.fecha_corte for corte in self.cortes)
-        else:
-            fecha_fin = datetime.now().date()
+        fecha_fin = self.fecha_fin_corte \
+            or self.cortes.with_entities(func.max(Corte.fecha_corte)).scalar() \
+            or datetime.now().date()
         
         dias = (fecha_fin - self.fecha_siembra).days
         return max(0, dias)  # Sin límite arbitrario, pero no negativo
     
+    @dias_ciclo.expression
+    def dias_ciclo(cls):
+        """
+        Días de ciclo como expresión SQL: fin de corte, o último corte, o la
+        fecha actual, menos la fecha de siembra (nunca negativo).
+        """
+        ultimo_corte = select(func.max(Corte.fecha_corte))\
+            .where(Corte.siembra_id == cls.siembra_id)\
+            .scalar_subquery()
+        fecha_fin = func.coalesce(cls.fecha_fin_corte, ultimo_corte, func.current_date())
+        return func.greatest(func.datediff(fecha_fin, cls.fecha_siembra), 0)
+    
     @hybrid_property
     def total_plantas(self) -> int:
         """Total de plantas sembradas (área × densidad)."""
         return int(self.area.area * self.densidad.valor)
     
+    @total_plantas.expression
+    def total_plantas(cls):
+        """Total de plantas como subconsulta correlacionada sobre área y densidad."""
+        return select(func.floor(Area.area * Densidad.valor))\
+            .where(Area.area_id == cls.area_id, Densidad.densidad_id == cls.densidad_id)\
+            .scalar_subquery()
+    
     @hybrid_property
     def indice_aprovechamiento(self) -> float:
         """Índice de aprovechamiento (tallos/plantas en porcentaje)."""
@@ -451,6 +481,22 @@ class Siembra(BaseModel):
             return round((self.total_tallos / self.total_plantas) * 100, 2)
         return 0.0
     
+    @indice_aprovechamiento.expression
+    def indice_aprovechamiento(cls):
+        """
+        Índice de aprovechamiento como expresión SQL, para ordenar y filtrar
+        consultas de siembras por este valor.
+        """
+        plantas = cls.total_plantas
+        return case(
+            (plantas > 0, func.round(cls.total_tallos * 100.0 / plantas, 2)),
+            else_=0.0
+        )
+    
+    def indices_acumulados(self) -> Dict[int, float]:
+        """Índice acumulado de cada corte de esta siembra en una sola consulta."""
+        return Corte.indices_acumulados([self.siembra_id])
+    
     def __repr__(self):
         return f'<Siembra {self.variedad.nombre_completo} en {self.bloque_cama.ubicacion_completa}>'
 
@@ -471,7 +517,10 @@ class Corte(BaseModel):
     siembra = db.relationship('Siembra', backref=db.backref('cortes', lazy='dynamic'))
     usuario = db.relationship('Usuario', backref=db.backref('cortes', lazy='dynamic'))
     
-    __table_args__ = (db.UniqueConstraint('siembra_id', 'num_corte', name='siembra_corte_unique'),)
+    __table_args__ = (
+        db.UniqueConstraint('siembra_id', 'num_corte', name='siembra_corte_unique'),
+        db.Index('idx_fecha_corte', 'fecha_corte'),
+    )
     
     # Métodos de clase
     @classmethod
@@ -519,6 +568,66 @@ class Corte(BaseModel):
             return round((total_tallos / self.siembra.total_plantas) * 100, 2)
         return 0.0
     
+    @indice_acumulado.expression
+    def indice_acumulado(cls):
+        """
+        Índice acumulado como expresión SQL (subconsultas correlacionadas), para
+        ordenar y filtrar consultas de cortes por este valor.
+        """
+        anterior = aliased(cls)
+        total_tallos = select(func.coalesce(func.sum(anterior.cantidad_tallos), 0))\
+            .where(anterior.siembra_id == cls.siembra_id, anterior.num_corte <= cls.num_corte)\
+            .scalar_subquery()
+        plantas = select(func.floor(Area.area * Densidad.valor))\
+            .select_from(Siembra)\
+            .join(Area, Siembra.area_id == Area.area_id)\
+            .join(Densidad, Siembra.densidad_id == Densidad.densidad_id)\
+            .where(Siembra.siembra_id == cls.siembra_id)\
+            .scalar_subquery()
+        return case(
+            (plantas > 0, func.round(total_tallos * 100.0 / plantas, 2)),
+            else_=0.0
+        )
+    
+    @staticmethod
+    def indices_acumulados(siembra_ids: List[int]) -> Dict[int, float]:
+        """
+        Índice acumulado de todos los cortes de varias siembras en una consulta.
+        
+        Los tallos se leen ordenados por (siembra, num_corte) y se acumulan al
+        recorrerlos, en lugar de una consulta por corte. No usa funciones de
+        ventana (SUM() OVER), que MySQL 5.7 no soporta.
+        
+        Returns:
+            Dict {corte_id: índice acumulado} con el mismo redondeo que indice_acumulado
+        """
+        siembra_ids = list(siembra_ids)
+        if not siembra_ids:
+            return {}
+        
+        filas = db.session.query(
+            Corte.corte_id,
+            Corte.siembra_id,
+            Corte.cantidad_tallos,
+            (Area.area * Densidad.valor).label('plantas')
+        ).select_from(Corte)\
+         .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+         .join(Area, Siembra.area_id == Area.area_id)\
+         .join(Densidad, Siembra.densidad_id == Densidad.densidad_id)\
+         .filter(Corte.siembra_id.in_(siembra_ids))\
+         .order_by(Corte.siembra_id, Corte.num_corte)\
+         .all()
+        
+        indices = {}
+        siembra_actual, total_tallos = None, 0
+        for fila in filas:
+            if fila.siembra_id != siembra_actual:
+                siembra_actual, total_tallos = fila.siembra_id, 0
+            total_tallos += fila.cantidad_tallos
+            plantas = int(fila.plantas or 0)
+            indices[fila.corte_id] = round((total_tallos / plantas) * 100, 2) if plantas > 0 else 0.0
+        return indices
+    
     def obtener_prediccion(self) -> Optional[Dict[str, Any]]:
         """
         Obtiene predicción de producción basada en datos históricos.
@@ -526,43 +635,38 @@ class Corte(BaseModel):
         Returns:
             Dict con información de predicción o None si no hay datos
         """
+        return Corte.obtener_predicciones([self]).get(self.corte_id)
+    
+    @staticmethod
+    def obtener_predicciones(cortes: List['Corte']) -> Dict[int, Dict[str, Any]]:
+        """
+        Predicciones de varios cortes con una sola lectura del índice de referencias.
+        
+        Las referencias son los cortes de otras siembras de la misma variedad
+        con +/- 5 días desde siembra, tomados del índice ordenado en memoria
+        de app/reportes/snapshot.py (se refresca con cada escritura).
+        
+        Returns:
+            Dict {corte_id: predicción}; se omiten los cortes sin referencias
+        """
+        from app.reportes.snapshot import obtener_snapshot
+        
         try:
-            # Obtener días desde siembra
-            dias_desde_siembra = (self.fecha_corte - self.siembra.fecha_siembra).days
-            
-            # Buscar siembras similares (misma variedad)
-            siembras_similares = Siembra.query.filter(
-                Siembra.variedad_id == self.siembra.variedad_id,
-                Siembra.siembra_id != self.siembra_id,
-                Siembra.cortes.any()
-            ).all()
-            
-            if not siembras_similares:
-                return None
-                
-            # Recopilar índices de cortes en días similares (+/- 5 días)
-            indices = []
-            for siembra in siembras_similares:
-                for corte in siembra.cortes:
-                    dias_corte = (corte.fecha_corte - siembra.fecha_siembra).days
-                    if abs(dias_corte - dias_desde_siembra) <= 5:
-                        indice = corte.indice_sobre_total
-                        indices.append(indice)
-            
-            if not indices:
-                return None
-                
-            # Calcular estadísticas
-            return {
-                'indice_actual': self.indice_sobre_total,
-                'indice_promedio': round(sum(indices) / len(indices), 2),
-                'indice_maximo': round(max(indices), 2),
-                'indice_minimo': round(min(indices), 2),
-                'diferencia': round(self.indice_sobre_total - (sum(indices) / len(indices)), 2),
-                'num_referencias': len(indices)
-            }
+            referencias = obtener_snapshot().referencias()
+            predicciones = {}
+            for corte in cortes:
+                siembra = corte.siembra
+                prediccion = referencias.prediccion(
+                    siembra.variedad_id,
+                    (corte.fecha_corte - siembra.fecha_siembra).days,
+                    corte.indice_sobre_total,
+                    excluir_siembra=siembra.siembra_id
+                )
+                if prediccion:
+                    predicciones[corte.corte_id] = prediccion
+            return predicciones
         except Exception as e:
-            return None
+            return {}
     
     def __repr__(self):
         return f'<Corte #{self.num_corte} de {self.siembra}>'
@@ -694,6 +798,205 @@ class VistaProduccionPorDia(db.Model):
     def __repr__(self):
         return f'<ProducciónDía {self.variedad} día {self.dias_desde_siembra}>'
 
+# ==============================================
+# TABLAS DE RESUMEN MANTENIDAS
+# ==============================================
+
+class AcumuladoCurva(db.Model):
+    """
+    Acumulado del índice de cada corte por variedad y día desde siembra.
+
+    Se mantiene de forma incremental desde los hooks de sesión definidos en
+    app/reportes/mantenimiento.py, de modo que la curva de producción se lee
+    en O(días) en lugar de recorrer todos los cortes.
+    """
+    __tablename__ = 'acumulado_curva'
+
+    variedad_id = db.Column(db.Integer, db.ForeignKey('variedades.variedad_id'), primary_key=True)
+    dias_desde_siembra = db.Column(db.Integer, primary_key=True)
+    num_cortes = db.Column(db.Integer, nullable=False, default=0)
+    suma_indice = db.Column(db.Float, nullable=False, default=0.0)
+    suma_cuadrados = db.Column(db.Float, nullable=False, default=0.0)
+    indice_minimo = db.Column(db.Float)
+    indice_maximo = db.Column(db.Float)
+
+    @property
+    def indice_promedio(self) -> float:
+        """Índice promedio de los cortes de este día."""
+        return self.suma_indice / self.num_cortes if self.num_cortes else 0.0
+
+    @property
+    def desviacion_indice(self) -> float:
+        """Desviación estándar poblacional del índice de este día."""
+        if not self.num_cortes:
+            return 0.0
+        varianza = self.suma_cuadrados / self.num_cortes - self.indice_promedio ** 2
+        return max(varianza, 0.0) ** 0.5
+
+    def __repr__(self):
+        return f'<AcumuladoCurva variedad {self.variedad_id} día {self.dias_desde_siembra}>'
+
+class ResumenCalidadVariedad(db.Model):
+    """
+    Contadores de calidad de datos por variedad para el diagnóstico de importación.
+
+    Se actualizan desde los hooks de app/reportes/mantenimiento.py a medida que
+    se registran siembras y cortes (incluidas las importaciones masivas), de
+    modo que el diagnóstico se lee sin recorrer siembras ni cortes.
+    """
+    __tablename__ = 'resumen_calidad_variedad'
+
+    variedad_id = db.Column(db.Integer, db.ForeignKey('variedades.variedad_id'), primary_key=True)
+    num_siembras = db.Column(db.Integer, nullable=False, default=0)
+    num_siembras_con_cortes = db.Column(db.Integer, nullable=False, default=0)
+    num_cortes = db.Column(db.Integer, nullable=False, default=0)
+    num_cortes_indice_alto = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def num_siembras_sin_cortes(self) -> int:
+        """Siembras de la variedad que aún no tienen cortes."""
+        return self.num_siembras - self.num_siembras_con_cortes
+
+    def __repr__(self):
+        return f'<ResumenCalidadVariedad variedad {self.variedad_id}>'
+
+class ResumenCurvaVariedad(db.Model):
+    """
+    Ciclos y totales de las siembras de una variedad para la curva de producción.
+
+    Guarda lo que la curva leída de `acumulado_curva` necesita además de los
+    puntos por día: siembras, plantas y tallos de las siembras con cortes, y
+    los ciclos vegetativo y total (promedios con filtro IQR de los días hasta
+    el primer y el último corte de cada siembra). Los hooks de
+    app/reportes/mantenimiento.py recalculan la fila de cada variedad afectada
+    al confirmar la transacción.
+    """
+    __tablename__ = 'resumen_curva_variedad'
+
+    variedad_id = db.Column(db.Integer, db.ForeignKey('variedades.variedad_id'), primary_key=True)
+    total_siembras = db.Column(db.Integer, nullable=False, default=0)
+    siembras_con_datos = db.Column(db.Integer, nullable=False, default=0)
+    total_plantas = db.Column(db.Float, nullable=False, default=0.0)
+    total_tallos = db.Column(db.BigInteger, nullable=False, default=0)
+    ciclo_vegetativo_promedio = db.Column(db.Integer)  # None sin ciclos en 40-110 días
+    ciclo_total_promedio = db.Column(db.Integer)       # None sin ciclos en 60-150 días
+    ciclo_total_maximo = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f'<ResumenCurvaVariedad variedad {self.variedad_id}>'
+
+class ResumenSemanal(db.Model):
+    """
+    Producción por semana ISO de corte, variedad, bloque, flor y color.
+
+    Se mantiene desde los hooks de app/reportes/mantenimiento.py al escribir
+    cortes, de modo que los totales por periodo se leen como rangos sobre
+    `anio_semana` en lugar de agregar todos los cortes.
+
+    `siembras_nuevas` cuenta las siembras cuyo primer corte cae en la semana:
+    sumado sobre cualquier rango da las siembras distintas que empezaron a
+    producir en él (sobre todas las semanas, las siembras con cortes).
+    """
+    __tablename__ = 'resumen_semanal'
+
+    anio_semana = db.Column(db.Integer, primary_key=True)  # YYYYWW (año y semana ISO)
+    variedad_id = db.Column(db.Integer, db.ForeignKey('variedades.variedad_id'), primary_key=True)
+    bloque_id = db.Column(db.SmallInteger, db.ForeignKey('bloques.bloque_id'), primary_key=True)
+    flor_id = db.Column(db.Integer, db.ForeignKey('flores.flor_id'), primary_key=True)
+    color_id = db.Column(db.Integer, db.ForeignKey('colores.color_id'), primary_key=True)
+    tallos = db.Column(db.BigInteger, nullable=False, default=0)
+    num_cortes = db.Column(db.Integer, nullable=False, default=0)
+    num_siembras = db.Column(db.Integer, nullable=False, default=0)
+    siembras_nuevas = db.Column(db.Integer, nullable=False, default=0)
+    plantas = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        db.Index('idx_resumen_semanal_variedad', 'variedad_id', 'anio_semana'),
+        db.Index('idx_resumen_semanal_bloque', 'bloque_id', 'anio_semana'),
+    )
+
+    @property
+    def indice(self) -> float:
+        """Tallos por cada 100 plantas de las siembras cortadas en la semana."""
+        return self.tallos / self.plantas * 100 if self.plantas else 0.0
+
+    def __repr__(self):
+        return f'<ResumenSemanal {self.anio_semana} variedad {self.variedad_id} bloque {self.bloque_id}>'
+
+class VersionDatos(db.Model):
+    """
+    Contador que cambia con cada escritura de los datos que alimentan los reportes.
+
+    Lo incrementan los hooks de app/reportes/mantenimiento.py al confirmar la
+    transacción de la escritura; los resultados guardados con una versión
+    dejan de reutilizarse cuando el contador avanza.
+    """
+    __tablename__ = 'version_datos'
+
+    nombre = db.Column(db.String(30), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    fecha_cambio = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<VersionDatos {self.nombre} v{self.version}>'
+
+class TrabajoReporte(db.Model):
+    """
+    Trabajo de reporte ejecutado en segundo plano (app/reportes/trabajos.py).
+
+    La clave identifica el tipo y los parámetros; un trabajo terminado se
+    reutiliza para la misma clave mientras la versión de datos no cambie.
+    """
+    __tablename__ = 'trabajo_reporte'
+
+    trabajo_id = db.Column(db.String(32), primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.JSON)
+    clave = db.Column(db.String(64), nullable=False, index=True)
+    version_datos = db.Column(db.BigInteger, nullable=False)
+    estado = db.Column(db.Enum('pendiente', 'en_proceso', 'terminado', 'error'), nullable=False, default='pendiente')
+    progreso = db.Column(db.SmallInteger, nullable=False, default=0)
+    mensaje = db.Column(db.String(255))
+    resultado = db.Column(db.Text(4294967295))  # JSON serializado, conserva el orden de las claves
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.usuario_id'))
+    fecha_creacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+
+    @property
+    def terminado(self) -> bool:
+        """True si el trabajo ya no va a cambiar de estado."""
+        return self.estado in ('terminado', 'error')
+
+    def __repr__(self):
+        return f'<TrabajoReporte {self.trabajo_id} {self.tipo} ({self.estado})>'
+
+class ModeloCurva(db.Model):
+    """
+    Curva de producción ajustada de una variedad (spline de scipy).
+
+    Guarda los nodos y coeficientes del ajuste junto con la huella del
+    acumulado por día con el que se calculó; app/reportes/modelos_curva.py lo
+    vuelve a ajustar solo cuando esa huella cambia, es decir, cuando cambian
+    los cortes de la variedad.
+    """
+    __tablename__ = 'modelo_curva'
+
+    variedad_id = db.Column(db.Integer, db.ForeignKey('variedades.variedad_id'), primary_key=True)
+    metodo = db.Column(db.String(10))  # 'spline', 'lineal' o None si no hay datos suficientes
+    nodos = db.Column(db.JSON)
+    coeficientes = db.Column(db.JSON)
+    grado = db.Column(db.Integer)
+    indice_maximo = db.Column(db.Float)
+    ciclo_vegetativo = db.Column(db.Integer, nullable=False)
+    ciclo_total = db.Column(db.Integer, nullable=False)
+    num_puntos = db.Column(db.Integer, nullable=False, default=0)
+    version_datos = db.Column(db.String(64), nullable=False)
+    fecha_ajuste = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ModeloCurva variedad {self.variedad_id} ({self.metodo})>'
+
 # ==============================================
 # CONFIGURACIÓN DE LOGIN MANAGER
 # ==============================================
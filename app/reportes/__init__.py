@@ -2,4 +2,4 @@ from flask import Blueprint
 
 reportes = Blueprint('reportes', __name__, url_prefix='/reportes')
 
-from app.reportes import routes
\ No newline at end of file
+from app.reportes import routes, mantenimiento
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Caché de imágenes de gráficos direccionada por contenido.
+
+Cada gráfico se identifica por el hash SHA-256 de la función que lo dibuja,
+sus argumentos, la versión de renderizado y el código fuente de charts.py. El PNG se guarda en disco una sola
+vez y se sirve desde `/reportes/chart/<hash>.png`; como el contenido de una
+URL nunca cambia, el navegador puede guardarla indefinidamente y una vista
+repetida de un gráfico sin cambios no vuelve a pasar por matplotlib.
+
+Los gráficos de error (GraficoNoDisponible: datos insuficientes o fallo al
+dibujar) no se guardan: su URL sería inmutable aunque lleguen los datos que
+faltaban. La vista los recibe como URL `data:` de la imagen de error.
+
+El directorio funciona como un LRU con tamaño máximo: cada lectura actualiza
+la fecha de modificación del archivo y, al superar el límite, se eliminan
+los archivos usados hace más tiempo.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+import numpy as np
+from flask import url_for
+from . import charts
+from .charts import renderizar_graficos, generar_grafico_error, GraficoNoDisponible
+from .utils import get_config_value
+
+# Cambiar al modificar el aspecto de los gráficos fuera de charts.py (estilos,
+# versión de matplotlib...); los cambios en charts.py ya cambian FUENTE_GRAFICOS
+VERSION_GRAFICOS = 2
+
+def _hash_fuente(modulo):
+    """SHA-256 del archivo fuente de un módulo."""
+    with open(modulo.__file__, 'rb') as archivo:
+        return hashlib.sha256(archivo.read()).hexdigest()
+
+# Hash del código que dibuja los gráficos: una URL inmutable no debe servir
+# una imagen dibujada por una versión anterior del código
+FUENTE_GRAFICOS = _hash_fuente(charts)
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_GRAFICOS_DIR = os.path.join(_RAIZ, 'uploads', 'cache_graficos')
+CACHE_GRAFICOS_MAX_BYTES = 200 * 1024 * 1024
+CACHE_GRAFICOS_MAX_AGE = 365 * 24 * 3600  # segundos
+
+# Al desalojar se baja hasta esta fracción del máximo para no desalojar en cada escritura
+_FRACCION_TRAS_DESALOJO = 0.9
+
+CLAVE_VALIDA = re.compile(r'^[0-9a-f]{64}$')
+
+_lock = threading.Lock()
+_tamano_estimado = None
+
+# ================ CLAVES ================
+
+def _serializable(valor):
+    """Convierte tipos no JSON (NumPy, Decimal, fechas) a equivalentes estables."""
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable para clave de gráfico: {type(valor).__name__}")
+
+def clave_grafico(funcion, args):
+    """
+    Calcula el hash de contenido de un gráfico.
+
+    Args:
+        funcion: Función de charts.py que dibuja el gráfico
+        args: Tupla de argumentos de la función
+
+    Returns:
+        Hash SHA-256 en hexadecimal
+    """
+    contenido = json.dumps(
+        [VERSION_GRAFICOS, FUENTE_GRAFICOS, funcion.__module__, funcion.__name__, list(args)],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=_serializable
+    )
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+# ================ ALMACENAMIENTO ================
+
+def _directorio():
+    """Directorio absoluto de la caché, creado si no existe."""
+    directorio = os.path.abspath(get_config_value('CACHE_GRAFICOS_DIR', CACHE_GRAFICOS_DIR))
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+def ruta_grafico(clave):
+    """Ruta del archivo PNG de una clave."""
+    return os.path.join(_directorio(), f'{clave}.png')
+
+def tocar(ruta):
+    """Marca el archivo como usado recientemente; False si ya no existe."""
+    try:
+        os.utime(ruta)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _escanear(directorio):
+    """Lista (mtime, tamaño, ruta) de los PNG de la caché."""
+    archivos = []
+    for entrada in os.scandir(directorio):
+        if entrada.name.endswith('.png'):
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            archivos.append((info.st_mtime, info.st_size, entrada.path))
+    return archivos
+
+def _desalojar(directorio, maximo):
+    """Elimina los archivos menos usados hasta quedar bajo el límite. Devuelve el tamaño final."""
+    archivos = _escanear(directorio)
+    total = sum(tamano for _, tamano, _ in archivos)
+    if total <= maximo:
+        return total
+
+    objetivo = maximo * _FRACCION_TRAS_DESALOJO
+    for _, tamano, ruta in sorted(archivos):
+        if total <= objetivo:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+    return total
+
+def _guardar(clave, png):
+    """Escribe el PNG de forma atómica y aplica el límite de tamaño."""
+    global _tamano_estimado
+    directorio = _directorio()
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(png)
+    os.replace(temporal, os.path.join(directorio, f'{clave}.png'))
+
+    maximo = get_config_value('CACHE_GRAFICOS_MAX_BYTES', CACHE_GRAFICOS_MAX_BYTES)
+    with _lock:
+        if _tamano_estimado is None:
+            _tamano_estimado = sum(tamano for _, tamano, _ in _escanear(directorio))
+        else:
+            _tamano_estimado += len(png)
+        if _tamano_estimado > maximo:
+            _tamano_estimado = _desalojar(directorio, maximo)
+
+# ================ API ================
+
+def _resolver_graficos(trabajos):
+    """
+    Renderiza y guarda los gráficos que no están en caché.
+
+    Returns:
+        Tupla (hashes, errores): {clave_resultado: hash} de los gráficos en
+        caché y {clave_resultado: mensaje} de los que no se pudieron dibujar
+        con sus datos; se omiten los gráficos que fallaron
+    """
+    hashes = {clave: clave_grafico(*trabajo) for clave, trabajo in trabajos.items()}
+    faltantes = {
+        clave: trabajos[clave]
+        for clave, hash_grafico in hashes.items()
+        if not tocar(ruta_grafico(hash_grafico))
+    }
+
+    errores = {}
+    generados = renderizar_graficos(faltantes)
+    for clave, grafico in generados.items():
+        if isinstance(grafico, GraficoNoDisponible):
+            errores[clave] = grafico.mensaje
+        else:
+            _guardar(hashes[clave], base64.b64decode(grafico))
+
+    hashes = {
+        clave: hash_grafico
+        for clave, hash_grafico in hashes.items()
+        if clave not in faltantes or (clave in generados and clave not in errores)
+    }
+    return hashes, errores
+
+def claves_graficos(trabajos):
+    """
+    Devuelve el hash de cada gráfico, renderizando solo los que no están en caché.
+
+    No necesita contexto de solicitud, por lo que sirve también en los
+    trabajos en segundo plano.
+
+    Args:
+        trabajos: Dict {clave_resultado: (funcion, args)} como en renderizar_graficos
+
+    Returns:
+        Dict {clave_resultado: hash}; se omiten los gráficos que fallaron o
+        que no se pudieron dibujar con sus datos
+    """
+    return _resolver_graficos(trabajos)[0]
+
+def urls_graficos(trabajos):
+    """
+    Devuelve la URL de cada gráfico, renderizando solo los que no están en caché.
+
+    Args:
+        trabajos: Dict {clave_resultado: (funcion, args)} como en renderizar_graficos
+
+    Returns:
+        Dict {clave_resultado: url}; los gráficos de error van como URL
+        `data:` sin pasar por la caché y se omiten los que fallaron
+    """
+    hashes, errores = _resolver_graficos(trabajos)
+    urls = {
+        clave: url_for('reportes.grafico', clave=hash_grafico)
+        for clave, hash_grafico in hashes.items()
+    }
+    urls.update({
+        clave: f'data:image/png;base64,{generar_grafico_error(mensaje)}'
+        for clave, mensaje in errores.items()
+    })
+    return urls
+
+def url_grafico(funcion, *args):
+    """URL de un único gráfico (None si no se pudo generar)."""
+    return urls_graficos({None: (funcion, args)}).get(None)
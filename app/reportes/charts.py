@@ -1,107 +1,449 @@
 import matplotlib
 matplotlib.use('Agg')  # Configurar backend no interactivo
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
 from io import BytesIO
+import atexit
 import base64
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from scipy.interpolate import splrep, splev, interp1d
-from flask import current_app
 from .utils import get_config_value
 
-MAXIMO_CICLO_ABSOLUTO = get_config_value('MAXIMO_CICLO_ABSOLUTO', 93)
-SUAVIZADO_MINIMO_PUNTOS = get_config_value('SUAVIZADO_MINIMO_PUNTOS', 4)
+# Valores por defecto; la configuración se lee al usarlos con get_config_value
+MAXIMO_CICLO_ABSOLUTO = 93
+SUAVIZADO_MINIMO_PUNTOS = 4
+
+# Procesos para renderizar gráficos (0 o 1 para renderizar en el proceso actual)
+GRAFICOS_PROCESOS = 2
+# Mínimo de gráficos en un lote para usar el pool de procesos
+GRAFICOS_MINIMO_PARALELO = 2
+
+# Los gráficos se renderizan también en procesos de trabajo, sin contexto de aplicación
+logger = logging.getLogger(__name__)
+
+# ================ UTILIDADES DE FIGURA ================
+
+def crear_figura(figsize=(10, 6)):
+    """Crea una figura independiente del estado global de pyplot."""
+    return Figure(figsize=figsize)
+
+def figura_a_base64(fig, dpi=100):
+    """Guarda la figura en un buffer PNG y la convierte a base64"""
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+class GraficoNoDisponible(Exception):
+    """
+    Los datos no permiten dibujar el gráfico. La vista muestra en su lugar un
+    gráfico de error con el mensaje, que no se guarda en la caché de gráficos.
+    """
+
+    def __init__(self, mensaje):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
 
 def generar_grafico_error(mensaje):
     """Genera un gráfico de error con el mensaje especificado"""
-    plt.figure(figsize=(10, 6))
-    plt.text(0.5, 0.5, mensaje, ha='center', va='center', fontsize=14)
-    plt.tight_layout()
-    return guardar_grafico_a_base64()
+    fig = crear_figura()
+    fig.text(0.5, 0.5, mensaje, ha='center', va='center', fontsize=14)
+    fig.tight_layout()
+    return figura_a_base64(fig)
 
-def guardar_grafico_a_base64():
-    """Guarda el gráfico actual en un buffer y lo convierte a base64"""
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', dpi=100)
-    buffer.seek(0)
-    grafico_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-    return grafico_base64
+# ================ GRÁFICOS DE REPORTES ================
 
-def generar_grafico_curva(puntos_curva, variedad_info, ciclo_vegetativo_promedio, ciclo_total_maximo):
+def generar_grafico_curva(puntos_curva, variedad_info, ciclo_vegetativo_promedio, ciclo_total_maximo,
+                          tendencia=None, minimo_puntos=SUAVIZADO_MINIMO_PUNTOS):
     """
     Genera un gráfico para la curva de producción con mejoras en el suavizado.
-    
+
+    Si los puntos traen percentiles (p10/p50/p90) se dibuja la banda P10-P90
+    con la mediana, y el índice acumulado en un eje secundario.
+
     Args:
         puntos_curva: Lista de puntos {dia, indice_promedio, ...}
         variedad_info: Nombre de la variedad para el título
         ciclo_vegetativo_promedio: Días promedio del ciclo vegetativo
         ciclo_total_maximo: Días promedio del ciclo total
-        
+        tendencia: Curva ya ajustada {metodo, dias, indices} (ver modelos_curva);
+            si es None se ajusta aquí a partir de los puntos
+        minimo_puntos: Puntos necesarios para ajustar la tendencia aquí; llega en
+            los argumentos porque los procesos de trabajo no leen la configuración
+
     Returns:
         Imagen codificada en base64 del gráfico generado
+
+    Raises:
+        GraficoNoDisponible: Con menos de 3 puntos o si falla el dibujo
     """
+    # Verificar datos mínimos
+    if not puntos_curva or len(puntos_curva) < 3:
+        raise GraficoNoDisponible("Datos insuficientes para generar curva")
+
     try:
-        # Verificar datos mínimos
-        if not puntos_curva or len(puntos_curva) < 3:
-            return generar_grafico_error("Datos insuficientes para generar curva")
-        
         # Extraer datos
         dias = np.array([p['dia'] for p in puntos_curva])
         indices = np.array([p['indice_promedio'] for p in puntos_curva])
-        
+
         # Configurar figura
-        plt.figure(figsize=(10, 6))
-        
+        fig = crear_figura()
+        ax = fig.subplots()
+
         # Gráfico de dispersión
-        plt.scatter(dias, indices, color='blue', s=50, alpha=0.7, label='Datos históricos')
-        
+        ax.scatter(dias, indices, color='blue', s=50, alpha=0.7, label='Datos históricos')
+
         # Suavizado condicional
-        if len(dias) >= SUAVIZADO_MINIMO_PUNTOS:
+        if tendencia is not None:
+            if tendencia['metodo'] == 'spline':
+                ax.plot(tendencia['dias'], tendencia['indices'], 'r--', linewidth=2,
+                        label='Tendencia (suavizado natural)')
+            else:
+                ax.plot(tendencia['dias'], tendencia['indices'], 'r--', linewidth=1.5,
+                        label='Tendencia (interpolación lineal)')
+        elif len(dias) >= minimo_puntos:
             try:
                 dias_suavizados = np.linspace(0, ciclo_total_maximo, 200)
                 s_factor = len(dias) / 3  # Factor de suavizado adaptativo
-                
+
                 tck = splrep(dias, indices, s=s_factor)
                 indices_suavizados = splev(dias_suavizados, tck)
-                
+
                 # Asegurar valores razonables
                 indices_suavizados = np.clip(indices_suavizados, 0, max(indices) * 1.2)
-                
-                plt.plot(dias_suavizados, indices_suavizados, 'r--', linewidth=2, 
+
+                ax.plot(dias_suavizados, indices_suavizados, 'r--', linewidth=2,
                         label='Tendencia (suavizado natural)')
             except Exception as e:
-                current_app.logger.warning(f"Error en suavizado: {str(e)}")
+                logger.warning(f"Error en suavizado: {str(e)}")
                 # Fallback a interpolación lineal
                 f = interp1d(dias, indices, kind='linear', fill_value="extrapolate")
                 dias_suavizados = np.linspace(0, ciclo_total_maximo, 100)
-                plt.plot(dias_suavizados, f(dias_suavizados), 'r--', linewidth=1.5, 
-                         label='Tendencia (interpolación lineal)')
-        
+                ax.plot(dias_suavizados, f(dias_suavizados), 'r--', linewidth=1.5,
+                        label='Tendencia (interpolación lineal)')
+
+        # Bandas de percentiles e índice acumulado (solo si vienen calculados)
+        max_banda = 0
+        handles_acumulado, etiquetas_acumulado = [], []
+        if puntos_curva[-1].get('p10') is not None:
+            # La banda empieza en el primer día con cortes (el día 0 es solo el ancla de la curva)
+            con_cortes = [p for p in puntos_curva if p['dia'] > 0]
+            dias_banda = [p['dia'] for p in con_cortes]
+            p10 = np.array([p['p10'] for p in con_cortes])
+            p50 = np.array([p['p50'] for p in con_cortes])
+            p90 = np.array([p['p90'] for p in con_cortes])
+            max_banda = p90.max() if len(p90) else 0
+            ax.fill_between(dias_banda, p10, p90, color='blue', alpha=0.12, label='Banda P10-P90')
+            ax.plot(dias_banda, p50, color='navy', linestyle=':', linewidth=1.2, label='Mediana (P50)')
+
+            ax_acumulado = ax.twinx()
+            ax_acumulado.plot(dias, [p['indice_acumulado'] for p in puntos_curva], color='purple',
+                              linewidth=1.5, alpha=0.8, label='Índice acumulado')
+            ax_acumulado.set_ylabel('Índice acumulado (%)', color='purple')
+            ax_acumulado.tick_params(axis='y', colors='purple')
+            ax_acumulado.set_ylim(bottom=0)
+            handles_acumulado, etiquetas_acumulado = ax_acumulado.get_legend_handles_labels()
+
         # Configuración del gráfico
-        plt.xlabel('Días desde siembra')
-        plt.ylabel('Índice promedio (%)')
-        plt.title(f'Curva de producción: {variedad_info[:50]}')
-        plt.grid(True, alpha=0.3)
-        plt.legend()
-        
+        ax.set_xlabel('Días desde siembra')
+        ax.set_ylabel('Índice promedio (%)')
+        ax.set_title(f'Curva de producción: {variedad_info[:50]}')
+        ax.grid(True, alpha=0.3)
+        handles, etiquetas = ax.get_legend_handles_labels()
+        ax.legend(handles + handles_acumulado, etiquetas + etiquetas_acumulado, loc='upper left')
+
         # Límites de ejes
-        max_y = min(50, max(indices) * 1.2) if indices else 20
-        plt.ylim(0, max_y)
-        plt.xlim(0, ciclo_total_maximo)
-        
+        max_y = min(50, max(max(indices), max_banda) * 1.2) if len(indices) else 20
+        ax.set_ylim(0, max_y)
+        ax.set_xlim(0, ciclo_total_maximo)
+
         # Líneas de ciclo
-        plt.axvline(x=ciclo_vegetativo_promedio, color='g', linestyle='--', alpha=0.7,
+        ax.axvline(x=ciclo_vegetativo_promedio, color='g', linestyle='--', alpha=0.7,
                    label=f'Fin ciclo vegetativo ({ciclo_vegetativo_promedio} días)')
-        plt.axvline(x=ciclo_total_maximo, color='r', linestyle='--', alpha=0.7,
+        ax.axvline(x=ciclo_total_maximo, color='r', linestyle='--', alpha=0.7,
                    label=f'Fin ciclo total ({ciclo_total_maximo} días)')
-        
+
         # Nota al pie
-        plt.figtext(0.5, 0.01, 
-                   "Nota: La línea punteada roja representa la tendencia de producción ajustada.", 
-                   ha='center', fontsize=9)
-        
-        return guardar_grafico_a_base64()
-        
+        fig.text(0.5, 0.01,
+                 "Nota: La línea punteada roja representa la tendencia de producción ajustada.",
+                 ha='center', fontsize=9)
+
+        return figura_a_base64(fig)
+
     except Exception as e:
-        current_app.logger.error(f"Error generando gráfico: {str(e)}")
-        return generar_grafico_error("Error al generar el gráfico")
\ No newline at end of file
+        logger.error(f"Error generando gráfico: {str(e)}")
+        raise GraficoNoDisponible("Error al generar el gráfico") from e
+
+def generar_grafico_curvas(curvas):
+    """
+    Genera un gráfico con las curvas de producción de varias variedades superpuestas.
+
+    Args:
+        curvas: Lista de dicts {variedad, puntos_curva, ciclo_vegetativo, ciclo_total}
+
+    Returns:
+        Imagen codificada en base64 del gráfico generado
+
+    Raises:
+        GraficoNoDisponible: Si ninguna curva tiene al menos 3 puntos
+    """
+    curvas = [c for c in curvas if len(c['puntos_curva']) >= 3]
+    if not curvas:
+        raise GraficoNoDisponible("Datos insuficientes para generar curvas")
+
+    fig = crear_figura(figsize=(11, 6))
+    ax = fig.subplots()
+
+    max_indice = 0
+    for curva in curvas:
+        dias = [p['dia'] for p in curva['puntos_curva']]
+        indices = [p['indice_promedio'] for p in curva['puntos_curva']]
+        max_indice = max(max_indice, max(indices))
+        linea, = ax.plot(dias, indices, 'o-', markersize=3, linewidth=1.5, alpha=0.85,
+                         label=f"{curva['variedad'][:30]} ({curva['ciclo_total']} días)")
+        # Fin del ciclo vegetativo con el color de su curva
+        ax.axvline(x=curva['ciclo_vegetativo'], color=linea.get_color(), linestyle=':', alpha=0.5)
+
+    ax.set_xlabel('Días desde siembra')
+    ax.set_ylabel('Índice promedio (%)')
+    ax.set_title('Comparación de curvas de producción')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=8, loc='upper right')
+    ax.set_ylim(0, min(50, max_indice * 1.2) if max_indice > 0 else 20)
+    ax.set_xlim(0, max(c['ciclo_total'] for c in curvas))
+
+    fig.text(0.5, 0.01,
+             "Nota: Las líneas punteadas verticales marcan el fin del ciclo vegetativo de cada variedad.",
+             ha='center', fontsize=9)
+
+    return figura_a_base64(fig)
+
+def generar_grafico_barras(etiquetas, valores, xlabel, ylabel, titulo, rotar_etiquetas=False):
+    """
+    Genera un gráfico de barras simple.
+
+    Args:
+        etiquetas: Etiquetas del eje X
+        valores: Altura de cada barra
+        xlabel, ylabel, titulo: Textos del gráfico
+        rotar_etiquetas: Si True, rota 45° las etiquetas del eje X
+
+    Returns:
+        Imagen codificada en base64 del gráfico generado
+    """
+    fig = crear_figura()
+    ax = fig.subplots()
+    ax.bar(etiquetas, valores)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(titulo)
+    if rotar_etiquetas:
+        ax.tick_params(axis='x', labelrotation=45)
+        for etiqueta in ax.get_xticklabels():
+            etiqueta.set_horizontalalignment('right')
+    fig.tight_layout()
+    return figura_a_base64(fig)
+
+def generar_grafico_dias_produccion(variedad, variedad_data):
+    """
+    Genera el gráfico de días desde siembra por número de corte de una variedad.
+
+    Args:
+        variedad: Nombre de la variedad
+        variedad_data: Lista de dicts {num_corte, dias_promedio, dias_minimo, dias_maximo}
+
+    Returns:
+        Imagen codificada en base64 del gráfico generado
+    """
+    fig = crear_figura(figsize=(8, 5))
+    ax = fig.subplots()
+
+    # Extraer datos para el gráfico
+    cortes_nums = [d['num_corte'] for d in variedad_data]
+    dias_promedio = [d['dias_promedio'] for d in variedad_data]
+    dias_min = [d['dias_minimo'] for d in variedad_data]
+    dias_max = [d['dias_maximo'] for d in variedad_data]
+
+    # Graficar días promedio y rango min-max
+    ax.plot(cortes_nums, dias_promedio, 'o-', color='blue', linewidth=2, label='Días promedio')
+    ax.fill_between(cortes_nums, dias_min, dias_max, color='blue', alpha=0.2, label='Rango min-max')
+
+    # Configurar gráfico
+    ax.set_title(f'Días de Producción: {variedad}')
+    ax.set_xlabel('Número de Corte')
+    ax.set_ylabel('Días desde siembra')
+    ax.set_xticks(cortes_nums)
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+
+    return figura_a_base64(fig, dpi=80)
+
+# ================ GRÁFICOS POR REPORTE ================
+# Argumentos de cada gráfico de las vistas; compartidos con los trabajos en
+# segundo plano y el precálculo para que produzcan el mismo hash de caché.
+
+def trabajo_grafico_curva(datos, variedad, tendencia=None):
+    """(función, args) del gráfico de curva de una variedad, o None si no hay puntos."""
+    if not datos['puntos_curva']:
+        return None
+    return generar_grafico_curva, (
+        datos['puntos_curva'], variedad, datos['ciclo_vegetativo'], datos['ciclo_total'], tendencia,
+        get_config_value('SUAVIZADO_MINIMO_PUNTOS', SUAVIZADO_MINIMO_PUNTOS)
+    )
+
+def trabajo_grafico_curvas(curvas):
+    """
+    (función, args) del gráfico de curvas superpuestas, o None si ninguna tiene puntos.
+
+    Args:
+        curvas: Lista de tuplas (nombre de variedad, datos de obtener_datos_curvas)
+    """
+    curvas = [
+        {
+            'variedad': variedad,
+            'puntos_curva': datos['puntos_curva'],
+            'ciclo_vegetativo': datos['ciclo_vegetativo'],
+            'ciclo_total': datos['ciclo_total']
+        }
+        for variedad, datos in curvas if datos['puntos_curva']
+    ]
+    if not curvas:
+        return None
+    return generar_grafico_curvas, (curvas,)
+
+def trabajo_grafico_produccion_variedad(data):
+    """(función, args) del gráfico de las 10 variedades con más tallos, o None sin datos."""
+    if not data:
+        return None
+    top_variedades = data[:10]
+    return generar_grafico_barras, (
+        [r['variedad'] for r in top_variedades],
+        [r['total_tallos'] for r in top_variedades],
+        'Variedad', 'Total de Tallos', 'Top 10 Variedades por Producción de Tallos',
+        True
+    )
+
+def trabajo_grafico_produccion_bloque(data):
+    """(función, args) del gráfico de tallos por bloque, o None sin datos."""
+    if not data:
+        return None
+    return generar_grafico_barras, (
+        [r['bloque'] for r in data],
+        [r['total_tallos'] for r in data],
+        'Bloque', 'Total de Tallos', 'Producción por Bloque'
+    )
+
+def trabajos_graficos_dias_produccion(data):
+    """{variedad: (función, args)} de los gráficos de días de producción."""
+    return {
+        variedad: (generar_grafico_dias_produccion, (variedad, variedad_data))
+        for variedad, variedad_data in data.items()
+    }
+
+# ================ RENDERIZADO EN PARALELO ================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _inicializar_proceso():
+    """Prepara un proceso de trabajo: backend Agg, fuentes y renderizador cargados."""
+    matplotlib.use('Agg')
+    fig = crear_figura(figsize=(1, 1))
+    fig.subplots().plot([0, 1], [0, 1])
+    figura_a_base64(fig, dpi=10)
+
+def _renderizar(funcion, args):
+    """
+    Ejecuta un renderizado; devuelve None si falla para no perder el lote, o
+    la excepción GraficoNoDisponible si los datos no permiten dibujarlo.
+    """
+    try:
+        return funcion(*args)
+    except GraficoNoDisponible as e:
+        return e
+    except Exception as e:
+        logger.error(f"Error al generar gráfico con {funcion.__name__}: {str(e)}")
+        return None
+
+def _procesos_configurados():
+    """Número de procesos de trabajo según configuración."""
+    return max(int(get_config_value('GRAFICOS_PROCESOS', GRAFICOS_PROCESOS) or 0), 0)
+
+def obtener_pool():
+    """
+    Devuelve el pool de procesos de renderizado del proceso actual, creándolo
+    la primera vez. Los procesos se mantienen vivos entre solicitudes.
+
+    Se inician con 'spawn': el servidor atiende solicitudes en varios hilos y
+    un fork copiaría candados y conexiones tomados por otros hilos.
+
+    Returns:
+        ProcessPoolExecutor o None si el renderizado en paralelo está desactivado
+    """
+    global _pool
+    procesos = _procesos_configurados()
+    if procesos <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_proceso
+            )
+        return _pool
+
+def calentar_pool():
+    """Arranca todos los procesos de trabajo para que la primera solicitud no pague el inicio."""
+    pool = obtener_pool()
+    if pool is None:
+        return 0
+    procesos = _procesos_configurados()
+    list(pool.map(abs, range(procesos)))
+    return procesos
+
+def cerrar_pool():
+    """Detiene los procesos de renderizado."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+atexit.register(cerrar_pool)
+
+def renderizar_graficos(trabajos):
+    """
+    Renderiza un lote de gráficos, en paralelo si hay suficientes.
+
+    Args:
+        trabajos: Dict {clave: (funcion, args)} con funciones de este módulo
+
+    Returns:
+        Dict {clave: imagen base64 o GraficoNoDisponible}; se omiten los
+        gráficos que fallaron
+    """
+    claves = list(trabajos)
+    minimo_paralelo = get_config_value('GRAFICOS_MINIMO_PARALELO', GRAFICOS_MINIMO_PARALELO)
+    pool = obtener_pool() if len(claves) >= minimo_paralelo else None
+
+    resultados = None
+    if pool is not None:
+        try:
+            futuros = [pool.submit(_renderizar, *trabajos[clave]) for clave in claves]
+            resultados = [futuro.result() for futuro in futuros]
+        except BrokenProcessPool as e:
+            logger.error(f"Pool de gráficos no disponible, renderizando en serie: {str(e)}")
+            cerrar_pool()
+
+    if resultados is None:
+        resultados = [_renderizar(*trabajos[clave]) for clave in claves]
+
+    return {
+        clave: grafico
+        for clave, grafico in zip(claves, resultados)
+        if grafico is not None
+    }
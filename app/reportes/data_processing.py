@@ -1,138 +1,615 @@
 from datetime import datetime, timedelta
-from sqlalchemy import func
+import numpy as np
+from sqlalchemy import func, case, desc, select
 from flask import current_app
-from app.models import Siembra, Corte, Variedad
-from .utils import filtrar_outliers_iqr, calc_plantas_totales, calc_indice_aprovechamiento
+from app import db
+from app.models import (
+    Siembra, Corte, Variedad, Flor, Color, FlorColor, Bloque, BloqueCamaLado,
+    Area, Densidad, AcumuladoCurva, ResumenCalidadVariedad, ResumenSemanal, ResumenCurvaVariedad
+)
+from app.utils.calendario import anio_semana, en_rango, rango_periodos
+from .charts import MAXIMO_CICLO_ABSOLUTO
+from .mantenimiento import (
+    select_resumen_calidad, select_resumen_semanal, select_resumen_siembras, resumir_siembras
+)
+from .utils import (
+    filtrar_outliers_iqr_agrupado, percentiles_por_segmento,
+    calc_plantas_totales, calc_indice_aprovechamiento, get_config_value
+)
 
-def obtener_datos_curva(variedad_id, bloque_id=None, periodo_filtro='completo', 
-                       periodo_inicio=None, periodo_fin=None, ultimo_ciclo=False):
+# Variedades que se pueden comparar a la vez en /reportes/curvas
+CURVAS_MAXIMO_VARIEDADES = 10
+
+def _parsear_periodo(periodo_filtro, periodo_inicio, periodo_fin):
     """
-    Procesa los datos para generar la curva de producción según los filtros aplicados.
-    
+    Convierte el periodo en formato YYYYWW a un rango (inicio, fin) comparable.
+
+    Un periodo que no tenga seis dígitos, con año fuera de 1..9998 o semana
+    fuera de 1..53, equivale a no filtrar (igual que filter_period en el dashboard).
+
     Returns:
-        dict: Diccionario con los datos procesados para la curva
+        Tupla (inicio, fin) como enteros YYYYWW o None si no aplica el filtro
     """
-    # Construir consulta base
-    query = Siembra.query.filter(Siembra.variedad_id == variedad_id)
-    
+    if periodo_filtro != 'customizado' or not periodo_inicio or not periodo_fin:
+        return None
+
+    periodos = []
+    for periodo in (periodo_inicio, periodo_fin):
+        if len(periodo) != 6 or not periodo.isdigit():
+            return None
+        ano, semana = int(periodo[:4]), int(periodo[4:])
+        if not (1 <= ano <= 9998 and 1 <= semana <= 53):
+            return None
+        periodos.append(ano * 100 + semana)
+    return tuple(periodos)
+
+def _filtro_periodo_siembra(periodo):
+    """Condición sobre la fecha de siembra para un rango (inicio, fin) de periodos YYYYWW."""
+    return en_rango(Siembra.fecha_siembra, rango_periodos(*periodo))
+
+def obtener_periodos_siembra():
+    """Periodos YYYYWW con siembras, para los selectores de rango de semanas."""
+    # Fechas distintas desde el índice de fecha de siembra; la semana ISO se calcula aquí
+    fechas = db.session.query(Siembra.fecha_siembra)\
+        .filter(Siembra.fecha_siembra.isnot(None))\
+        .distinct()\
+        .all()
+    periodos = sorted({anio_semana(f.fecha_siembra) for f in fechas})
+    return [
+        {'valor': str(periodo), 'texto': f"Semana {periodo % 100:02d} de {periodo // 100}"}
+        for periodo in periodos
+    ]
+
+def _aplicar_filtros_siembra(query, variedad_id, bloque_id=None, ultimo_ciclo=False):
+    """Aplica a la consulta los filtros comunes sobre siembras (una variedad o una lista)."""
+    if isinstance(variedad_id, (list, tuple)):
+        filtro_variedad = Siembra.variedad_id.in_(variedad_id)
+    else:
+        filtro_variedad = Siembra.variedad_id == variedad_id
+    query = query.filter(
+        filtro_variedad,
+        Siembra.fecha_siembra.isnot(None)
+    )
+
     if bloque_id:
-        query = query.join(BloqueCamaLado).filter(BloqueCamaLado.bloque_id == bloque_id)
-    
+        query = query.join(BloqueCamaLado, Siembra.bloque_cama_id == BloqueCamaLado.bloque_cama_id)\
+            .filter(BloqueCamaLado.bloque_id == bloque_id)
+
     if ultimo_ciclo:
         fecha_limite = datetime.now() - timedelta(days=90)
         query = query.filter(Siembra.fecha_siembra >= fecha_limite)
-    
-    # Procesar periodo en formato YYYYWW
-    ano_inicio, semana_inicio, ano_fin, semana_fin = None, None, None, None
-    if periodo_filtro == 'customizado' and periodo_inicio and periodo_fin:
-        try:
-            if len(periodo_inicio) == 6:
-                ano_inicio = int(periodo_inicio[:4])
-                semana_inicio = int(periodo_inicio[4:])
-            if len(periodo_fin) == 6:
-                ano_fin = int(periodo_fin[:4])
-                semana_fin = int(periodo_fin[4:])
-        except ValueError:
-            pass
-    
-    # Variables para datos acumulados
-    total_siembras = 0
-    siembras_con_datos = 0
-    total_plantas = 0
-    total_tallos = 0
-    datos_curva = {}
-    ciclos_vegetativos = []
-    ciclos_totales = []
-    
-    # Procesar cada siembra
-    for siembra in query.all():
-        if not siembra.fecha_siembra:
-            continue
-            
-        total_siembras += 1
-        
-        if not siembra.cortes:
-            continue
-            
-        # Calcular plantas
-        plantas_siembra = calc_plantas_totales(siembra.area.area, siembra.densidad.valor) if siembra.area and siembra.densidad else 0
-        if plantas_siembra <= 0:
-            continue
-            
-        # Verificar periodo
-        if periodo_filtro == 'customizado' and ano_inicio and semana_inicio and ano_fin and semana_fin:
-            fecha_siembra = siembra.fecha_siembra
-            ano_siembra = fecha_siembra.year
-            semana_siembra = fecha_siembra.isocalendar()[1]
-            periodo_siembra = ano_siembra * 100 + semana_siembra
-            periodo_inicio_valor = ano_inicio * 100 + semana_inicio
-            periodo_fin_valor = ano_fin * 100 + semana_fin
-            
-            if not (periodo_inicio_valor <= periodo_siembra <= periodo_fin_valor):
-                continue
-        
-        siembras_con_datos += 1
-        total_plantas += plantas_siembra
-        
-        # Calcular ciclos
-        fecha_primer_corte = min(c.fecha_corte for c in siembra.cortes)
-        fecha_ultimo_corte = max(c.fecha_corte for c in siembra.cortes)
-        ciclo_vegetativo = (fecha_primer_corte - siembra.fecha_siembra).days
-        ciclo_total = (fecha_ultimo_corte - siembra.fecha_siembra).days
-        
-        if 40 <= ciclo_vegetativo <= 110:
-            ciclos_vegetativos.append(ciclo_vegetativo)
-        if 60 <= ciclo_total <= 150:
-            ciclos_totales.append(ciclo_total)
-        
-        # Procesar cortes
-        for corte in siembra.cortes:
-            dias_desde_siembra = (corte.fecha_corte - siembra.fecha_siembra).days
-            indice = calc_indice_aprovechamiento(corte.cantidad_tallos, plantas_siembra)
-            total_tallos += corte.cantidad_tallos
-            
-            if dias_desde_siembra not in datos_curva:
-                datos_curva[dias_desde_siembra] = []
-            datos_curva[dias_desde_siembra].append(indice)
-    
-    # Calcular ciclos promedio
-    ciclos_vegetativos_filtrados = filtrar_outliers_iqr(ciclos_vegetativos)
-    ciclos_totales_filtrados = filtrar_outliers_iqr(ciclos_totales)
-    
-    ciclo_vegetativo_promedio = int(sum(ciclos_vegetativos_filtrados)/len(ciclos_vegetativos_filtrados)) if ciclos_vegetativos_filtrados else 75
-    ciclo_total_maximo_real = max(ciclos_totales) if ciclos_totales else 90
-    ciclo_total_maximo = min(
-        int(sum(ciclos_totales_filtrados)/len(ciclos_totales_filtrados)) if ciclos_totales_filtrados else 84,
-        ciclo_total_maximo_real,
-        MAXIMO_CICLO_ABSOLUTO
+
+    return query
+
+def _resumenes_siembras(variedad_ids, bloque_id=None, periodo=None, ultimo_ciclo=False):
+    """
+    Resume en una consulta agrupada las siembras de las variedades: plantas,
+    días hasta primer y último corte y tallos, más los ciclos promedio.
+
+    Returns:
+        dict {variedad_id: dict con totales y ciclos vegetativo/total}
+    """
+    en_periodo = case((_filtro_periodo_siembra(periodo), 1), else_=0) if periodo else None
+    consulta = _aplicar_filtros_siembra(
+        select_resumen_siembras(en_periodo), list(variedad_ids), bloque_id, ultimo_ciclo
+    )
+
+    filas_por_variedad = {variedad_id: [] for variedad_id in variedad_ids}
+    for fila in db.session.execute(consulta):
+        filas_por_variedad[fila.variedad_id].append(fila)
+
+    return {
+        variedad_id: _completar_resumen(resumir_siembras(filas))
+        for variedad_id, filas in filas_por_variedad.items()
+    }
+
+def _resumenes_mantenidos(variedad_ids):
+    """
+    Resúmenes de las variedades leídos de `resumen_curva_variedad` (una fila
+    por variedad, sin recorrer los cortes).
+
+    Returns:
+        dict {variedad_id: resumen} solo con las variedades que tienen fila
+    """
+    campos = [c.name for c in ResumenCurvaVariedad.__table__.columns if c.name != 'variedad_id']
+    return {
+        fila.variedad_id: _completar_resumen({campo: getattr(fila, campo) for campo in campos})
+        for fila in ResumenCurvaVariedad.query.filter(ResumenCurvaVariedad.variedad_id.in_(list(variedad_ids)))
+    }
+
+def _completar_resumen(resumen):
+    """Ciclos de la curva (con valores por defecto y tope) y promedio de producción de un resumen."""
+    ciclo_vegetativo = resumen['ciclo_vegetativo_promedio']
+    if ciclo_vegetativo is None:
+        ciclo_vegetativo = 75
+    ciclo_total_promedio = resumen['ciclo_total_promedio']
+    ciclo_total_maximo = resumen['ciclo_total_maximo']
+    ciclo_total = min(
+        ciclo_total_promedio if ciclo_total_promedio is not None else 84,
+        ciclo_total_maximo if ciclo_total_maximo is not None else 90,
+        get_config_value('MAXIMO_CICLO_ABSOLUTO', MAXIMO_CICLO_ABSOLUTO)
     )
-    
+
     # Validar coherencia entre ciclos
-    if ciclo_vegetativo_promedio >= ciclo_total_maximo:
-        ciclo_vegetativo_promedio = max(45, ciclo_total_maximo - 10)
-    
-    # Filtrar y preparar puntos de la curva
-    puntos_curva = [{'dia': 0, 'indice_promedio': 0, 'num_datos': siembras_con_datos, 'min_indice': 0, 'max_indice': 0}]
-    
-    for dia, indices in sorted((k, filtrar_outliers_iqr(v)) for k, v in datos_curva.items() if k <= ciclo_total_maximo):
-        if indices:
-            puntos_curva.append({
-                'dia': dia,
-                'indice_promedio': round(sum(indices)/len(indices), 2),
-                'num_datos': len(indices),
-                'min_indice': round(min(indices), 2),
-                'max_indice': round(max(indices), 2)
-            })
-    
-    puntos_curva.sort(key=lambda x: x['dia'])
-    
+    if ciclo_vegetativo >= ciclo_total:
+        ciclo_vegetativo = max(45, ciclo_total - 10)
+
+    total_plantas = resumen['total_plantas']
+    total_tallos = resumen['total_tallos']
     return {
-        'puntos_curva': puntos_curva,
-        'ciclo_vegetativo': ciclo_vegetativo_promedio,
-        'ciclo_total': ciclo_total_maximo,
-        'total_siembras': total_siembras,
-        'siembras_con_datos': siembras_con_datos,
+        'ciclo_vegetativo': ciclo_vegetativo,
+        'ciclo_total': ciclo_total,
+        'total_siembras': resumen['total_siembras'],
+        'siembras_con_datos': resumen['siembras_con_datos'],
         'total_plantas': total_plantas,
         'total_tallos': total_tallos,
         'promedio_produccion': round((total_tallos / total_plantas * 100), 2) if total_plantas > 0 else 0
-    }
\ No newline at end of file
+    }
+
+def obtener_datos_curva(variedad_id, bloque_id=None, periodo_filtro='completo', 
+                       periodo_inicio=None, periodo_fin=None, ultimo_ciclo=False):
+    """
+    Procesa los datos para generar la curva de producción según los filtros aplicados.
+
+    La agregación se resuelve en dos consultas agrupadas: una por siembra
+    (plantas, primer/último corte, tallos) y otra con los índices por corte
+    ya filtrados en el servidor, en lugar de recorrer cada siembra y sus cortes.
+
+    Returns:
+        dict: Diccionario con los datos procesados para la curva
+    """
+    return obtener_datos_curvas(
+        [variedad_id], bloque_id, periodo_filtro, periodo_inicio, periodo_fin, ultimo_ciclo
+    )[variedad_id]
+
+def obtener_datos_curvas(variedad_ids, bloque_id=None, periodo_filtro='completo',
+                         periodo_inicio=None, periodo_fin=None, ultimo_ciclo=False):
+    """
+    Curvas de producción de varias variedades con una sola pasada agrupada.
+
+    Los cortes de todas las variedades se leen en una consulta y sus índices
+    se filtran por IQR y se agregan por (variedad, día) a la vez, de modo que
+    el costo crece con el número de cortes y no con el de variedades.
+
+    Cada punto incluye, además del promedio y los extremos, los percentiles
+    10/50/90 del índice de ese día y el índice acumulado (tallos de todos los
+    cortes hasta ese día sobre las plantas de la variedad).
+
+    Returns:
+        dict {variedad_id: datos} con el formato de obtener_datos_curva,
+        en el orden de `variedad_ids`
+    """
+    variedad_ids = list(dict.fromkeys(variedad_ids))
+    if not variedad_ids:
+        return {}
+
+    periodo = _parsear_periodo(periodo_filtro, periodo_inicio, periodo_fin)
+    plantas_expr = Area.area * Densidad.valor
+
+    resumenes = _resumenes_siembras(variedad_ids, bloque_id, periodo, ultimo_ciclo)
+    ciclos_totales = np.array([resumenes[v]['ciclo_total'] for v in variedad_ids], dtype=np.int64)
+
+    puntos_curvas = {
+        v: [{'dia': 0, 'indice_promedio': 0, 'num_datos': resumenes[v]['siembras_con_datos'], 'min_indice': 0, 'max_indice': 0,
+             'p10': 0, 'p50': 0, 'p90': 0, 'indice_acumulado': 0}]
+        for v in variedad_ids
+    }
+
+    # Días e índices de cada corte de las siembras válidas de todas las variedades
+    dias_expr = func.datediff(Corte.fecha_corte, Siembra.fecha_siembra)
+    cortes_query = db.session.query(
+        Siembra.variedad_id,
+        dias_expr.label('dias'),
+        Corte.cantidad_tallos,
+        plantas_expr.label('plantas')
+    ).select_from(Corte)\
+     .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+     .join(Area, Siembra.area_id == Area.area_id)\
+     .join(Densidad, Siembra.densidad_id == Densidad.densidad_id)
+
+    cortes_query = _aplicar_filtros_siembra(cortes_query, variedad_ids, bloque_id, ultimo_ciclo)\
+        .filter(plantas_expr > 0, dias_expr <= int(ciclos_totales.max()))
+    if periodo:
+        cortes_query = cortes_query.filter(_filtro_periodo_siembra(periodo))
+
+    filas = cortes_query.all()
+    if filas:
+        posicion_variedad = {v: i for i, v in enumerate(variedad_ids)}
+        grupos = np.array([posicion_variedad[f.variedad_id] for f in filas], dtype=np.int64)
+        dias = np.array([f.dias for f in filas], dtype=np.int64)
+        tallos = np.array([f.cantidad_tallos for f in filas], dtype=np.float64)
+        plantas = np.array([float(f.plantas) for f in filas], dtype=np.float64)
+        indices = tallos / plantas * 100
+
+        # Cada variedad llega hasta su propio ciclo total
+        dentro = dias <= ciclos_totales[grupos]
+        grupos, dias, tallos, indices = grupos[dentro], dias[dentro], tallos[dentro], indices[dentro]
+
+        if len(dias):
+            # Clave única (variedad, día) para filtrar y agregar todos los grupos a la vez
+            dia_minimo = int(dias.min())
+            ancho = int(dias.max()) - dia_minimo + 1
+            claves = grupos * ancho + (dias - dia_minimo)
+
+            # Índice acumulado: tallos de todos los cortes hasta cada día sobre
+            # las plantas de la variedad, acumulado dentro de cada variedad
+            claves_dia, posicion_dia = np.unique(claves, return_inverse=True)
+            tallos_dia = np.bincount(posicion_dia, weights=tallos)
+            acumulado = np.cumsum(tallos_dia)
+            grupo_dia = claves_dia // ancho
+            inicio_grupo = np.flatnonzero(np.r_[True, grupo_dia[1:] != grupo_dia[:-1]])
+            acumulado -= np.repeat((acumulado - tallos_dia)[inicio_grupo], np.diff(np.r_[inicio_grupo, len(claves_dia)]))
+            plantas_variedad = np.array([resumenes[v]['total_plantas'] for v in variedad_ids], dtype=np.float64)[grupo_dia]
+            indice_acumulado = np.divide(acumulado * 100, plantas_variedad,
+                                         out=np.zeros_like(acumulado), where=plantas_variedad > 0)
+
+            # Filtrado IQR y orden por (variedad, día, índice): promedio, extremos y percentiles por segmento
+            mascara = filtrar_outliers_iqr_agrupado(indices, claves)
+            claves, indices = claves[mascara], indices[mascara]
+            orden = np.lexsort((indices, claves))
+            claves, indices = claves[orden], indices[orden]
+
+            claves_unicas, inicios, conteos = np.unique(claves, return_index=True, return_counts=True)
+            sumas = np.add.reduceat(indices, inicios)
+            minimos = indices[inicios]
+            maximos = indices[inicios + conteos - 1]
+            p10, p50, p90 = percentiles_por_segmento(indices, inicios, conteos, (10, 50, 90))
+            acumulados = indice_acumulado[np.searchsorted(claves_dia, claves_unicas)]
+
+            for clave, suma, conteo, minimo, maximo, q10, q50, q90, acum in zip(
+                    claves_unicas, sumas, conteos, minimos, maximos, p10, p50, p90, acumulados):
+                grupo, desfase = divmod(int(clave), ancho)
+                puntos_curvas[variedad_ids[grupo]].append({
+                    'dia': desfase + dia_minimo,
+                    'indice_promedio': round(float(suma) / int(conteo), 2),
+                    'num_datos': int(conteo),
+                    'min_indice': round(float(minimo), 2),
+                    'max_indice': round(float(maximo), 2),
+                    'p10': round(float(q10), 2),
+                    'p50': round(float(q50), 2),
+                    'p90': round(float(q90), 2),
+                    'indice_acumulado': round(float(acum), 2)
+                })
+
+    curvas = {}
+    for variedad_id in variedad_ids:
+        puntos_curva = puntos_curvas[variedad_id]
+        puntos_curva.sort(key=lambda x: x['dia'])
+        curvas[variedad_id] = {'puntos_curva': puntos_curva, **resumenes[variedad_id]}
+    return curvas
+
+def obtener_datos_curvas_acumuladas(variedad_ids):
+    """
+    Curvas de producción completas de varias variedades leídas del acumulado por día.
+
+    Lee O(días) filas de `acumulado_curva` en lugar de O(cortes), en una sola
+    consulta para todas las variedades, y los ciclos y totales de
+    `resumen_curva_variedad`. Los puntos son promedio, mínimo y
+    máximo de todos los cortes de cada día (el acumulado no permite filtrar
+    atípicos por IQR ni calcular percentiles, que quedan en None).
+
+    Returns:
+        dict {variedad_id: datos} con el formato de obtener_datos_curva; el
+        valor es None si el acumulado aún no tiene datos para la variedad
+    """
+    variedad_ids = list(dict.fromkeys(variedad_ids))
+    if not variedad_ids:
+        return {}
+
+    resumenes = _resumenes_mantenidos(variedad_ids)
+    faltantes = [v for v in variedad_ids if v not in resumenes]
+    if faltantes:
+        # Variedades sin siembras o resumen aún sin poblar
+        resumenes.update(_resumenes_siembras(faltantes))
+
+    filas = AcumuladoCurva.query.filter(
+        AcumuladoCurva.variedad_id.in_(variedad_ids),
+        AcumuladoCurva.dias_desde_siembra <= max(r['ciclo_total'] for r in resumenes.values()),
+        AcumuladoCurva.num_cortes > 0
+    ).order_by(AcumuladoCurva.variedad_id, AcumuladoCurva.dias_desde_siembra).all()
+
+    sin_bandas = {'p10': None, 'p50': None, 'p90': None, 'indice_acumulado': None}
+    puntos_curvas = {
+        v: [{'dia': 0, 'indice_promedio': 0, 'num_datos': resumenes[v]['siembras_con_datos'], 'min_indice': 0, 'max_indice': 0,
+             **sin_bandas}]
+        for v in variedad_ids
+    }
+    for fila in filas:
+        # Cada variedad llega hasta su propio ciclo total
+        if fila.dias_desde_siembra > resumenes[fila.variedad_id]['ciclo_total']:
+            continue
+        puntos_curvas[fila.variedad_id].append({
+            'dia': fila.dias_desde_siembra,
+            'indice_promedio': round(fila.indice_promedio, 2),
+            'num_datos': fila.num_cortes,
+            'min_indice': round(fila.indice_minimo, 2),
+            'max_indice': round(fila.indice_maximo, 2),
+            **sin_bandas
+        })
+
+    curvas = {}
+    for variedad_id in variedad_ids:
+        puntos_curva = puntos_curvas[variedad_id]
+        if len(puntos_curva) == 1 and resumenes[variedad_id]['siembras_con_datos']:
+            curvas[variedad_id] = None
+        else:
+            curvas[variedad_id] = {'puntos_curva': puntos_curva, **resumenes[variedad_id]}
+    return curvas
+
+def obtener_datos_curva_acumulada(variedad_id):
+    """
+    Curva de producción completa de una variedad leída del acumulado por día.
+
+    Returns:
+        dict: Mismo formato que obtener_datos_curva, o None si el acumulado
+        aún no tiene datos para la variedad
+    """
+    return obtener_datos_curvas_acumuladas([variedad_id])[variedad_id]
+
+def obtener_dias_produccion(dias_min=30, dias_max=150, min_cortes_variedad=5):
+    """
+    Días desde siembra por variedad y número de corte para el reporte de días
+    de producción.
+
+    Los días se calculan con DATEDIFF en una única consulta para todas las
+    variedades con más de `min_cortes_variedad` cortes, y el filtro IQR se
+    aplica a todos los grupos (variedad, num_corte) en una sola pasada.
+
+    Returns:
+        dict: {nombre_variedad: [{num_corte, dias_promedio, dias_minimo,
+        dias_maximo, total_siembras}, ...]} con variedades de al menos 2 cortes
+    """
+    variedades_con_datos = db.session.query(Siembra.variedad_id)\
+        .join(Corte, Corte.siembra_id == Siembra.siembra_id)\
+        .group_by(Siembra.variedad_id)\
+        .having(func.count(Corte.corte_id) > min_cortes_variedad)
+
+    dias_expr = func.datediff(Corte.fecha_corte, Siembra.fecha_siembra)
+    filas = db.session.query(
+        Variedad.variedad_id,
+        Variedad.variedad,
+        Corte.num_corte,
+        dias_expr.label('dias')
+    ).select_from(Corte)\
+     .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+     .join(Variedad, Siembra.variedad_id == Variedad.variedad_id)\
+     .filter(
+         Siembra.variedad_id.in_(variedades_con_datos),
+         dias_expr.between(dias_min, dias_max)
+     )\
+     .order_by(Variedad.variedad, Variedad.variedad_id, Corte.num_corte)\
+     .all()
+
+    if not filas:
+        return {}
+
+    # Clave de grupo compacta por (variedad, num_corte), en el orden de la consulta
+    variedad_ids = np.array([f.variedad_id for f in filas], dtype=np.int64)
+    nums = np.array([f.num_corte for f in filas], dtype=np.int64)
+    dias = np.array([f.dias for f in filas], dtype=np.int64)
+    nombres = {f.variedad_id: f.variedad for f in filas}
+
+    inicio_grupo = np.r_[True, (variedad_ids[1:] != variedad_ids[:-1]) | (nums[1:] != nums[:-1])]
+    grupos = np.cumsum(inicio_grupo) - 1
+
+    mascara = filtrar_outliers_iqr_agrupado(dias, grupos)
+    grupos_f, dias_f = grupos[mascara], dias[mascara]
+    num_grupos = grupos[-1] + 1
+
+    conteos = np.bincount(grupos_f, minlength=num_grupos)
+    sumas = np.bincount(grupos_f, weights=dias_f, minlength=num_grupos)
+    minimos = np.full(num_grupos, np.iinfo(np.int64).max)
+    maximos = np.full(num_grupos, np.iinfo(np.int64).min)
+    np.minimum.at(minimos, grupos_f, dias_f)
+    np.maximum.at(maximos, grupos_f, dias_f)
+
+    posiciones = np.flatnonzero(inicio_grupo)
+    resultado = {}
+    for grupo, posicion in enumerate(posiciones):
+        if not conteos[grupo]:
+            continue
+        variedad_id = int(variedad_ids[posicion])
+        resultado.setdefault(variedad_id, []).append({
+            'num_corte': int(nums[posicion]),
+            'dias_promedio': round(float(sumas[grupo]) / int(conteos[grupo])),
+            'dias_minimo': int(minimos[grupo]),
+            'dias_maximo': int(maximos[grupo]),
+            'total_siembras': int(conteos[grupo])
+        })
+
+    # Solo incluir variedades con al menos 2 cortes con datos
+    return {
+        nombres[variedad_id]: datos
+        for variedad_id, datos in resultado.items()
+        if len(datos) >= 2
+    }
+
+def curva_desde_acumulado():
+    """True si la vista completa de la curva se lee del acumulado (CURVA_DESDE_ACUMULADO)."""
+    return bool(get_config_value('CURVA_DESDE_ACUMULADO', False))
+
+def obtener_curvas(variedad_ids, bloque_id=None, periodo_filtro='completo', periodo_inicio=None,
+                   periodo_fin=None, ultimo_ciclo=False, bandas=False):
+    """
+    Curvas de producción de varias variedades para los reportes.
+
+    Por defecto las curvas se calculan desde los cortes, con el filtro IQR de
+    outliers por día. Con CURVA_DESDE_ACUMULADO activo, la vista completa sin
+    bandas se lee del acumulado por día: no recorre los cortes, pero sus puntos
+    promedian todos los cortes del día sin descartar outliers. Con filtros
+    (periodo, bloque, último ciclo), con `bandas` (percentiles 10/50/90 e
+    índice acumulado) o para las variedades sin acumulado se usan siempre los cortes.
+
+    Returns:
+        dict {variedad_id: datos} con el formato de obtener_datos_curva,
+        en el orden de `variedad_ids`
+    """
+    variedad_ids = list(dict.fromkeys(variedad_ids))
+    curvas = {}
+    if periodo_filtro == 'completo' and not bloque_id and not ultimo_ciclo \
+            and not bandas and curva_desde_acumulado():
+        curvas = {
+            variedad_id: datos
+            for variedad_id, datos in obtener_datos_curvas_acumuladas(variedad_ids).items()
+            if datos is not None
+        }
+
+    faltantes = [v for v in variedad_ids if v not in curvas]
+    if faltantes:
+        curvas.update(obtener_datos_curvas(
+            faltantes, bloque_id, periodo_filtro, periodo_inicio, periodo_fin, ultimo_ciclo
+        ))
+    return {variedad_id: curvas[variedad_id] for variedad_id in variedad_ids}
+
+def obtener_curva(variedad_id, periodo_filtro='completo', periodo_inicio=None, periodo_fin=None,
+                  bandas=False):
+    """
+    Curva de producción de una variedad para los reportes (ver obtener_curvas).
+
+    Returns:
+        dict: Mismo formato que obtener_datos_curva
+    """
+    return obtener_curvas(
+        [variedad_id], periodo_filtro=periodo_filtro, periodo_inicio=periodo_inicio,
+        periodo_fin=periodo_fin, bandas=bandas
+    )[variedad_id]
+
+def fuente_resumen_semanal(periodo=None):
+    """
+    Filas del resumen semanal, opcionalmente limitadas a un rango de semanas.
+
+    Se lee de `resumen_semanal`; si la tabla aún no se ha poblado, se usa como
+    subconsulta el mismo SELECT que la reconstruye desde los cortes.
+    Los cortes de siembras en camas sin bloque no entran en el resumen.
+
+    Args:
+        periodo: Tupla (inicio, fin) de semanas YYYYWW o None para todas
+
+    Returns:
+        Tabla o subconsulta con las columnas de `resumen_semanal`
+    """
+    fuente = ResumenSemanal.__table__
+    if db.session.query(fuente.c.anio_semana).first() is None:
+        fuente = select_resumen_semanal().subquery()
+    if periodo:
+        fuente = select(fuente).where(fuente.c.anio_semana.between(*periodo)).subquery()
+    return fuente
+
+def obtener_produccion_por_variedad(periodo=None):
+    """
+    Total de tallos por variedad, de mayor a menor.
+
+    Args:
+        periodo: Tupla (inicio, fin) de semanas YYYYWW de corte o None para todas
+
+    Returns:
+        list: [{variedad_id, variedad, flor, color, total_tallos}, ...]
+    """
+    fuente = fuente_resumen_semanal(periodo)
+    results = db.session.query(
+        Variedad.variedad_id,
+        Variedad.variedad,
+        Flor.flor,
+        Color.color,
+        func.sum(fuente.c.tallos).label('total_tallos')
+    ).select_from(fuente)\
+     .join(Variedad, Variedad.variedad_id == fuente.c.variedad_id)\
+     .join(Flor, Flor.flor_id == fuente.c.flor_id)\
+     .join(Color, Color.color_id == fuente.c.color_id)\
+     .group_by(Variedad.variedad_id, Variedad.variedad, Flor.flor, Color.color)\
+     .order_by(desc('total_tallos'))\
+     .all()
+
+    return [{
+        'variedad_id': r.variedad_id,
+        'variedad': r.variedad,
+        'flor': r.flor,
+        'color': r.color,
+        'total_tallos': int(r.total_tallos or 0)
+    } for r in results]
+
+def obtener_produccion_por_bloque(periodo=None):
+    """
+    Total de tallos y de siembras con cortes por bloque, ordenado por bloque.
+
+    Con periodo, `total_siembras` cuenta las siembras que empezaron a cortar
+    dentro de él.
+
+    Args:
+        periodo: Tupla (inicio, fin) de semanas YYYYWW de corte o None para todas
+
+    Returns:
+        list: [{bloque_id, bloque, total_tallos, total_siembras, promedio_tallos}, ...]
+    """
+    fuente = fuente_resumen_semanal(periodo)
+    results = db.session.query(
+        Bloque.bloque_id,
+        Bloque.bloque,
+        func.sum(fuente.c.tallos).label('total_tallos'),
+        func.sum(fuente.c.siembras_nuevas).label('total_siembras')
+    ).select_from(fuente)\
+     .join(Bloque, Bloque.bloque_id == fuente.c.bloque_id)\
+     .group_by(Bloque.bloque_id, Bloque.bloque)\
+     .all()
+
+    data = [{
+        'bloque_id': r.bloque_id,
+        'bloque': r.bloque,
+        'total_tallos': int(r.total_tallos or 0),
+        'total_siembras': int(r.total_siembras or 0),
+        'promedio_tallos': int(r.total_tallos or 0) / int(r.total_siembras) if r.total_siembras else 0
+    } for r in results]
+    data.sort(key=lambda r: r['bloque'])
+    return data
+
+def obtener_diagnostico_importacion(min_siembras=3, min_cortes=10):
+    """
+    Diagnóstico de calidad de los datos importados.
+
+    Se lee de `resumen_calidad_variedad` (una fila por variedad, mantenida al
+    escribir siembras y cortes). Si la tabla aún no se ha poblado, los mismos
+    contadores se calculan con una consulta agrupada.
+
+    Returns:
+        dict: stats, siembras_sin_cortes, cortes_indices_altos,
+        variedades_con_siembras y variedades_con_curvas
+    """
+    filas = [
+        (r.variedad_id, r.num_siembras, r.num_siembras_con_cortes, r.num_cortes, r.num_cortes_indice_alto)
+        for r in ResumenCalidadVariedad.query.all()
+    ]
+    if not filas:
+        filas = [tuple(f) for f in db.session.execute(select_resumen_calidad()).all()]
+
+    nombres = {
+        v.variedad_id: v for v in db.session.query(
+            Variedad.variedad_id, Variedad.variedad, Flor.flor, Color.color
+        ).join(FlorColor, Variedad.flor_color_id == FlorColor.flor_color_id)
+         .join(Flor, FlorColor.flor_id == Flor.flor_id)
+         .join(Color, FlorColor.color_id == Color.color_id)
+    }
+
+    variedades_con_curvas = [{
+        'variedad_id': variedad_id,
+        'variedad': nombres[variedad_id].variedad,
+        'flor': nombres[variedad_id].flor,
+        'color': nombres[variedad_id].color,
+        'siembras': siembras,
+        'cortes': cortes
+    } for variedad_id, siembras, _, cortes, _ in filas
+        if siembras >= min_siembras and cortes >= min_cortes and variedad_id in nombres]
+
+    # Ordenar variedades por número de cortes (más cortes primero)
+    variedades_con_curvas.sort(key=lambda x: x['cortes'], reverse=True)
+
+    return {
+        'stats': {
+            'total_siembras': sum(f[1] for f in filas),
+            'total_cortes': sum(f[3] for f in filas),
+            'total_variedades': len(nombres)
+        },
+        'siembras_sin_cortes': sum(f[1] - f[2] for f in filas),
+        'cortes_indices_altos': sum(f[4] for f in filas),
+        'variedades_con_siembras': sum(1 for f in filas if f[1] > 0),
+        'variedades_con_curvas': variedades_con_curvas
+    }
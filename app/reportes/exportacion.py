@@ -0,0 +1,290 @@
+"""
+Exportación en streaming de siembras y cortes.
+
+Las filas se leen de la base de datos en lotes con `yield_per` (cursor del
+lado del servidor) y se escriben a medida que llegan, ya sea como CSV
+generado por fragmentos o en un libro xlsx en modo `write_only` volcado a
+un archivo temporal. La memoria usada no depende del número de filas.
+
+Con pyarrow instalado también se exporta a Parquet y Arrow IPC: columnas
+tipadas (enteros, fechas, textos codificados como diccionario) y
+comprimidas, escritas por lotes de registros a medida que llegan del cursor.
+"""
+
+import csv
+import io
+import tempfile
+from itertools import islice
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from sqlalchemy import func
+from app import db
+from app.models import (
+    Siembra, Corte, Variedad, Flor, Color, FlorColor,
+    BloqueCamaLado, Bloque, Cama, Lado
+)
+from .utils import get_config_value
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Dependencia opcional: solo para los formatos parquet y arrow
+    pa = pq = None
+
+# Filas leídas por viaje a la base de datos
+EXPORTACION_LOTE = 2000
+
+FORMATO_FECHA = '%d/%m/%Y'
+FORMATO_FECHA_EXCEL = 'DD/MM/YYYY'
+
+# ================ CONSULTAS ================
+
+def _consulta_siembras():
+    """Siembras con su ubicación, variedad, flor y color."""
+    return db.session.query(
+        Siembra.siembra_id,
+        Bloque.bloque,
+        Cama.cama,
+        Lado.lado,
+        Variedad.variedad,
+        Flor.flor,
+        Color.color,
+        Siembra.fecha_siembra,
+        Siembra.fecha_inicio_corte,
+        Siembra.estado
+    ).select_from(Siembra)\
+     .join(BloqueCamaLado, Siembra.bloque_cama_id == BloqueCamaLado.bloque_cama_id)\
+     .join(Bloque, BloqueCamaLado.bloque_id == Bloque.bloque_id)\
+     .join(Cama, BloqueCamaLado.cama_id == Cama.cama_id)\
+     .join(Lado, BloqueCamaLado.lado_id == Lado.lado_id)\
+     .join(Variedad, Siembra.variedad_id == Variedad.variedad_id)\
+     .join(FlorColor, Variedad.flor_color_id == FlorColor.flor_color_id)\
+     .join(Flor, FlorColor.flor_id == Flor.flor_id)\
+     .join(Color, FlorColor.color_id == Color.color_id)\
+     .order_by(Siembra.siembra_id)
+
+def _consulta_cortes():
+    """Cortes con su siembra, ubicación y días desde la siembra."""
+    return db.session.query(
+        Corte.corte_id,
+        Siembra.siembra_id,
+        Bloque.bloque,
+        Cama.cama,
+        Lado.lado,
+        Variedad.variedad,
+        Corte.num_corte,
+        Corte.fecha_corte,
+        Corte.cantidad_tallos,
+        Siembra.fecha_siembra,
+        func.datediff(Corte.fecha_corte, Siembra.fecha_siembra).label('dias_desde_siembra')
+    ).select_from(Corte)\
+     .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+     .join(BloqueCamaLado, Siembra.bloque_cama_id == BloqueCamaLado.bloque_cama_id)\
+     .join(Bloque, BloqueCamaLado.bloque_id == Bloque.bloque_id)\
+     .join(Cama, BloqueCamaLado.cama_id == Cama.cama_id)\
+     .join(Lado, BloqueCamaLado.lado_id == Lado.lado_id)\
+     .join(Variedad, Siembra.variedad_id == Variedad.variedad_id)\
+     .order_by(Siembra.siembra_id, Corte.num_corte)
+
+# Por tipo: consulta, nombre de hoja y columnas (título, campo, tipo)
+EXPORTACIONES = {
+    'siembras': {
+        'consulta': _consulta_siembras,
+        'hoja': 'Siembras',
+        'columnas': [
+            ('ID Siembra', 'siembra_id', 'entero'),
+            ('Bloque', 'bloque', 'categoria'),
+            ('Cama', 'cama', 'categoria'),
+            ('Lado', 'lado', 'categoria'),
+            ('Variedad', 'variedad', 'categoria'),
+            ('Flor', 'flor', 'categoria'),
+            ('Color', 'color', 'categoria'),
+            ('Fecha Siembra', 'fecha_siembra', 'fecha'),
+            ('Fecha Inicio Corte', 'fecha_inicio_corte', 'fecha'),
+            ('Estado', 'estado', 'categoria'),
+        ]
+    },
+    'cortes': {
+        'consulta': _consulta_cortes,
+        'hoja': 'Cortes',
+        'columnas': [
+            ('ID Corte', 'corte_id', 'entero'),
+            ('ID Siembra', 'siembra_id', 'entero'),
+            ('Bloque', 'bloque', 'categoria'),
+            ('Cama', 'cama', 'categoria'),
+            ('Lado', 'lado', 'categoria'),
+            ('Variedad', 'variedad', 'categoria'),
+            ('Corte #', 'num_corte', 'entero'),
+            ('Fecha Corte', 'fecha_corte', 'fecha'),
+            ('Cantidad Tallos', 'cantidad_tallos', 'entero'),
+            ('Fecha Siembra', 'fecha_siembra', 'fecha'),
+            ('Días desde Siembra', 'dias_desde_siembra', 'entero'),
+        ]
+    }
+}
+
+def iterar_filas(tipo):
+    """
+    Recorre las filas de una exportación leyendo en lotes del cursor.
+
+    Yields:
+        Filas de la consulta (tuplas con nombre) en orden
+    """
+    consulta = EXPORTACIONES[tipo]['consulta']()
+    lote = get_config_value('EXPORTACION_LOTE', EXPORTACION_LOTE)
+    yield from consulta.yield_per(lote)
+
+# ================ ESCRITORES ================
+
+def generar_csv(tipo, filas_por_fragmento=1000):
+    """
+    Genera el CSV de una exportación por fragmentos de texto.
+
+    Yields:
+        Fragmentos de texto CSV (el primero con BOM y encabezados)
+    """
+    columnas = EXPORTACIONES[tipo]['columnas']
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')  # BOM para que Excel detecte UTF-8
+    writer.writerow([titulo for titulo, _, _ in columnas])
+
+    pendientes = 0
+    for fila in iterar_filas(tipo):
+        writer.writerow([
+            _formatear_texto(getattr(fila, campo), tipo_columna)
+            for _, campo, tipo_columna in columnas
+        ])
+        pendientes += 1
+        if pendientes >= filas_por_fragmento:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+
+    yield buffer.getvalue()
+
+def _formatear_texto(valor, tipo_columna):
+    """Valor de una celda CSV: vacío para nulos y fechas como dd/mm/aaaa."""
+    if valor is None:
+        return ''
+    if tipo_columna == 'fecha':
+        return valor.strftime(FORMATO_FECHA)
+    return valor
+
+def escribir_xlsx(tipo):
+    """
+    Escribe la exportación en un archivo xlsx temporal con openpyxl en modo
+    write_only, que vuelca cada fila a disco en lugar de mantener el libro
+    en memoria. Las fechas se guardan como fechas de Excel.
+
+    Returns:
+        Archivo temporal abierto y posicionado al inicio; se elimina al cerrarlo
+    """
+    definicion = EXPORTACIONES[tipo]
+    columnas = definicion['columnas']
+
+    workbook = Workbook(write_only=True)
+    hoja = workbook.create_sheet(definicion['hoja'])
+    hoja.append([titulo for titulo, _, _ in columnas])
+
+    campos_fecha = {campo for _, campo, tipo_columna in columnas if tipo_columna == 'fecha'}
+    for fila in iterar_filas(tipo):
+        valores = []
+        for _, campo, _ in columnas:
+            valor = getattr(fila, campo)
+            if campo in campos_fecha and valor is not None:
+                celda = WriteOnlyCell(hoja, value=valor)
+                celda.number_format = FORMATO_FECHA_EXCEL
+                valor = celda
+            valores.append(valor)
+        hoja.append(valores)
+
+    archivo = tempfile.TemporaryFile(suffix='.xlsx')
+    try:
+        workbook.save(archivo)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return archivo
+
+# ================ FORMATOS COLUMNARES ================
+
+FORMATOS_COLUMNARES = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrows', 'application/vnd.apache.arrow.stream'),
+}
+
+def _tipo_arrow(tipo_columna):
+    if tipo_columna == 'entero':
+        return pa.int32()
+    if tipo_columna == 'fecha':
+        return pa.date32()
+    return pa.dictionary(pa.int32(), pa.string())
+
+def esquema_arrow(tipo):
+    """Esquema Arrow de una exportación; los nombres de campo son los de la consulta."""
+    return pa.schema([
+        pa.field(campo, _tipo_arrow(tipo_columna))
+        for _, campo, tipo_columna in EXPORTACIONES[tipo]['columnas']
+    ])
+
+def iterar_lotes_arrow(tipo, filas_por_lote=None):
+    """
+    Convierte las filas del cursor en lotes de registros Arrow.
+
+    Yields:
+        pyarrow.RecordBatch con el esquema de esquema_arrow(tipo)
+    """
+    columnas = EXPORTACIONES[tipo]['columnas']
+    esquema = esquema_arrow(tipo)
+    filas_por_lote = filas_por_lote or get_config_value('EXPORTACION_LOTE', EXPORTACION_LOTE)
+
+    filas = iterar_filas(tipo)
+    while True:
+        lote = list(islice(filas, filas_por_lote))
+        if not lote:
+            break
+        arreglos = []
+        for posicion, (_, campo, tipo_columna) in enumerate(columnas):
+            valores = [fila[posicion] for fila in lote]
+            if tipo_columna == 'categoria':
+                arreglos.append(pa.array(valores, pa.string()).dictionary_encode())
+            else:
+                arreglos.append(pa.array(valores, esquema.field(campo).type))
+        yield pa.RecordBatch.from_arrays(arreglos, schema=esquema)
+
+def escribir_columnar(tipo, formato):
+    """
+    Escribe la exportación en Parquet o en un stream Arrow IPC comprimidos.
+
+    Args:
+        tipo: 'siembras' o 'cortes'
+        formato: 'parquet' o 'arrow'
+
+    Returns:
+        Archivo temporal abierto y posicionado al inicio; se elimina al cerrarlo
+    """
+    if pa is None:
+        raise RuntimeError('pyarrow no está instalado')
+
+    esquema = esquema_arrow(tipo)
+    archivo = tempfile.TemporaryFile(suffix=f'.{FORMATOS_COLUMNARES[formato][0]}')
+    try:
+        if formato == 'parquet':
+            with pq.ParquetWriter(archivo, esquema, compression='zstd') as writer:
+                for lote in iterar_lotes_arrow(tipo):
+                    writer.write_batch(lote)
+        else:
+            # El formato stream admite que cada lote traiga su propio diccionario
+            opciones = pa.ipc.IpcWriteOptions(compression='zstd')
+            with pa.ipc.new_stream(archivo, esquema, options=opciones) as writer:
+                for lote in iterar_lotes_arrow(tipo):
+                    writer.write_batch(lote)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,796 @@
+"""
+Mantenimiento incremental de las tablas de resumen de producción.
+
+Los hooks de sesión registran en `before_flush` los cortes insertados,
+editados o eliminados (desde las rutas de cortes, los importadores o
+cualquier otro punto que use la sesión) y en `after_flush` aplican los
+cambios a las tablas de resumen dentro de la misma transacción.
+
+- Inserciones: se suman como deltas (conteo, suma, suma de cuadrados, mín, máx).
+- Ediciones y eliminaciones: se recalculan desde los cortes las claves
+  afectadas, ya que mínimo y máximo no se pueden descontar.
+
+Tablas mantenidas:
+- acumulado_curva: índice por (variedad, día desde siembra).
+- resumen_calidad_variedad: contadores del diagnóstico de importación.
+- resumen_semanal: producción por (semana ISO, variedad, bloque, flor, color);
+  se recalculan las semanas afectadas de cada variedad.
+- resumen_curva_variedad: ciclos y totales de las siembras de cada variedad
+  para la curva leída del acumulado; como sus ciclos son promedios con
+  filtro IQR, la fila de cada variedad afectada se recalcula una sola vez
+  por transacción, en `before_commit`.
+- version_datos: contador que avanza con cualquier escritura de los datos
+  de los reportes; invalida los resultados guardados (trabajos.py). Avanza
+  una vez por transacción, en `before_commit`, para no bloquear su única
+  fila desde el primer flush hasta el final de la transacción.
+"""
+
+from datetime import date, datetime, timedelta
+from itertools import chain, compress
+import numpy as np
+from sqlalchemy import event, func, case, select, inspect, and_, literal
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+from app import db
+from app.models import (
+    Siembra, Corte, Perdida, Area, Densidad, Variedad, Flor, Color, FlorColor,
+    Bloque, BloqueCamaLado, AcumuladoCurva, ResumenCalidadVariedad, ResumenSemanal,
+    ResumenCurvaVariedad, VersionDatos
+)
+from app.utils.calendario import anio_semana, rango_semanas
+from app.utils.number_utils import filtrar_outliers_iqr_agrupado
+from .utils import get_config_value
+
+PENDIENTES_KEY = 'resumenes_pendientes'
+VERSION_PENDIENTE_KEY = 'version_datos_pendiente'
+RESUMEN_CURVA_PENDIENTE_KEY = 'resumen_curva_pendiente'
+
+# Atributos de Siembra que cambian el día o el índice de sus cortes
+ATRIBUTOS_SIEMBRA_CURVA = ('fecha_siembra', 'variedad_id', 'area_id', 'densidad_id')
+# Atributos que cambian los contadores de calidad
+ATRIBUTOS_SIEMBRA_CALIDAD = ('variedad_id', 'area_id', 'densidad_id')
+ATRIBUTOS_CORTE_CALIDAD = ('siembra_id', 'cantidad_tallos')
+# Atributos que mueven una siembra o un corte dentro del resumen semanal
+ATRIBUTOS_SIEMBRA_SEMANAL = ('variedad_id', 'bloque_cama_id', 'area_id', 'densidad_id')
+ATRIBUTOS_CORTE_SEMANAL = ('siembra_id', 'fecha_corte', 'cantidad_tallos')
+
+# Modelos cuyas escrituras cambian los datos de los reportes
+MODELOS_VERSIONADOS = (
+    Siembra, Corte, Perdida, Area, Densidad, Variedad, Flor, Color, FlorColor, Bloque, BloqueCamaLado
+)
+VERSION_PRODUCCION = 'produccion'
+
+# Índice (%) desde el cual un corte se considera un posible error de captura
+INDICE_ALTO_DIAGNOSTICO = 30
+
+class _Pendientes:
+    """Cambios recogidos en before_flush, pendientes de aplicar."""
+
+    def __init__(self):
+        self.curva_deltas = []            # [(variedad_id, dia, indice), ...]
+        self.curva_claves = set()         # {(variedad_id, dia), ...} a recalcular
+        self.curva_variedades = set()     # {variedad_id, ...} a recalcular completas
+        self.calidad_deltas = {}          # {variedad_id: [siembras, con_cortes, cortes, altos]}
+        self.calidad_variedades = set()   # {variedad_id, ...} a recalcular
+        self.semanal_claves = set()       # {(variedad_id, anio_semana), ...} a recalcular
+        self.semanal_variedades = set()   # {variedad_id, ...} a recalcular completas
+        self.semanal_siembras = {}        # {siembra_id: variedad_id} cuyo primer corte puede moverse
+        self.resumen_curva_variedades = set()  # {variedad_id, ...} con siembras o cortes nuevos
+        self.datos_cambiados = False      # avanzar la versión de datos
+
+    def __bool__(self):
+        return bool(self.curva_deltas or self.curva_claves or self.curva_variedades
+                    or self.calidad_deltas or self.calidad_variedades
+                    or self.semanal_claves or self.semanal_variedades
+                    or self.resumen_curva_variedades or self.datos_cambiados)
+
+    def sumar_calidad(self, variedad_id, siembras=0, con_cortes=0, cortes=0, altos=0):
+        """Acumula un delta de los contadores de calidad de una variedad."""
+        delta = self.calidad_deltas.setdefault(variedad_id, [0, 0, 0, 0])
+        delta[0] += siembras
+        delta[1] += con_cortes
+        delta[2] += cortes
+        delta[3] += altos
+
+# ================ UTILIDADES ================
+
+def _valor_anterior(obj, atributo):
+    """Devuelve el valor del atributo antes de los cambios pendientes."""
+    estado = inspect(obj)
+    historia = estado.attrs[atributo].history
+    if historia.deleted:
+        return historia.deleted[0]
+    if historia.added and estado.persistent:
+        # Asignado sin haberse cargado (p. ej. tras expirar en un commit): se lee el valor guardado
+        clave = estado.mapper.primary_key[0]
+        return estado.session.execute(
+            select(estado.mapper.columns[atributo]).where(clave == estado.identity[0])
+        ).scalar()
+    return getattr(obj, atributo)
+
+def _plantas_siembra(session, siembra):
+    """Total de plantas de una siembra (área × densidad) como float."""
+    area = siembra.area or (session.get(Area, siembra.area_id) if siembra.area_id else None)
+    densidad = siembra.densidad or (session.get(Densidad, siembra.densidad_id) if siembra.densidad_id else None)
+    if not area or not densidad or area.area is None or densidad.valor is None:
+        return 0.0
+    return float(area.area) * float(densidad.valor)
+
+def _contribucion_curva(session, siembra, fecha_corte, cantidad_tallos):
+    """
+    Calcula la clave y el índice que aporta un corte a la curva.
+
+    Returns:
+        Tupla (variedad_id, dia, indice) o None si no aporta
+    """
+    if not siembra or not siembra.fecha_siembra or not fecha_corte:
+        return None
+    plantas = _plantas_siembra(session, siembra)
+    if plantas <= 0:
+        return None
+    dia = (fecha_corte - siembra.fecha_siembra).days
+    return siembra.variedad_id, dia, cantidad_tallos / plantas * 100
+
+def _cambio(obj, atributos):
+    """True si alguno de los atributos tiene cambios pendientes."""
+    historias = inspect(obj).attrs
+    return any(historias[a].history.has_changes() for a in atributos)
+
+def _variedades_de_siembras(siembras):
+    """Variedades actuales y anteriores de las siembras dadas."""
+    return {
+        v for siembra in siembras if siembra
+        for v in (_valor_anterior(siembra, 'variedad_id'), siembra.variedad_id) if v
+    }
+
+def _siembra_de(session, corte, siembra_id=None):
+    """Obtiene la siembra de un corte sin disparar autoflush."""
+    siembra_id = siembra_id if siembra_id is not None else corte.siembra_id
+    if siembra_id is None:
+        return corte.siembra
+    return session.get(Siembra, siembra_id)
+
+def _marcar_semana(pendientes, siembra, fecha_corte):
+    """Marca para recalcular la semana de un corte y la semana del primer corte de su siembra."""
+    if not siembra or not siembra.variedad_id or not fecha_corte:
+        return
+    pendientes.semanal_claves.add((siembra.variedad_id, anio_semana(fecha_corte)))
+    if siembra.siembra_id:
+        pendientes.semanal_siembras[siembra.siembra_id] = siembra.variedad_id
+
+# ================ CONSULTAS DE RECÁLCULO ================
+
+def _select_acumulado_curva(variedad_id=None, dias=None):
+    """SELECT agrupado por (variedad, día) que reconstruye el acumulado desde los cortes."""
+    plantas = Area.area * Densidad.valor
+    indice = Corte.cantidad_tallos * 100.0 / plantas
+    dias_expr = func.datediff(Corte.fecha_corte, Siembra.fecha_siembra)
+
+    consulta = select(
+        Siembra.variedad_id,
+        dias_expr,
+        func.count(Corte.corte_id),
+        func.sum(indice),
+        func.sum(indice * indice),
+        func.min(indice),
+        func.max(indice)
+    ).select_from(Corte)\
+     .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+     .join(Area, Siembra.area_id == Area.area_id)\
+     .join(Densidad, Siembra.densidad_id == Densidad.densidad_id)\
+     .where(plantas > 0)
+
+    if variedad_id is not None:
+        consulta = consulta.where(Siembra.variedad_id == variedad_id)
+    if dias is not None:
+        consulta = consulta.where(dias_expr.in_(list(dias)))
+
+    return consulta.group_by(Siembra.variedad_id, dias_expr)
+
+def recalcular_acumulado_curva(conexion, variedad_id=None, dias=None):
+    """
+    Recalcula desde los cortes las filas del acumulado indicadas.
+
+    Args:
+        conexion: Conexión o sesión sobre la que ejecutar
+        variedad_id: Variedad a recalcular (None para todas)
+        dias: Días a recalcular dentro de la variedad (None para todos)
+    """
+    tabla = AcumuladoCurva.__table__
+
+    borrar = tabla.delete()
+    if variedad_id is not None:
+        borrar = borrar.where(tabla.c.variedad_id == variedad_id)
+    if dias is not None:
+        borrar = borrar.where(tabla.c.dias_desde_siembra.in_(list(dias)))
+    conexion.execute(borrar)
+
+    conexion.execute(tabla.insert().from_select(
+        ['variedad_id', 'dias_desde_siembra', 'num_cortes', 'suma_indice',
+         'suma_cuadrados', 'indice_minimo', 'indice_maximo'],
+        _select_acumulado_curva(variedad_id, dias)
+    ))
+
+def select_resumen_siembras(en_periodo=None):
+    """
+    SELECT por siembra con sus plantas, días hasta el primer y el último corte,
+    número de cortes y tallos: la base de los ciclos y totales de la curva.
+
+    Args:
+        en_periodo: Expresión 1/0 que marca las siembras que cuentan para los
+            totales (por defecto todas)
+    """
+    plantas = Area.area * Densidad.valor
+    return select(
+        Siembra.variedad_id,
+        Siembra.siembra_id,
+        plantas.label('plantas'),
+        func.datediff(func.min(Corte.fecha_corte), Siembra.fecha_siembra).label('ciclo_vegetativo'),
+        func.datediff(func.max(Corte.fecha_corte), Siembra.fecha_siembra).label('ciclo_total'),
+        func.count(Corte.corte_id).label('num_cortes'),
+        func.coalesce(func.sum(Corte.cantidad_tallos), 0).label('tallos'),
+        (literal(1) if en_periodo is None else en_periodo).label('en_periodo')
+    ).select_from(Siembra)\
+     .join(Area, Siembra.area_id == Area.area_id)\
+     .join(Densidad, Siembra.densidad_id == Densidad.densidad_id)\
+     .outerjoin(Corte, Corte.siembra_id == Siembra.siembra_id)\
+     .where(Siembra.fecha_siembra.isnot(None))\
+     .group_by(Siembra.variedad_id, Siembra.siembra_id, Siembra.fecha_siembra, Area.area, Densidad.valor)
+
+def resumir_siembras(filas):
+    """
+    Totales y ciclos de una variedad a partir de sus filas de select_resumen_siembras.
+
+    Los ciclos son promedios con filtro IQR de los días hasta el primer corte
+    (entre 40 y 110) y hasta el último (entre 60 y 150) de las siembras con
+    cortes y plantas; None si no hay ciclos en esos rangos.
+
+    Returns:
+        dict con las columnas de `resumen_curva_variedad` (sin variedad_id)
+    """
+    total_siembras = 0
+    siembras_con_datos = 0
+    total_plantas = 0
+    total_tallos = 0
+    ciclos_vegetativos = []
+    ciclos_totales = []
+
+    for fila in filas:
+        total_siembras += 1
+
+        plantas_siembra = float(fila.plantas or 0)
+        if not fila.num_cortes or plantas_siembra <= 0 or not fila.en_periodo:
+            continue
+
+        siembras_con_datos += 1
+        total_plantas += plantas_siembra
+        total_tallos += int(fila.tallos)
+
+        if 40 <= fila.ciclo_vegetativo <= 110:
+            ciclos_vegetativos.append(fila.ciclo_vegetativo)
+        if 60 <= fila.ciclo_total <= 150:
+            ciclos_totales.append(fila.ciclo_total)
+
+    # Un solo filtrado IQR para ambos ciclos (grupo 0 y 1)
+    mascara = filtrar_outliers_iqr_agrupado(
+        ciclos_vegetativos + ciclos_totales,
+        np.repeat([0, 1], [len(ciclos_vegetativos), len(ciclos_totales)])
+    )
+    vegetativos = list(compress(ciclos_vegetativos, mascara[:len(ciclos_vegetativos)]))
+    totales = list(compress(ciclos_totales, mascara[len(ciclos_vegetativos):]))
+
+    return {
+        'total_siembras': total_siembras,
+        'siembras_con_datos': siembras_con_datos,
+        'total_plantas': total_plantas,
+        'total_tallos': total_tallos,
+        'ciclo_vegetativo_promedio': int(sum(vegetativos) / len(vegetativos)) if vegetativos else None,
+        'ciclo_total_promedio': int(sum(totales) / len(totales)) if totales else None,
+        'ciclo_total_maximo': max(ciclos_totales) if ciclos_totales else None
+    }
+
+def recalcular_resumen_curva(conexion, variedad_ids=None):
+    """
+    Recalcula desde siembras y cortes el resumen de curva de las variedades dadas.
+
+    Args:
+        conexion: Conexión o sesión sobre la que ejecutar
+        variedad_ids: Variedades a recalcular (None para todas)
+    """
+    tabla = ResumenCurvaVariedad.__table__
+    consulta = select_resumen_siembras()
+    borrar = tabla.delete()
+    if variedad_ids is not None:
+        variedad_ids = list(variedad_ids)
+        consulta = consulta.where(Siembra.variedad_id.in_(variedad_ids))
+        borrar = borrar.where(tabla.c.variedad_id.in_(variedad_ids))
+
+    filas_por_variedad = {}
+    for fila in conexion.execute(consulta):
+        filas_por_variedad.setdefault(fila.variedad_id, []).append(fila)
+
+    conexion.execute(borrar)
+    if filas_por_variedad:
+        conexion.execute(tabla.insert(), [
+            {'variedad_id': variedad_id, **resumir_siembras(filas)}
+            for variedad_id, filas in filas_por_variedad.items()
+        ])
+
+def select_resumen_calidad(variedad_id=None):
+    """SELECT agrupado por variedad con los contadores del diagnóstico de importación."""
+    plantas = Area.area * Densidad.valor
+    umbral = get_config_value('INDICE_ALTO_DIAGNOSTICO', INDICE_ALTO_DIAGNOSTICO)
+    indice_alto = and_(plantas > 0, Corte.cantidad_tallos * 100.0 > umbral * plantas)
+
+    por_siembra = select(
+        Corte.siembra_id,
+        func.count(Corte.corte_id).label('cortes'),
+        func.sum(case((indice_alto, 1), else_=0)).label('altos')
+    ).select_from(Corte)\
+     .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+     .outerjoin(Area, Siembra.area_id == Area.area_id)\
+     .outerjoin(Densidad, Siembra.densidad_id == Densidad.densidad_id)
+    if variedad_id is not None:
+        por_siembra = por_siembra.where(Siembra.variedad_id == variedad_id)
+    por_siembra = por_siembra.group_by(Corte.siembra_id).subquery()
+
+    consulta = select(
+        Siembra.variedad_id,
+        func.count(Siembra.siembra_id),
+        func.count(por_siembra.c.siembra_id),
+        func.coalesce(func.sum(por_siembra.c.cortes), 0),
+        func.coalesce(func.sum(por_siembra.c.altos), 0)
+    ).select_from(Siembra)\
+     .outerjoin(por_siembra, por_siembra.c.siembra_id == Siembra.siembra_id)
+    if variedad_id is not None:
+        consulta = consulta.where(Siembra.variedad_id == variedad_id)
+
+    return consulta.group_by(Siembra.variedad_id)
+
+def recalcular_resumen_calidad(conexion, variedad_id=None):
+    """
+    Recalcula desde siembras y cortes los contadores de calidad.
+
+    Args:
+        conexion: Conexión o sesión sobre la que ejecutar
+        variedad_id: Variedad a recalcular (None para todas)
+    """
+    tabla = ResumenCalidadVariedad.__table__
+
+    borrar = tabla.delete()
+    if variedad_id is not None:
+        borrar = borrar.where(tabla.c.variedad_id == variedad_id)
+    conexion.execute(borrar)
+
+    conexion.execute(tabla.insert().from_select(
+        ['variedad_id', 'num_siembras', 'num_siembras_con_cortes', 'num_cortes',
+         'num_cortes_indice_alto'],
+        select_resumen_calidad(variedad_id)
+    ))
+
+def select_resumen_semanal(variedad_id=None, semanas=None):
+    """
+    SELECT agrupado por (semana ISO, variedad, bloque, flor, color) que
+    reconstruye el resumen semanal desde los cortes.
+
+    Las columnas llevan los nombres de la tabla `resumen_semanal`, de modo que
+    la consulta puede usarse como subconsulta en su lugar. Las camas sin
+    bloque quedan fuera: bloque_id es parte de la clave primaria.
+    """
+    semana_expr = func.yearweek(Corte.fecha_corte, 3)
+    primer_corte = aliased(Corte)
+    primera_fecha = select(func.min(primer_corte.fecha_corte))\
+        .where(primer_corte.siembra_id == Corte.siembra_id)\
+        .scalar_subquery()
+
+    # Primero por siembra y semana, para contar cada cama y sus plantas una sola vez
+    por_siembra = select(
+        semana_expr.label('anio_semana'),
+        Siembra.variedad_id,
+        BloqueCamaLado.bloque_id,
+        FlorColor.flor_id,
+        FlorColor.color_id,
+        Corte.siembra_id,
+        func.sum(Corte.cantidad_tallos).label('tallos'),
+        func.count(Corte.corte_id).label('cortes'),
+        case((func.min(Corte.fecha_corte) == primera_fecha, 1), else_=0).label('nueva'),
+        func.coalesce(func.max(Area.area * Densidad.valor), 0).label('plantas')
+    ).select_from(Corte)\
+     .join(Siembra, Corte.siembra_id == Siembra.siembra_id)\
+     .join(BloqueCamaLado, Siembra.bloque_cama_id == BloqueCamaLado.bloque_cama_id)\
+     .join(Bloque, BloqueCamaLado.bloque_id == Bloque.bloque_id)\
+     .join(Variedad, Siembra.variedad_id == Variedad.variedad_id)\
+     .join(FlorColor, Variedad.flor_color_id == FlorColor.flor_color_id)\
+     .outerjoin(Area, Siembra.area_id == Area.area_id)\
+     .outerjoin(Densidad, Siembra.densidad_id == Densidad.densidad_id)
+
+    if variedad_id is not None:
+        por_siembra = por_siembra.where(Siembra.variedad_id == variedad_id)
+    if semanas is not None:
+        semanas = list(semanas)
+        por_siembra = por_siembra.where(
+            Corte.fecha_corte.between(*rango_semanas(semanas)),
+            semana_expr.in_(semanas)
+        )
+
+    por_siembra = por_siembra.group_by(
+        semana_expr, Siembra.variedad_id, BloqueCamaLado.bloque_id,
+        FlorColor.flor_id, FlorColor.color_id, Corte.siembra_id
+    ).subquery()
+
+    claves = (
+        por_siembra.c.anio_semana, por_siembra.c.variedad_id, por_siembra.c.bloque_id,
+        por_siembra.c.flor_id, por_siembra.c.color_id
+    )
+    return select(
+        *claves,
+        func.sum(por_siembra.c.tallos).label('tallos'),
+        func.sum(por_siembra.c.cortes).label('num_cortes'),
+        func.count(por_siembra.c.siembra_id).label('num_siembras'),
+        func.sum(por_siembra.c.nueva).label('siembras_nuevas'),
+        func.sum(por_siembra.c.plantas).label('plantas')
+    ).group_by(*claves)
+
+def recalcular_resumen_semanal(conexion, variedad_id=None, semanas=None):
+    """
+    Recalcula desde los cortes las filas del resumen semanal indicadas.
+
+    Args:
+        conexion: Conexión o sesión sobre la que ejecutar
+        variedad_id: Variedad a recalcular (None para todas)
+        semanas: Semanas YYYYWW a recalcular dentro de la variedad (None para todas)
+    """
+    tabla = ResumenSemanal.__table__
+
+    borrar = tabla.delete()
+    if variedad_id is not None:
+        borrar = borrar.where(tabla.c.variedad_id == variedad_id)
+    if semanas is not None:
+        borrar = borrar.where(tabla.c.anio_semana.in_(list(semanas)))
+    conexion.execute(borrar)
+
+    conexion.execute(tabla.insert().from_select(
+        ['anio_semana', 'variedad_id', 'bloque_id', 'flor_id', 'color_id', 'tallos',
+         'num_cortes', 'num_siembras', 'siembras_nuevas', 'plantas'],
+        select_resumen_semanal(variedad_id, semanas)
+    ))
+
+def version_datos():
+    """Versión actual de los datos de los reportes (0 si nunca se han escrito)."""
+    return db.session.query(VersionDatos.version)\
+        .filter(VersionDatos.nombre == VERSION_PRODUCCION)\
+        .scalar() or 0
+
+def reconstruir_resumenes():
+    """Reconstruye desde cero todas las tablas de resumen mantenidas."""
+    recalcular_acumulado_curva(db.session)
+    recalcular_resumen_calidad(db.session)
+    recalcular_resumen_semanal(db.session)
+    recalcular_resumen_curva(db.session)
+    db.session.commit()
+
+# ================ APLICACIÓN DE CAMBIOS ================
+
+def _insertar_o_actualizar(conexion, tabla, filas, actualizar):
+    """
+    Inserta las filas o, si su clave ya existe, las actualiza en la misma
+    sentencia (INSERT ... ON DUPLICATE KEY UPDATE en MySQL, ON CONFLICT DO
+    UPDATE en SQLite), sin la carrera entre un UPDATE sin filas y el INSERT
+    de dos transacciones concurrentes.
+
+    Args:
+        conexion: Conexión o sesión sobre la que ejecutar
+        tabla: Tabla destino
+        filas: Lista de dicts con las filas a insertar
+        actualizar: Función que recibe las columnas de la fila propuesta y
+            devuelve {columna: expresión} para la fila existente
+    """
+    if isinstance(conexion, Session):
+        conexion = conexion.connection()
+    if conexion.dialect.name == 'mysql':
+        sentencia = mysql_insert(tabla).values(filas)
+        sentencia = sentencia.on_duplicate_key_update(**actualizar(sentencia.inserted))
+    else:
+        sentencia = sqlite_insert(tabla).values(filas)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=list(tabla.primary_key.columns), set_=actualizar(sentencia.excluded)
+        )
+    conexion.execute(sentencia)
+
+def _aplicar_deltas_curva(conexion, deltas):
+    """Suma los deltas de cortes nuevos a las filas del acumulado."""
+    tabla = AcumuladoCurva.__table__
+    agregados = {}
+    for variedad_id, dia, indice in deltas:
+        acumulado = agregados.setdefault((variedad_id, dia), [0, 0.0, 0.0, indice, indice])
+        acumulado[0] += 1
+        acumulado[1] += indice
+        acumulado[2] += indice * indice
+        acumulado[3] = min(acumulado[3], indice)
+        acumulado[4] = max(acumulado[4], indice)
+
+    _insertar_o_actualizar(conexion, tabla, [
+        {'variedad_id': variedad_id, 'dias_desde_siembra': dia, 'num_cortes': num,
+         'suma_indice': suma, 'suma_cuadrados': cuadrados,
+         'indice_minimo': minimo, 'indice_maximo': maximo}
+        for (variedad_id, dia), (num, suma, cuadrados, minimo, maximo) in agregados.items()
+    ], lambda nueva: {
+        'num_cortes': tabla.c.num_cortes + nueva.num_cortes,
+        'suma_indice': tabla.c.suma_indice + nueva.suma_indice,
+        'suma_cuadrados': tabla.c.suma_cuadrados + nueva.suma_cuadrados,
+        'indice_minimo': case((tabla.c.indice_minimo <= nueva.indice_minimo, tabla.c.indice_minimo),
+                              else_=nueva.indice_minimo),
+        'indice_maximo': case((tabla.c.indice_maximo >= nueva.indice_maximo, tabla.c.indice_maximo),
+                              else_=nueva.indice_maximo)
+    })
+
+def _aplicar_curva(conexion, pendientes):
+    """Aplica al acumulado de curva los cambios recogidos."""
+    for variedad_id in pendientes.curva_variedades:
+        recalcular_acumulado_curva(conexion, variedad_id)
+
+    claves_por_variedad = {}
+    for variedad_id, dia in pendientes.curva_claves:
+        if variedad_id not in pendientes.curva_variedades:
+            claves_por_variedad.setdefault(variedad_id, set()).add(dia)
+    for variedad_id, dias in claves_por_variedad.items():
+        recalcular_acumulado_curva(conexion, variedad_id, dias)
+
+    # Los recálculos ya incluyen los cortes nuevos de sus claves
+    deltas = [
+        d for d in pendientes.curva_deltas
+        if d[0] not in pendientes.curva_variedades and (d[0], d[1]) not in pendientes.curva_claves
+    ]
+    if deltas:
+        _aplicar_deltas_curva(conexion, deltas)
+
+def _aplicar_calidad(conexion, pendientes):
+    """Aplica a los contadores de calidad los cambios recogidos."""
+    tabla = ResumenCalidadVariedad.__table__
+
+    for variedad_id in pendientes.calidad_variedades:
+        recalcular_resumen_calidad(conexion, variedad_id)
+
+    # Sin fila previa, la variedad no tenía siembras: sus deltas son sus contadores
+    filas = [
+        {'variedad_id': variedad_id, 'num_siembras': siembras, 'num_siembras_con_cortes': con_cortes,
+         'num_cortes': cortes, 'num_cortes_indice_alto': altos}
+        for variedad_id, (siembras, con_cortes, cortes, altos) in pendientes.calidad_deltas.items()
+        if variedad_id not in pendientes.calidad_variedades
+    ]
+    if filas:
+        _insertar_o_actualizar(conexion, tabla, filas, lambda nueva: {
+            'num_siembras': tabla.c.num_siembras + nueva.num_siembras,
+            'num_siembras_con_cortes': tabla.c.num_siembras_con_cortes + nueva.num_siembras_con_cortes,
+            'num_cortes': tabla.c.num_cortes + nueva.num_cortes,
+            'num_cortes_indice_alto': tabla.c.num_cortes_indice_alto + nueva.num_cortes_indice_alto
+        })
+
+def _semanas_primer_corte(conexion, siembras):
+    """
+    Claves (variedad, semana) del primer corte de las siembras dadas.
+
+    Args:
+        siembras: Dict {siembra_id: variedad_id}
+    """
+    if not siembras:
+        return set()
+    filas = conexion.execute(
+        select(Corte.siembra_id, func.min(Corte.fecha_corte))
+        .where(Corte.siembra_id.in_(list(siembras)))
+        .group_by(Corte.siembra_id)
+    )
+    return {(siembras[siembra_id], anio_semana(fecha)) for siembra_id, fecha in filas if fecha}
+
+def _aplicar_semanal(conexion, pendientes):
+    """Aplica al resumen semanal los cambios recogidos."""
+    # El primer corte de una siembra puede haber cambiado de semana
+    pendientes.semanal_claves |= _semanas_primer_corte(conexion, pendientes.semanal_siembras)
+
+    for variedad_id in pendientes.semanal_variedades:
+        recalcular_resumen_semanal(conexion, variedad_id)
+
+    semanas_por_variedad = {}
+    for variedad_id, semana in pendientes.semanal_claves:
+        if variedad_id not in pendientes.semanal_variedades:
+            semanas_por_variedad.setdefault(variedad_id, set()).add(semana)
+    for variedad_id, semanas in semanas_por_variedad.items():
+        recalcular_resumen_semanal(conexion, variedad_id, semanas)
+
+def avanzar_version_datos(conexion):
+    """Incrementa la versión de datos dentro de la transacción de la escritura."""
+    tabla = VersionDatos.__table__
+    _insertar_o_actualizar(conexion, tabla, [
+        {'nombre': VERSION_PRODUCCION, 'version': 1, 'fecha_cambio': datetime.utcnow()}
+    ], lambda nueva: {
+        'version': tabla.c.version + 1,
+        'fecha_cambio': nueva.fecha_cambio
+    })
+
+# ================ HOOKS DE SESIÓN ================
+
+@event.listens_for(Session, 'before_flush')
+def _registrar_cambios(session, flush_context, instances):
+    """Recoge los cambios de siembras y cortes antes de escribirlos."""
+    pendientes = _Pendientes()
+    session.info[PENDIENTES_KEY] = pendientes
+    pendientes.datos_cambiados = any(
+        isinstance(obj, MODELOS_VERSIONADOS) for obj in chain(session.new, session.deleted)
+    ) or any(
+        isinstance(obj, MODELOS_VERSIONADOS) and session.is_modified(obj) for obj in session.dirty
+    )
+    umbral = get_config_value('INDICE_ALTO_DIAGNOSTICO', INDICE_ALTO_DIAGNOSTICO)
+
+    with session.no_autoflush:
+        siembras_con_cortes_nuevos = {}
+        for obj in session.new:
+            if isinstance(obj, Siembra):
+                if obj.variedad_id:
+                    pendientes.sumar_calidad(obj.variedad_id, siembras=1)
+                    pendientes.resumen_curva_variedades.add(obj.variedad_id)
+
+            elif isinstance(obj, Corte):
+                siembra = _siembra_de(session, obj)
+                contribucion = _contribucion_curva(
+                    session, siembra, obj.fecha_corte, obj.cantidad_tallos
+                )
+                if contribucion:
+                    pendientes.curva_deltas.append(contribucion)
+                    pendientes.resumen_curva_variedades.add(contribucion[0])
+                _marcar_semana(pendientes, siembra, obj.fecha_corte)
+
+                if siembra and siembra.variedad_id:
+                    plantas = _plantas_siembra(session, siembra)
+                    alto = plantas > 0 and obj.cantidad_tallos * 100.0 > umbral * plantas
+                    pendientes.sumar_calidad(siembra.variedad_id, cortes=1, altos=int(alto))
+                    siembras_con_cortes_nuevos[id(siembra)] = siembra
+
+        # Siembras que reciben su primer corte en este flush
+        if siembras_con_cortes_nuevos:
+            persistidas = [
+                siembra.siembra_id for siembra in siembras_con_cortes_nuevos.values() if siembra.siembra_id
+            ]
+            con_cortes_previos = set()
+            if persistidas:
+                con_cortes_previos = {
+                    siembra_id for (siembra_id,) in session.query(Corte.siembra_id)
+                    .filter(Corte.siembra_id.in_(persistidas))
+                    .distinct()
+                }
+            for siembra in siembras_con_cortes_nuevos.values():
+                if siembra.siembra_id not in con_cortes_previos:
+                    pendientes.sumar_calidad(siembra.variedad_id, con_cortes=1)
+
+        for obj in session.dirty:
+            if not session.is_modified(obj):
+                continue
+
+            if isinstance(obj, Corte):
+                anterior = _contribucion_curva(
+                    session,
+                    _siembra_de(session, obj, _valor_anterior(obj, 'siembra_id')),
+                    _valor_anterior(obj, 'fecha_corte'),
+                    _valor_anterior(obj, 'cantidad_tallos')
+                )
+                actual = _contribucion_curva(
+                    session, _siembra_de(session, obj), obj.fecha_corte, obj.cantidad_tallos
+                )
+                for contribucion in (anterior, actual):
+                    if contribucion:
+                        pendientes.curva_claves.add(contribucion[:2])
+
+                if _cambio(obj, ATRIBUTOS_CORTE_CALIDAD):
+                    pendientes.calidad_variedades.update(_variedades_de_siembras((
+                        _siembra_de(session, obj, _valor_anterior(obj, 'siembra_id')),
+                        _siembra_de(session, obj)
+                    )))
+
+                if _cambio(obj, ATRIBUTOS_CORTE_SEMANAL):
+                    _marcar_semana(
+                        pendientes,
+                        _siembra_de(session, obj, _valor_anterior(obj, 'siembra_id')),
+                        _valor_anterior(obj, 'fecha_corte')
+                    )
+                    _marcar_semana(pendientes, _siembra_de(session, obj), obj.fecha_corte)
+
+            elif isinstance(obj, Siembra):
+                variedades = _variedades_de_siembras((obj,))
+                if _cambio(obj, ATRIBUTOS_SIEMBRA_CURVA):
+                    pendientes.curva_variedades.update(variedades)
+                if _cambio(obj, ATRIBUTOS_SIEMBRA_CALIDAD):
+                    pendientes.calidad_variedades.update(variedades)
+                if _cambio(obj, ATRIBUTOS_SIEMBRA_SEMANAL):
+                    pendientes.semanal_variedades.update(variedades)
+
+            elif isinstance(obj, Variedad):
+                if _cambio(obj, ('flor_color_id',)):
+                    pendientes.semanal_variedades.add(obj.variedad_id)
+
+            elif isinstance(obj, FlorColor):
+                if _cambio(obj, ('flor_id', 'color_id')):
+                    variedades = session.query(Variedad.variedad_id)\
+                        .filter(Variedad.flor_color_id == obj.flor_color_id)
+                    pendientes.semanal_variedades.update(v for (v,) in variedades)
+
+            elif isinstance(obj, BloqueCamaLado):
+                if _cambio(obj, ('bloque_id',)):
+                    variedades = session.query(Siembra.variedad_id)\
+                        .filter(Siembra.bloque_cama_id == obj.bloque_cama_id)\
+                        .distinct()
+                    pendientes.semanal_variedades.update(v for (v,) in variedades)
+
+            elif isinstance(obj, (Area, Densidad)):
+                columna = Siembra.area_id if isinstance(obj, Area) else Siembra.densidad_id
+                identificador = obj.area_id if isinstance(obj, Area) else obj.densidad_id
+                variedades = session.query(Siembra.variedad_id)\
+                    .filter(columna == identificador)\
+                    .distinct()
+                variedades = {v for (v,) in variedades}
+                pendientes.curva_variedades.update(variedades)
+                pendientes.calidad_variedades.update(variedades)
+                pendientes.semanal_variedades.update(variedades)
+
+        for obj in session.deleted:
+            if isinstance(obj, Corte):
+                siembra = _siembra_de(session, obj)
+                contribucion = _contribucion_curva(
+                    session, siembra, obj.fecha_corte, obj.cantidad_tallos
+                )
+                if contribucion:
+                    pendientes.curva_claves.add(contribucion[:2])
+                pendientes.calidad_variedades.update(_variedades_de_siembras((siembra,)))
+                _marcar_semana(pendientes, siembra, obj.fecha_corte)
+
+            elif isinstance(obj, Siembra):
+                variedades = _variedades_de_siembras((obj,))
+                pendientes.curva_variedades.update(variedades)
+                pendientes.calidad_variedades.update(variedades)
+                pendientes.semanal_variedades.update(variedades)
+
+        # Semana del primer corte antes de los cambios, por si deja de serlo
+        pendientes.semanal_claves |= _semanas_primer_corte(session, pendientes.semanal_siembras)
+
+@event.listens_for(Session, 'after_flush')
+def _aplicar_cambios(session, flush_context):
+    """Aplica los cambios recogidos a las tablas de resumen."""
+    pendientes = session.info.pop(PENDIENTES_KEY, None)
+    if not pendientes:
+        return
+
+    conexion = session.connection()
+    _aplicar_curva(conexion, pendientes)
+    _aplicar_calidad(conexion, pendientes)
+    _aplicar_semanal(conexion, pendientes)
+    if pendientes.datos_cambiados:
+        session.info[VERSION_PENDIENTE_KEY] = True
+
+    # Variedades cuyo resumen de curva se recalcula al confirmar
+    variedades_curva = pendientes.resumen_curva_variedades | pendientes.curva_variedades \
+        | {variedad_id for variedad_id, _ in pendientes.curva_claves}
+    if variedades_curva:
+        session.info.setdefault(RESUMEN_CURVA_PENDIENTE_KEY, set()).update(variedades_curva)
+
+@event.listens_for(Session, 'before_commit')
+def _confirmar_cambios(session):
+    """
+    Cierra los resúmenes de la transacción antes de confirmarla: recalcula
+    una sola vez el resumen de curva de las variedades afectadas y avanza la
+    versión de datos si la transacción escribió datos de los reportes. La
+    fila de version_datos queda bloqueada solo durante la confirmación, no
+    entre escrituras concurrentes de toda la transacción.
+    """
+    # El último flush ocurre después de este evento: se adelanta para registrar sus cambios
+    session.flush()
+    variedades_curva = session.info.pop(RESUMEN_CURVA_PENDIENTE_KEY, None)
+    if variedades_curva:
+        recalcular_resumen_curva(session.connection(), variedades_curva)
+    if session.info.pop(VERSION_PENDIENTE_KEY, False):
+        avanzar_version_datos(session.connection())
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_pendientes(session, previous_transaction):
+    """Olvida los recálculos pendientes cuando se revierte la transacción completa."""
+    if previous_transaction.parent is None:
+        session.info.pop(VERSION_PENDIENTE_KEY, None)
+        session.info.pop(RESUMEN_CURVA_PENDIENTE_KEY, None)
@@ -0,0 +1,335 @@
+"""
+Modelos ajustados de la curva de producción por variedad.
+
+La tendencia de la curva (spline de scipy, o interpolación lineal si el
+spline falla) se ajusta una vez por variedad y se guarda en `modelo_curva`
+con sus nodos, coeficientes, ciclos y la huella de los datos de origen. La
+huella se calcula sobre las filas de `acumulado_curva`, que los hooks de
+mantenimiento actualizan con cada corte (o, si la variedad no tiene filas en
+el acumulado, sobre el conteo, los tallos y las fechas de sus cortes):
+mientras no cambien los cortes de una variedad, su modelo se reutiliza sin
+volver a ajustarlo. El ajuste usa
+la misma curva que el reporte (obtener_curva), con o sin filtro IQR según
+CURVA_DESDE_ACUMULADO, que también entra en la huella.
+
+`evaluar(variedad_ids, dias)` evalúa muchas variedades y días a la vez sin
+leer los cortes, para que el gráfico, los pronósticos y las predicciones
+compartan la misma curva.
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime
+import numpy as np
+from scipy.interpolate import splrep, splev
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app import db
+from app.models import AcumuladoCurva, ModeloCurva, Siembra, Corte
+from .charts import MAXIMO_CICLO_ABSOLUTO, SUAVIZADO_MINIMO_PUNTOS
+from .data_processing import obtener_curva, curva_desde_acumulado
+from .utils import get_config_value
+
+# Cambiar al modificar la forma de ajustar para invalidar los modelos guardados
+VERSION_MODELO = 3
+
+# Tope de la curva respecto al máximo observado (igual que el gráfico)
+FACTOR_TOPE_INDICE = 1.2
+
+logger = logging.getLogger(__name__)
+
+# Ajustes hechos por las vistas en este proceso: {variedad_id: (huella, CurvaAjustada)}
+_ajustes_en_memoria = {}
+_ajustes_lock = threading.Lock()
+
+class CurvaAjustada:
+    """Curva de una variedad lista para evaluar, independiente de la sesión."""
+
+    def __init__(self, variedad_id, metodo, tck, indice_maximo, ciclo_vegetativo,
+                 ciclo_total, num_puntos, version_datos, fecha_ajuste):
+        self.variedad_id = variedad_id
+        self.metodo = metodo
+        self.tck = tck
+        self.indice_maximo = indice_maximo
+        self.ciclo_vegetativo = ciclo_vegetativo
+        self.ciclo_total = ciclo_total
+        self.num_puntos = num_puntos
+        self.version_datos = version_datos
+        self.fecha_ajuste = fecha_ajuste
+
+    @classmethod
+    def desde_modelo(cls, modelo):
+        tck = None
+        if modelo.metodo:
+            tck = (np.array(modelo.nodos), np.array(modelo.coeficientes), modelo.grado)
+        return cls(modelo.variedad_id, modelo.metodo, tck, modelo.indice_maximo,
+                   modelo.ciclo_vegetativo, modelo.ciclo_total, modelo.num_puntos,
+                   modelo.version_datos, modelo.fecha_ajuste)
+
+    def evaluar(self, dias):
+        """
+        Índice esperado (%) en cada día desde siembra.
+
+        Fuera de [0, ciclo_total] el índice es 0; sin modelo, NaN.
+        """
+        dias = np.asarray(dias, dtype=np.float64)
+        if self.tck is None:
+            return np.full(dias.shape, np.nan)
+        valores = np.clip(splev(dias, self.tck), 0, self.indice_maximo * FACTOR_TOPE_INDICE)
+        return np.where((dias < 0) | (dias > self.ciclo_total), 0.0, valores)
+
+# ================ AJUSTE ================
+
+def huellas_datos(variedad_ids):
+    """
+    Huella de los datos de origen de cada variedad: hash de sus filas de
+    `acumulado_curva` y de los parámetros que afectan al ajuste. Las
+    variedades sin filas en el acumulado (p. ej. antes de poblarlo con
+    `flask reconstruir-resumenes`) usan el número, los tallos y las fechas
+    máximas de corte y de registro de sus cortes.
+
+    Returns:
+        Dict {variedad_id: hash hexadecimal}
+    """
+    maximo_ciclo = get_config_value('MAXIMO_CICLO_ABSOLUTO', MAXIMO_CICLO_ABSOLUTO)
+    minimo_puntos = get_config_value('SUAVIZADO_MINIMO_PUNTOS', SUAVIZADO_MINIMO_PUNTOS)
+    prefijo = (
+        f'{VERSION_MODELO}:{maximo_ciclo}:{minimo_puntos}:'
+        f'{int(curva_desde_acumulado())}|'
+    ).encode()
+    hashes = {variedad_id: hashlib.sha256(prefijo) for variedad_id in variedad_ids}
+    if not hashes:
+        return {}
+
+    filas = db.session.query(
+        AcumuladoCurva.variedad_id,
+        AcumuladoCurva.dias_desde_siembra,
+        AcumuladoCurva.num_cortes,
+        AcumuladoCurva.suma_indice
+    ).filter(
+        AcumuladoCurva.variedad_id.in_(list(hashes)),
+        AcumuladoCurva.num_cortes > 0
+    ).order_by(AcumuladoCurva.variedad_id, AcumuladoCurva.dias_desde_siembra)
+
+    con_acumulado = set()
+    for fila in filas:
+        con_acumulado.add(fila.variedad_id)
+        hashes[fila.variedad_id].update(
+            f'{fila.dias_desde_siembra}:{fila.num_cortes}:{fila.suma_indice:.6f};'.encode()
+        )
+
+    sin_acumulado = [variedad_id for variedad_id in hashes if variedad_id not in con_acumulado]
+    if sin_acumulado:
+        cortes = db.session.query(
+            Siembra.variedad_id,
+            func.count(Corte.corte_id),
+            func.sum(Corte.cantidad_tallos),
+            func.max(Corte.fecha_corte),
+            func.max(Corte.fecha_registro)
+        ).join(Corte, Corte.siembra_id == Siembra.siembra_id)\
+         .filter(Siembra.variedad_id.in_(sin_acumulado))\
+         .group_by(Siembra.variedad_id)
+        for variedad_id, num_cortes, tallos, ultimo_corte, ultimo_registro in cortes:
+            hashes[variedad_id].update(
+                f'cortes:{num_cortes}:{tallos}:{ultimo_corte}:{ultimo_registro}'.encode()
+            )
+
+    return {variedad_id: h.hexdigest() for variedad_id, h in hashes.items()}
+
+def _ajustar_tck(dias, indices):
+    """
+    Spline suavizado como en el gráfico; interpolación lineal si el spline falla.
+
+    Returns:
+        Tupla (metodo, tck) o (None, None) si no se puede ajustar ninguno
+    """
+    try:
+        return 'spline', splrep(dias, indices, s=len(dias) / 3)
+    except Exception as e:
+        logger.warning(f"Error en suavizado, usando interpolación lineal: {str(e)}")
+    try:
+        return 'lineal', splrep(dias, indices, k=1, s=0)
+    except Exception as e:
+        logger.warning(f"No se pudo ajustar la curva: {str(e)}")
+        return None, None
+
+def ajustar_modelo(variedad_id, version_datos, modelo=None):
+    """
+    Ajusta la curva de una variedad desde sus puntos de producción.
+
+    Args:
+        variedad_id: Variedad a ajustar
+        version_datos: Huella de los datos con que se ajusta
+        modelo: ModeloCurva existente a actualizar (se crea uno si es None)
+
+    Returns:
+        ModeloCurva ajustado; si es nuevo no se añade a la sesión
+    """
+    # La misma curva que muestra el reporte
+    datos = obtener_curva(variedad_id, bandas=False)
+    puntos = datos['puntos_curva']
+
+    if modelo is None:
+        modelo = ModeloCurva(variedad_id=variedad_id)
+
+    modelo.metodo = modelo.nodos = modelo.coeficientes = modelo.grado = modelo.indice_maximo = None
+    if len(puntos) >= max(get_config_value('SUAVIZADO_MINIMO_PUNTOS', SUAVIZADO_MINIMO_PUNTOS), 2):
+        dias = np.array([p['dia'] for p in puntos], dtype=np.float64)
+        indices = np.array([p['indice_promedio'] for p in puntos], dtype=np.float64)
+        metodo, tck = _ajustar_tck(dias, indices)
+        if metodo:
+            nodos, coeficientes, grado = tck
+            modelo.metodo = metodo
+            modelo.nodos = nodos.tolist()
+            modelo.coeficientes = np.asarray(coeficientes).tolist()
+            modelo.grado = int(grado)
+            modelo.indice_maximo = float(indices.max())
+
+    modelo.ciclo_vegetativo = datos['ciclo_vegetativo']
+    modelo.ciclo_total = datos['ciclo_total']
+    modelo.num_puntos = len(puntos)
+    modelo.version_datos = version_datos
+    modelo.fecha_ajuste = datetime.utcnow()
+    return modelo
+
+def _curva_en_memoria(variedad_id, huella):
+    """Curva ajustada sin guardar de este proceso para la huella dada, o None."""
+    with _ajustes_lock:
+        guardada = _ajustes_en_memoria.get(variedad_id)
+    return guardada[1] if guardada and guardada[0] == huella else None
+
+def _guardar_aparte(modelos):
+    """
+    Guarda los modelos ajustados por una vista en una sesión propia, sin
+    escribir ni confirmar en la sesión de la solicitud.
+    """
+    with Session(db.engine) as sesion:
+        for modelo in modelos:
+            sesion.merge(modelo)
+        try:
+            sesion.commit()
+        except Exception as e:
+            # Otro proceso pudo guardar el mismo modelo; queda el ajuste en memoria
+            sesion.rollback()
+            logger.warning(f"No se pudieron guardar los modelos de curva: {str(e)}")
+
+def obtener_modelos(variedad_ids, forzar=False, guardar=False):
+    """
+    Curvas ajustadas de varias variedades, ajustando solo las que no tienen
+    modelo o cuyos datos cambiaron desde el último ajuste.
+
+    Las vistas de reportes llaman sin `guardar`: las curvas que falten se
+    ajustan y se guardan en `modelo_curva` con una sesión propia, sin
+    confirmar la sesión de la solicitud, y quedan también en memoria en este
+    proceso mientras su huella no cambie. `flask ajustar-curvas` y
+    `flask warm-reports` ajustan y guardan en la sesión actual.
+
+    Args:
+        variedad_ids: Variedades a obtener
+        forzar: Si True, vuelve a ajustar todas
+        guardar: Si True, guarda los modelos en la sesión actual y la confirma
+
+    Returns:
+        Dict {variedad_id: CurvaAjustada}
+    """
+    variedad_ids = sorted({int(v) for v in variedad_ids})
+    if not variedad_ids:
+        return {}
+
+    huellas = huellas_datos(variedad_ids)
+    existentes = {
+        modelo.variedad_id: modelo
+        for modelo in ModeloCurva.query.filter(ModeloCurva.variedad_id.in_(variedad_ids))
+    }
+
+    curvas = {}
+    ajustados = 0
+    ajustados_aparte = []
+    for variedad_id in variedad_ids:
+        huella = huellas[variedad_id]
+        modelo = existentes.get(variedad_id)
+        if not forzar and modelo is not None and modelo.version_datos == huella:
+            curvas[variedad_id] = CurvaAjustada.desde_modelo(modelo)
+        elif guardar:
+            modelo = ajustar_modelo(variedad_id, huella, modelo)
+            db.session.add(modelo)
+            ajustados += 1
+            curvas[variedad_id] = CurvaAjustada.desde_modelo(modelo)
+        else:
+            curva = None if forzar else _curva_en_memoria(variedad_id, huella)
+            if curva is None:
+                # Modelo transitorio: no se añade a la sesión de la solicitud
+                modelo = ajustar_modelo(variedad_id, huella)
+                ajustados_aparte.append(modelo)
+                curva = CurvaAjustada.desde_modelo(modelo)
+                with _ajustes_lock:
+                    _ajustes_en_memoria[variedad_id] = (huella, curva)
+            curvas[variedad_id] = curva
+
+    if ajustados_aparte:
+        _guardar_aparte(ajustados_aparte)
+
+    if ajustados:
+        try:
+            db.session.commit()
+        except Exception as e:
+            # Otro proceso pudo guardar el mismo modelo; las curvas calculadas siguen siendo válidas
+            db.session.rollback()
+            logger.warning(f"No se pudieron guardar los modelos de curva: {str(e)}")
+
+    return curvas
+
+def obtener_modelo(variedad_id):
+    """Curva ajustada de una variedad."""
+    return obtener_modelos([variedad_id])[int(variedad_id)]
+
+# ================ EVALUACIÓN ================
+
+def evaluar(variedad_ids, dias):
+    """
+    Índice esperado (%) para pares (variedad, día desde siembra).
+
+    Los argumentos se combinan con las reglas de broadcasting de NumPy; cada
+    variedad distinta se evalúa con una sola llamada a splev sobre todos sus
+    días.
+
+    Returns:
+        Arreglo float64 con la forma combinada; NaN donde la variedad no tiene
+        datos suficientes para ajustar una curva
+    """
+    variedad_ids, dias = np.broadcast_arrays(np.asarray(variedad_ids), np.asarray(dias, dtype=np.float64))
+    resultado = np.full(variedad_ids.shape, np.nan)
+    if not variedad_ids.size:
+        return resultado
+
+    planos_ids = variedad_ids.ravel()
+    planos_dias = dias.ravel()
+    planos_resultado = resultado.reshape(-1)
+
+    unicos, inversa = np.unique(planos_ids, return_inverse=True)
+    curvas = obtener_modelos(unicos.tolist())
+
+    # Posiciones de cada variedad como segmentos contiguos de un solo argsort
+    orden = np.argsort(inversa, kind='stable')
+    limites = np.cumsum(np.bincount(inversa, minlength=len(unicos)))[:-1]
+    for variedad_id, posiciones in zip(unicos.tolist(), np.split(orden, limites)):
+        planos_resultado[posiciones] = curvas[int(variedad_id)].evaluar(planos_dias[posiciones])
+
+    return resultado
+
+def tendencia_grafico(curva, ciclo_total, puntos=200):
+    """
+    Línea de tendencia para generar_grafico_curva a partir de una curva ajustada.
+
+    Returns:
+        Dict {metodo, dias, indices} o None si la curva no tiene modelo
+    """
+    if curva.tck is None:
+        return None
+    dias = np.linspace(0, ciclo_total, puntos)
+    return {
+        'metodo': curva.metodo,
+        'dias': dias.tolist(),
+        'indices': curva.evaluar(dias).tolist()
+    }
@@ -0,0 +1,137 @@
+"""
+Precálculo de los reportes para dejar calientes sus cachés.
+
+Tras un despliegue o reinicio, `flask warm-reports` deja listos los datos y
+gráficos que leen las vistas, de modo que el primer usuario no paga el costo
+de cálculo de cada variedad:
+
+- Instantánea columnar, procesos de renderizado y tablas de resumen.
+- Modelos de curva de todas las variedades con cortes.
+- Gráfico de la curva completa de cada variedad (caché de gráficos).
+- Producción por variedad y por bloque con sus gráficos.
+- Días de producción y diagnóstico de importación como trabajos terminados.
+
+Los datos de cada variedad se calculan en un pool de hilos y los gráficos
+se renderizan por lotes en el pool de procesos de charts.py.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models import Siembra, Corte, Variedad, AcumuladoCurva, ResumenSemanal, ResumenCalidadVariedad
+from .cache_graficos import claves_graficos
+from .charts import (
+    calentar_pool, trabajo_grafico_curva, trabajo_grafico_produccion_variedad,
+    trabajo_grafico_produccion_bloque
+)
+from .data_processing import obtener_curva, obtener_produccion_por_variedad, obtener_produccion_por_bloque
+from .mantenimiento import reconstruir_resumenes
+from .modelos_curva import obtener_modelos, tendencia_grafico
+from .snapshot import obtener_snapshot
+from .trabajos import encolar, TRABAJOS_GRAFICOS_POR_LOTE
+from .utils import get_config_value
+
+# Trabajos en segundo plano que se dejan terminados (tipo, parámetros por defecto)
+TRABAJOS_PRECALCULADOS = ('dias_produccion', 'diagnostico_importacion')
+
+def _variedades_con_cortes():
+    """Ids y nombres de las variedades que tienen cortes."""
+    return db.session.query(Variedad.variedad_id, Variedad.variedad)\
+        .filter(Variedad.variedad_id.in_(
+            db.session.query(Siembra.variedad_id).join(Corte, Corte.siembra_id == Siembra.siembra_id)
+        ))\
+        .order_by(Variedad.variedad_id)\
+        .all()
+
+def _resumenes_vacios():
+    """True si hay cortes pero alguna tabla de resumen aún no se ha poblado."""
+    if db.session.query(Corte.corte_id).first() is None:
+        return False
+    return any(
+        db.session.query(func.count()).select_from(modelo).scalar() == 0
+        for modelo in (AcumuladoCurva, ResumenCalidadVariedad, ResumenSemanal)
+    )
+
+def _trabajo_curva(app, variedad_id, variedad, curva):
+    """Calcula en su propio contexto la curva completa de una variedad y su gráfico."""
+    with app.app_context():
+        datos = obtener_curva(variedad_id)
+        tendencia = tendencia_grafico(curva, datos['ciclo_total']) if curva is not None else None
+        return trabajo_grafico_curva(datos, variedad, tendencia)
+
+def calentar_reportes(hilos=None, progreso=None):
+    """
+    Precalcula todos los reportes y deja sus resultados en las cachés.
+
+    Args:
+        hilos: Hilos para calcular las curvas (por defecto, núcleos disponibles)
+        progreso: Función opcional progreso(pasos, total, etiqueta) llamada con
+            los pasos completados desde la llamada anterior
+
+    Returns:
+        dict con variedades, graficos, trabajos y procesos de renderizado
+    """
+    app = current_app._get_current_object()
+    procesos = calentar_pool()
+    if _resumenes_vacios():
+        reconstruir_resumenes()
+    obtener_snapshot()
+
+    variedades = _variedades_con_cortes()
+    graficos = {}
+    total = 2 * len(variedades) + 2 + len(TRABAJOS_PRECALCULADOS)
+
+    def avanzar(pasos, etiqueta):
+        if progreso:
+            progreso(pasos, total, etiqueta)
+
+    # Modelos de curva: solo se ajustan los que no existen o cambiaron
+    curvas = obtener_modelos([v.variedad_id for v in variedades], guardar=True)
+
+    # Datos de curva por variedad en paralelo; cada hilo con su contexto y sesión
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        futuros = {
+            ejecutor.submit(_trabajo_curva, app, v.variedad_id, v.variedad, curvas.get(v.variedad_id)): v
+            for v in variedades
+        }
+        for futuro in as_completed(futuros):
+            variedad = futuros[futuro]
+            trabajo = futuro.result()
+            if trabajo:
+                graficos[('curva', variedad.variedad_id)] = trabajo
+            avanzar(1, f'Curva {variedad.variedad}')
+
+    # Producción por variedad y por bloque (resumen semanal)
+    for nombre, obtener, trabajo_grafico in (
+        ('variedad', obtener_produccion_por_variedad, trabajo_grafico_produccion_variedad),
+        ('bloque', obtener_produccion_por_bloque, trabajo_grafico_produccion_bloque)
+    ):
+        trabajo = trabajo_grafico(obtener())
+        if trabajo:
+            graficos[('produccion', nombre)] = trabajo
+        avanzar(1, f'Producción por {nombre}')
+
+    # Gráficos por lotes en el pool de procesos
+    generados = 0
+    claves = list(graficos)
+    por_lote = get_config_value('TRABAJOS_GRAFICOS_POR_LOTE', TRABAJOS_GRAFICOS_POR_LOTE)
+    for inicio in range(0, len(claves), por_lote):
+        lote = claves[inicio:inicio + por_lote]
+        generados += len(claves_graficos({clave: graficos[clave] for clave in lote}))
+        avanzar(sum(1 for clave in lote if clave[0] == 'curva'), 'Gráficos de curvas')
+    # Variedades sin gráfico de curva (sin puntos) también cuentan como hechas
+    avanzar(len(variedades) - sum(1 for clave in claves if clave[0] == 'curva'), 'Gráficos de curvas')
+
+    # Reportes pesados: quedan como trabajos terminados para la versión de datos actual
+    trabajos = {}
+    for tipo in TRABAJOS_PRECALCULADOS:
+        trabajos[tipo] = encolar(tipo, en_linea=True).estado
+        avanzar(1, tipo)
+
+    return {
+        'variedades': len(variedades),
+        'graficos': generados,
+        'trabajos': trabajos,
+        'procesos': procesos
+    }
@@ -0,0 +1,184 @@
+"""
+Pronóstico de producción de las siembras activas.
+
+Cada siembra activa se proyecta con la curva ajustada de su variedad
+(modelos_curva): la forma de la curva reparte día a día el índice total de
+un ciclo de la variedad y se multiplica por las plantas de la cama. Todas
+las siembras se evalúan en una sola pasada sobre una matriz
+(siembras × días del horizonte) construida desde la instantánea en memoria,
+sin leer cortes de la base de datos.
+"""
+
+from datetime import date, timedelta
+import numpy as np
+from app import db
+from app.models import Bloque, Variedad, FlorColor, Flor
+from .charts import MAXIMO_CICLO_ABSOLUTO
+from .modelos_curva import evaluar
+from .snapshot import obtener_snapshot
+from .utils import get_config_value
+
+PRONOSTICO_SEMANAS = 8
+PRONOSTICO_MAXIMO_SEMANAS = 52
+
+# Agrupaciones disponibles para los totales del pronóstico
+AGRUPACIONES = ('bloque', 'variedad', 'flor')
+
+def _tabla_diaria(variedad_ids, rendimiento):
+    """
+    Índice esperado por cama y día desde siembra para cada variedad.
+
+    La curva de cada variedad se evalúa en todos los días del ciclo y se
+    escala para que su suma sea el índice total de un ciclo.
+
+    Returns:
+        Matriz (variedades × días) en %; filas de ceros para variedades sin
+        curva o sin rendimiento histórico, y arreglo booleano de variedades
+        con pronóstico
+    """
+    dias = np.arange(get_config_value('MAXIMO_CICLO_ABSOLUTO', MAXIMO_CICLO_ABSOLUTO) + 1)
+    tabla = evaluar(variedad_ids[:, None], dias[None, :])
+    con_modelo = ~np.isnan(tabla[:, 0])
+    tabla = np.nan_to_num(tabla)
+
+    forma = tabla.sum(axis=1)
+    total = np.array([rendimiento.get(int(v), 0.0) for v in variedad_ids])
+    con_pronostico = con_modelo & (forma > 0) & (total > 0)
+    escala = np.divide(total, forma, out=np.zeros_like(total), where=con_pronostico)
+    return tabla * escala[:, None], con_pronostico
+
+def _nombres(bloque_ids, variedad_ids):
+    """Nombres de bloques y variedades (con su flor) en dos consultas."""
+    bloques = dict(db.session.query(Bloque.bloque_id, Bloque.bloque)
+                   .filter(Bloque.bloque_id.in_(bloque_ids)))
+    variedades = {
+        fila.variedad_id: (fila.variedad, fila.flor)
+        for fila in db.session.query(Variedad.variedad_id, Variedad.variedad, Flor.flor)
+            .join(FlorColor, Variedad.flor_color_id == FlorColor.flor_color_id)
+            .join(Flor, FlorColor.flor_id == Flor.flor_id)
+            .filter(Variedad.variedad_id.in_(variedad_ids))
+    }
+    return bloques, variedades
+
+def pronosticar(semanas=None, desde=None):
+    """
+    Tallos esperados de todas las siembras activas para las próximas semanas.
+
+    El horizonte va desde `desde` (hoy por defecto) hasta el domingo de la
+    semana ISO número `semanas`, contando la semana en curso como la primera;
+    sin `semanas` se usa PRONOSTICO_SEMANAS de la configuración.
+
+    Returns:
+        dict con:
+            semanas: [{semana, inicio, fin}, ...]
+            filas: [{bloque_id, bloque, variedad_id, variedad, flor,
+                     tallos (por semana), total}, ...] de mayor a menor
+            totales_semana: tallos esperados por semana
+            por_dia: [{fecha, tallos}, ...]
+            siembras_activas, siembras_sin_curva: conteos de camas
+    """
+    if semanas is None:
+        semanas = get_config_value('PRONOSTICO_SEMANAS', PRONOSTICO_SEMANAS)
+    maximo = get_config_value('PRONOSTICO_MAXIMO_SEMANAS', PRONOSTICO_MAXIMO_SEMANAS)
+    semanas = max(1, min(int(semanas), maximo))
+    desde = desde or date.today()
+    lunes = desde - timedelta(days=desde.weekday())
+    fin = lunes + timedelta(days=7 * semanas - 1)
+
+    fechas = np.arange(desde.toordinal(), fin.toordinal() + 1)
+    semana_de_dia = (fechas - lunes.toordinal()) // 7
+    inicios_semana = np.flatnonzero(np.r_[True, semana_de_dia[1:] != semana_de_dia[:-1]])
+
+    snap = obtener_snapshot()
+    activas = snap.s_activa & (snap.s_plantas > 0)
+    s_variedad = snap.s_variedad[activas]
+    s_bloque = snap.s_bloque[activas]
+    s_fecha = snap.s_fecha[activas]
+    s_plantas = snap.s_plantas[activas]
+
+    variedad_ids, v_pos = np.unique(s_variedad, return_inverse=True)
+    tabla, con_pronostico = _tabla_diaria(variedad_ids, snap.rendimiento_por_variedad())
+
+    # Matriz siembras × días: edad de cada cama en cada fecha y tallos esperados
+    edad = fechas[None, :] - s_fecha[:, None]
+    en_ciclo = (edad >= 0) & (edad < tabla.shape[1])
+    diario = np.where(
+        en_ciclo,
+        tabla[v_pos[:, None], np.clip(edad, 0, tabla.shape[1] - 1)],
+        0.0
+    ) * (s_plantas[:, None] / 100)
+
+    # Totales por semana de cada cama y por grupo (bloque, variedad)
+    por_semana = np.add.reduceat(diario, inicios_semana, axis=1)
+    grupos, grupo_de_siembra = np.unique(
+        np.stack([s_bloque.astype(np.int64), s_variedad.astype(np.int64)], axis=1),
+        axis=0, return_inverse=True
+    )
+    grupo_de_siembra = grupo_de_siembra.ravel()
+    tallos_grupo = np.zeros((len(grupos), len(inicios_semana)))
+    np.add.at(tallos_grupo, grupo_de_siembra, por_semana)
+
+    bloques, variedades = _nombres(
+        {int(b) for b in grupos[:, 0]}, {int(v) for v in grupos[:, 1]}
+    )
+    filas = []
+    for (bloque_id, variedad_id), tallos in zip(grupos.tolist(), tallos_grupo):
+        total = float(tallos.sum())
+        if total <= 0:
+            continue
+        variedad, flor = variedades.get(variedad_id, (str(variedad_id), ''))
+        filas.append({
+            'bloque_id': bloque_id,
+            'bloque': bloques.get(bloque_id, str(bloque_id)),
+            'variedad_id': variedad_id,
+            'variedad': variedad,
+            'flor': flor,
+            'tallos': [int(round(t)) for t in tallos],
+            'total': int(round(total))
+        })
+    filas.sort(key=lambda f: f['total'], reverse=True)
+
+    semanas_info = []
+    for inicio in inicios_semana:
+        dia = date.fromordinal(int(fechas[inicio]))
+        anio, numero, _ = dia.isocalendar()
+        semanas_info.append({
+            'semana': f'{anio}-W{numero:02d}',
+            'inicio': dia,
+            'fin': min(dia + timedelta(days=6 - dia.weekday()), fin)
+        })
+
+    return {
+        'desde': desde,
+        'hasta': fin,
+        'semanas': semanas_info,
+        'filas': filas,
+        'totales_semana': [int(round(t)) for t in por_semana.sum(axis=0)],
+        'por_dia': [
+            {'fecha': date.fromordinal(int(f)), 'tallos': int(round(t))}
+            for f, t in zip(fechas, diario.sum(axis=0))
+        ],
+        'siembras_activas': int(len(s_fecha)),
+        'siembras_sin_curva': int((~con_pronostico[v_pos]).sum())
+    }
+
+def agrupar_pronostico(pronostico, por):
+    """
+    Totales semanales del pronóstico por bloque, variedad o flor.
+
+    Returns:
+        Lista [{<por>: nombre, tallos: [...], total}, ...] de mayor a menor
+    """
+    if por not in AGRUPACIONES:
+        raise ValueError(f"Agrupación no válida: {por}")
+
+    grupos = {}
+    for fila in pronostico['filas']:
+        acumulado = grupos.setdefault(fila[por], [0] * len(pronostico['semanas']))
+        for posicion, tallos in enumerate(fila['tallos']):
+            acumulado[posicion] += tallos
+
+    return sorted(
+        ({por: nombre, 'tallos': tallos, 'total': sum(tallos)} for nombre, tallos in grupos.items()),
+        key=lambda g: g['total'], reverse=True
+    )
@@ -1,79 +1,94 @@
-from flask import render_template, request, jsonify, send_file
-from flask_login import login_required
+from flask import render_template, request, jsonify, send_file, abort, Response, stream_with_context, url_for, flash
+from flask_login import login_required, current_user
 from sqlalchemy import func, desc
-import pandas as pd
-from io import BytesIO
 from datetime import datetime
-import matplotlib.pyplot as plt
-import base64
 from app import db
 from . import reportes
 from app.models import (
     Siembra, Corte, Variedad, Flor, Color, FlorColor, 
     BloqueCamaLado, Bloque, Cama, Lado, Area, Densidad
 )
-from .charts import generar_grafico_curva
-from .data_processing import obtener_datos_curva
-from .utils import calc_plantas_totales, calc_indice_aprovechamiento
+from .charts import (
+    generar_grafico_barras, trabajo_grafico_curva, trabajo_grafico_curvas, trabajo_grafico_produccion_variedad,
+    trabajo_grafico_produccion_bloque, trabajos_graficos_dias_produccion
+)
+from .cache_graficos import (
+    url_grafico, urls_graficos, ruta_grafico, tocar, CLAVE_VALIDA, CACHE_GRAFICOS_MAX_AGE
+)
+from .data_processing import (
+    obtener_curva, obtener_curvas, obtener_periodos_siembra, obtener_dias_produccion,
+    obtener_produccion_por_variedad, obtener_produccion_por_bloque,
+    _parsear_periodo, CURVAS_MAXIMO_VARIEDADES
+)
+from .modelos_curva import obtener_modelos, tendencia_grafico
+from .trabajos import encolar, obtener_trabajo, obtener_resultado, estado_trabajo
+from .pronostico import pronosticar, agrupar_pronostico
+from .exportacion import (
+    EXPORTACIONES, FORMATOS_COLUMNARES, generar_csv, escribir_xlsx, escribir_columnar, pa
+)
+from .utils import calc_plantas_totales, calc_indice_aprovechamiento, lttb, a_columnas, get_config_value
 
-# ================ VISTAS PRINCIPALES ================
+def _periodo_solicitado():
+    """Rango (inicio, fin) de semanas YYYYWW pedido con periodo=customizado, o None."""
+    return _parsear_periodo(
+        request.args.get('periodo', 'completo'),
+        request.args.get('periodo_inicio', None),
+        request.args.get('periodo_fin', None)
+    )
 
-@reportes.route('/')
-@login_required
-def index():
-    variedades_con_siembras = db.session.query(Variedad)\
+def _variedades_con_siembras():
+    """Variedades con al menos una siembra, ordenadas por nombre."""
+    return db.session.query(Variedad)\
         .join(Siembra)\
         .group_by(Variedad.variedad_id)\
         .order_by(Variedad.variedad)\
         .all()
+
+def _variedades_solicitadas():
+    """Ids pedidos con `variedad_id` repetido en la URL, sin duplicados y en su orden."""
+    return list(dict.fromkeys(request.args.getlist('variedad_id', type=int)))
+
+def _bandas_solicitadas():
+    """True si la URL pide percentiles e índice acumulado (`bandas=1`)."""
+    return request.args.get('bandas') == '1'
+
+def _curvas_solicitadas(variedad_ids):
+    """
+    Variedades y curvas de los ids pedidos, con los filtros de periodo de la URL.
+
+    Returns:
+        Tupla (variedades, curvas): lista de Variedad en el orden pedido y
+        dict {variedad_id: datos} de obtener_curvas
+    """
+    encontradas = {v.variedad_id: v for v in Variedad.query.filter(Variedad.variedad_id.in_(variedad_ids))}
+    if len(encontradas) != len(variedad_ids):
+        abort(404)
+    curvas = obtener_curvas(
+        variedad_ids,
+        periodo_filtro=request.args.get('periodo', 'completo'),
+        periodo_inicio=request.args.get('periodo_inicio', None),
+        periodo_fin=request.args.get('periodo_fin', None),
+        bandas=_bandas_solicitadas()
+    )
+    return [encontradas[v] for v in variedad_ids], curvas
+
+# ================ VISTAS PRINCIPALES ================
+
+@reportes.route('/')
+@login_required
+def index():
     return render_template('reportes/index.html', 
                          title='Reportes', 
-                         variedades=variedades_con_siembras)
+                         variedades=_variedades_con_siembras())
 
 @reportes.route('/produccion_por_variedad')
 @login_required
 def produccion_por_variedad():
-    results = db.session.query(
-        Variedad.variedad_id,
-        Variedad.variedad,
-        Flor.flor,
-        Color.color,
-        func.sum(Corte.cantidad_tallos).label('total_tallos')
-    ).select_from(Corte)\
-     .join(Siembra)\
-     .join(Variedad)\
-     .join(FlorColor)\
-     .join(Flor)\
-     .join(Color)\
-     .group_by(Variedad.variedad_id, Variedad.variedad, Flor.flor, Color.color)\
-     .order_by(desc('total_tallos'))\
-     .all()
-    
-    data = [{
-        'variedad_id': r.variedad_id,
-        'variedad': r.variedad,
-        'flor': r.flor,
-        'color': r.color,
-        'total_tallos': r.total_tallos
-    } for r in results]
+    data = obtener_produccion_por_variedad(_periodo_solicitado())
     
     # Generar gráfico
-    grafico = None
-    if data:
-        top_variedades = data[:10]
-        plt.figure(figsize=(10, 6))
-        plt.bar([r['variedad'] for r in top_variedades], [r['total_tallos'] for r in top_variedades])
-        plt.xlabel('Variedad')
-        plt.ylabel('Total de Tallos')
-        plt.title('Top 10 Variedades por Producción de Tallos')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        grafico = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()
+    trabajo = trabajo_grafico_produccion_variedad(data)
+    grafico = url_grafico(trabajo[0], *trabajo[1]) if trabajo else None
     
     return render_template('reportes/produccion_por_variedad.html', 
                          title='Producción por Variedad', 
@@ -83,41 +98,11 @@ def produccion_por_variedad():
 @reportes.route('/produccion_por_bloque')
 @login_required
 def produccion_por_bloque():
-    results = db.session.query(
-        Bloque.bloque_id,
-        Bloque.bloque,
-        func.sum(Corte.cantidad_tallos).label('total_tallos'),
-        func.count(func.distinct(Siembra.siembra_id)).label('total_siembras')
-    ).join(Siembra)\
-     .join(BloqueCamaLado)\
-     .join(Bloque)\
-     .group_by(Bloque.bloque_id, Bloque.bloque)\
-     .order_by(Bloque.bloque)\
-     .all()
-    
-    data = [{
-        'bloque_id': r.bloque_id,
-        'bloque': r.bloque,
-        'total_tallos': r.total_tallos,
-        'total_siembras': r.total_siembras,
-        'promedio_tallos': r.total_tallos / r.total_siembras if r.total_siembras > 0 else 0
-    } for r in results]
+    data = obtener_produccion_por_bloque(_periodo_solicitado())
     
     # Generar gráfico
-    grafico = None
-    if data:
-        plt.figure(figsize=(10, 6))
-        plt.bar([r['bloque'] for r in data], [r['total_tallos'] for r in data])
-        plt.xlabel('Bloque')
-        plt.ylabel('Total de Tallos')
-        plt.title('Producción por Bloque')
-        plt.tight_layout()
-        
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        grafico = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()
+    trabajo = trabajo_grafico_produccion_bloque(data)
+    grafico = url_grafico(trabajo[0], *trabajo[1]) if trabajo else None
     
     return render_template('reportes/produccion_por_bloque.html', 
                          title='Producción por Bloque', 
@@ -131,275 +116,469 @@ def dias_produccion():
     Genera un reporte que muestra los días de producción para diferentes variedades,
     incluyendo días promedio entre cortes, mínimos, máximos y visualización.
     """
-    # Obtener variedades con suficientes datos para el análisis
-    variedades_con_datos = db.session.query(Variedad)\
-        .join(Siembra)\
-        .join(Corte)\
-        .group_by(Variedad.variedad_id)\
-        .having(func.count(Corte.corte_id) > 5)\
-        .order_by(Variedad.variedad)\
-        .all()
+    # Se calcula en segundo plano; mientras tanto la página muestra el progreso
+    trabajo = encolar('dias_produccion', usuario_id=current_user.usuario_id)
+    if trabajo.estado != 'terminado':
+        return render_template('reportes/trabajo.html',
+                               title='Reporte de Días de Producción',
+                               trabajo=trabajo)
+    data = obtener_resultado(trabajo)
     
-    # Preparar estructura de datos para el reporte
-    data = {}
-    graficos = {}
-    
-    # Procesar datos para cada variedad
-    for variedad in variedades_con_datos:
-        # Obtener todas las siembras para esta variedad
-        siembras = Siembra.query.filter_by(variedad_id=variedad.variedad_id).all()
-        
-        # Diccionario para almacenar datos por número de corte
-        cortes_data = {}
-        
-        # Procesar cada siembra
-        for siembra in siembras:
-            if not siembra.cortes:
-                continue
-                
-            # Obtener todos los cortes ordenados por número
-            cortes = sorted(siembra.cortes, key=lambda c: c.num_corte)
-            
-            # Procesar cada corte
-            for i, corte in enumerate(cortes):
-                num_corte = corte.num_corte
-                
-                # Calcular días desde la siembra
-                dias = (corte.fecha_corte - siembra.fecha_siembra).days
-                
-                # Almacenar en estructura cortes_data
-                if num_corte not in cortes_data:
-                    cortes_data[num_corte] = []
-                
-                # Solo considerar valores razonables (entre 30 y 150 días)
-                if 30 <= dias <= 150:
-                    cortes_data[num_corte].append(dias)
-        
-        # Crear datos resumidos para la variedad
-        variedad_data = []
-        for num_corte, dias_list in sorted(cortes_data.items()):
-            # Aplicar filtro IQR para eliminar valores atípicos
-            dias_filtrados = filtrar_outliers_iqr(dias_list)
-            
-            if dias_filtrados:
-                variedad_data.append({
-                    'num_corte': num_corte,
-                    'dias_promedio': round(sum(dias_filtrados) / len(dias_filtrados)),
-                    'dias_minimo': min(dias_filtrados),
-                    'dias_maximo': max(dias_filtrados),
-                    'total_siembras': len(dias_filtrados)
-                })
-        
-        # Solo incluir variedades con al menos 2 cortes con datos
-        if len(variedad_data) >= 2:
-            data[variedad.variedad] = sorted(variedad_data, key=lambda x: x['num_corte'])
-            
-            # Generar gráfico para esta variedad
-            try:
-                import matplotlib.pyplot as plt
-                import numpy as np
-                import base64
-                from io import BytesIO
-                
-                # Crear figura
-                plt.figure(figsize=(8, 5))
-                
-                # Extraer datos para el gráfico
-                cortes_nums = [d['num_corte'] for d in variedad_data]
-                dias_promedio = [d['dias_promedio'] for d in variedad_data]
-                dias_min = [d['dias_minimo'] for d in variedad_data]
-                dias_max = [d['dias_maximo'] for d in variedad_data]
-                
-                # Graficar días promedio
-                plt.plot(cortes_nums, dias_promedio, 'o-', color='blue', linewidth=2, 
-                         label='Días promedio')
-                
-                # Mostrar rango min-max
-                plt.fill_between(cortes_nums, dias_min, dias_max, color='blue', alpha=0.2, 
-                                 label='Rango min-max')
-                
-                # Configurar gráfico
-                plt.title(f'Días de Producción: {variedad.variedad}')
-                plt.xlabel('Número de Corte')
-                plt.ylabel('Días desde siembra')
-                plt.xticks(cortes_nums)
-                plt.grid(True, alpha=0.3)
-                plt.legend()
-                
-                # Guardar gráfico en base64
-                buffer = BytesIO()
-                plt.savefig(buffer, format='png', dpi=80)
-                buffer.seek(0)
-                grafico_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                plt.close()
-                
-                # Guardar gráfico
-                graficos[variedad.variedad] = grafico_base64
-                
-            except Exception as e:
-                print(f"Error al generar gráfico para {variedad.variedad}: {str(e)}")
+    # El trabajo ya dejó los gráficos en caché; solo se renderizan los desalojados
+    graficos = urls_graficos(trabajos_graficos_dias_produccion(data))
     
     return render_template('reportes/dias_produccion.html',
                            title='Reporte de Días de Producción',
                            data=data,
                            graficos=graficos)
 
+@reportes.route('/pronostico')
+@login_required
+def pronostico():
+    """
+    Tallos esperados de las siembras activas para las próximas semanas,
+    proyectados con la curva de cada variedad.
+    """
+    datos = pronosticar(request.args.get('semanas', type=int))
+    
+    grafico = None
+    if datos['filas']:
+        grafico = url_grafico(
+            generar_grafico_barras,
+            [s['semana'] for s in datos['semanas']],
+            datos['totales_semana'],
+            'Semana', 'Tallos esperados', 'Pronóstico de Producción de Siembras Activas',
+            True
+        )
+    
+    return render_template('reportes/pronostico.html',
+                           title='Pronóstico de Producción',
+                           datos=datos,
+                           por_flor=agrupar_pronostico(datos, 'flor'),
+                           por_bloque=agrupar_pronostico(datos, 'bloque'),
+                           grafico=grafico)
+
 # ================ CURVAS DE PRODUCCIÓN ================
 
+def _variedades_curvas(tipo_filtro, variedad_id=None, flor_id=None, color_id=None, bloque_id=None):
+    """Variedades con siembras que corresponden al nivel de análisis elegido."""
+    consulta = db.session.query(Variedad).join(Siembra).join(FlorColor, Variedad.flor_color_id == FlorColor.flor_color_id)
+    if tipo_filtro == 'variedad' and variedad_id:
+        consulta = consulta.filter(Variedad.variedad_id == variedad_id)
+    elif tipo_filtro == 'flor' and flor_id:
+        consulta = consulta.filter(FlorColor.flor_id == flor_id)
+    elif tipo_filtro == 'color' and color_id:
+        consulta = consulta.filter(FlorColor.color_id == color_id)
+    elif tipo_filtro == 'bloque' and bloque_id:
+        consulta = consulta.join(BloqueCamaLado, Siembra.bloque_cama_id == BloqueCamaLado.bloque_cama_id)\
+            .filter(BloqueCamaLado.bloque_id == bloque_id)
+    else:
+        return []
+    return consulta.group_by(Variedad.variedad_id).order_by(Variedad.variedad).all()
+
+def _render_curva_produccion(tipo_filtro='variedad', variedad_id=None, flor_id=None, color_id=None,
+                             bloque_id=None, periodo_filtro='completo', periodo_inicio=None,
+                             periodo_fin=None, ultimo_ciclo=False, bandas=False):
+    """
+    Curvas de producción del nivel de análisis elegido (variedad, flor, color o
+    bloque). La vista completa se lee del acumulado por día; con filtros o con
+    `bandas` los datos de todas las variedades salen de una sola pasada
+    agrupada sobre los cortes. Los gráficos se generan por lote.
+    """
+    variedades = _variedades_curvas(tipo_filtro, variedad_id, flor_id, color_id, bloque_id)
+    variedad_ids = [v.variedad_id for v in variedades]
+    datos = obtener_curvas(
+        variedad_ids, bloque_id, periodo_filtro, periodo_inicio, periodo_fin, ultimo_ciclo, bandas
+    )
+
+    # La vista completa usa la curva ya ajustada de cada variedad
+    curvas = {}
+    if periodo_filtro == 'completo' and not bloque_id and not ultimo_ciclo and variedad_ids:
+        curvas = obtener_modelos(variedad_ids)
+
+    trabajos = {}
+    for variedad in variedades:
+        curva = datos[variedad.variedad_id]
+        tendencia = None
+        if variedad.variedad_id in curvas:
+            tendencia = tendencia_grafico(curvas[variedad.variedad_id], curva['ciclo_total'])
+        trabajo = trabajo_grafico_curva(curva, variedad.variedad, tendencia)
+        if trabajo:
+            trabajos[variedad.variedad_id] = trabajo
+    graficos = urls_graficos(trabajos)
+
+    resultados = []
+    for variedad in variedades:
+        curva = datos[variedad.variedad_id]
+        curva['grafico_curva'] = graficos.get(variedad.variedad_id)
+        curva['ciclo_productivo'] = max(0, curva['ciclo_total'] - curva['ciclo_vegetativo'])
+        resultados.append({'variedad': variedad, 'datos': curva})
+
+    title = 'Curvas de Producción'
+    subtitulo = None
+    if tipo_filtro == 'variedad' and len(variedades) == 1:
+        title = f'Curva de Producción: {variedades[0].variedad}'
+    elif tipo_filtro == 'flor' and flor_id:
+        flor = db.session.get(Flor, flor_id)
+        subtitulo = f'Flor: {flor.flor}' if flor else None
+    elif tipo_filtro == 'color' and color_id:
+        color = db.session.get(Color, color_id)
+        subtitulo = f'Color: {color.color}' if color else None
+    elif tipo_filtro == 'bloque' and bloque_id:
+        bloque = db.session.get(Bloque, bloque_id)
+        subtitulo = f'Bloque: {bloque.bloque}' if bloque else None
+
+    mensaje_filtro = None
+    if len(resultados) > 1:
+        mensaje_filtro = f'{len(resultados)} variedades encontradas.'
+
+    return render_template('reportes/curva_produccion.html',
+                         title=title,
+                         subtitulo=subtitulo,
+                         tipo_filtro=tipo_filtro,
+                         variedad_id=variedad_id,
+                         flor_id=flor_id,
+                         color_id=color_id,
+                         bloque_id=bloque_id,
+                         periodo_filtro=periodo_filtro,
+                         periodo_inicio=periodo_inicio,
+                         periodo_fin=periodo_fin,
+                         ultimo_ciclo=ultimo_ciclo,
+                         bandas=bandas,
+                         variedades=_variedades_con_siembras(),
+                         flores=Flor.query.order_by(Flor.flor).all(),
+                         colores=Color.query.order_by(Color.color).all(),
+                         bloques=Bloque.query.order_by(Bloque.bloque).all(),
+                         periodos_disponibles=obtener_periodos_siembra(),
+                         resultados=resultados,
+                         mensaje_filtro=mensaje_filtro)
+
+@reportes.route('/curva_produccion')
+@login_required
+def curva_produccion_integrada():
+    """Curvas de producción filtradas por variedad, flor, color o bloque."""
+    # El formulario envía dos selectores `bloque_id` (principal y secundario)
+    bloque_id = next((int(b) for b in request.args.getlist('bloque_id') if b.isdigit()), None)
+    return _render_curva_produccion(
+        tipo_filtro=request.args.get('tipo_filtro', 'variedad'),
+        variedad_id=request.args.get('variedad_id', type=int),
+        flor_id=request.args.get('flor_id', type=int),
+        color_id=request.args.get('color_id', type=int),
+        bloque_id=bloque_id,
+        periodo_filtro=request.args.get('periodo_filtro', 'completo'),
+        periodo_inicio=request.args.get('periodo_inicio', None),
+        periodo_fin=request.args.get('periodo_fin', None),
+        ultimo_ciclo=request.args.get('ultimo_ciclo') == 'si',
+        bandas=_bandas_solicitadas()
+    )
+
 @reportes.route('/curva_produccion/<int:variedad_id>')
 @login_required
 def curva_produccion(variedad_id):
     """Genera y muestra la curva de producción para una variedad"""
-    variedad = Variedad.query.get_or_404(variedad_id)
-    
-    # Obtener parámetros de filtro
-    filtro_periodo = request.args.get('periodo', 'completo')
-    periodo_inicio = request.args.get('periodo_inicio', None)
-    periodo_fin = request.args.get('periodo_fin', None)
-    
-    # Procesar datos
-    datos = obtener_datos_curva(
+    Variedad.query.get_or_404(variedad_id)
+    return _render_curva_produccion(
+        tipo_filtro='variedad',
         variedad_id=variedad_id,
-        periodo_filtro=filtro_periodo,
-        periodo_inicio=periodo_inicio,
-        periodo_fin=periodo_fin
+        periodo_filtro=request.args.get('periodo', 'completo'),
+        periodo_inicio=request.args.get('periodo_inicio', None),
+        periodo_fin=request.args.get('periodo_fin', None),
+        bandas=_bandas_solicitadas()
     )
+
+@reportes.route('/curvas')
+@login_required
+def curvas():
+    """Compara las curvas de producción de varias variedades en un solo gráfico."""
+    variedad_ids = _variedades_solicitadas()
+    maximo = get_config_value('CURVAS_MAXIMO_VARIEDADES', CURVAS_MAXIMO_VARIEDADES)
+    if len(variedad_ids) > maximo:
+        flash(f'Se comparan como máximo {maximo} variedades; '
+              f'se omitieron {len(variedad_ids) - maximo}.', 'warning')
+        variedad_ids = variedad_ids[:maximo]
+
+    variedades, datos = _curvas_solicitadas(variedad_ids) if variedad_ids else ([], {})
+
+    grafico = None
+    trabajo = trabajo_grafico_curvas([(v.variedad, datos[v.variedad_id]) for v in variedades])
+    if trabajo:
+        grafico = url_grafico(trabajo[0], *trabajo[1])
+
+    return render_template('reportes/curvas.html',
+                         title='Comparación de Curvas de Producción',
+                         variedades=_variedades_con_siembras(),
+                         seleccionadas=variedades,
+                         datos=datos,
+                         grafico=grafico,
+                         maximo_variedades=maximo,
+                         filtro_periodo=request.args.get('periodo', 'completo'),
+                         periodo_inicio=request.args.get('periodo_inicio', ''),
+                         periodo_fin=request.args.get('periodo_fin', ''))
+
+# ================ API JSON ================
+
+# Columnas de los puntos de una curva en las respuestas JSON
+COLUMNAS_CURVA = (
+    'dia', 'indice_promedio', 'min_indice', 'max_indice', 'num_datos',
+    'p10', 'p50', 'p90', 'indice_acumulado'
+)
+
+def _reducir_serie(filas, x, y):
+    """
+    Índices de las filas a enviar según el parámetro `puntos` de la solicitud.
+    Sin parámetro (o con más puntos que filas) se envía la serie completa.
+    """
+    puntos = request.args.get('puntos', type=int)
+    if not puntos or puntos >= len(filas):
+        return None
+    return lttb([f[x] for f in filas], [f[y] for f in filas], puntos)
+
+@reportes.route('/api/curva_produccion/<int:variedad_id>')
+@login_required
+def api_curva_produccion(variedad_id):
+    """
+    Curva de producción en arreglos por columna, opcionalmente reducida con LTTB.
+    La vista completa se lee del acumulado por día (percentiles e índice
+    acumulado en null); con `bandas=1` se calculan desde los cortes.
+    """
+    variedad = Variedad.query.get_or_404(variedad_id)
+    datos = obtener_curva(
+        variedad_id,
+        request.args.get('periodo', 'completo'),
+        request.args.get('periodo_inicio', None),
+        request.args.get('periodo_fin', None),
+        bandas=_bandas_solicitadas()
+    )
+    puntos = datos['puntos_curva']
+    indices = _reducir_serie(puntos, 'dia', 'indice_promedio')
     
-    # Generar gráfico
-    grafico_curva = None
-    if datos['puntos_curva']:
-        grafico_curva = generar_grafico_curva(
-            datos['puntos_curva'],
-            variedad.variedad,
-            datos['ciclo_vegetativo'],
-            datos['ciclo_total']
-        )
-    
-    # Preparar datos para la plantilla
-    datos_adicionales = {
+    return jsonify({
+        'variedad_id': variedad.variedad_id,
+        'variedad': variedad.variedad,
+        'ciclo_vegetativo': datos['ciclo_vegetativo'],
+        'ciclo_total': datos['ciclo_total'],
         'total_siembras': datos['total_siembras'],
         'siembras_con_datos': datos['siembras_con_datos'],
         'total_plantas': datos['total_plantas'],
         'total_tallos': datos['total_tallos'],
         'promedio_produccion': datos['promedio_produccion'],
-        'ciclo_vegetativo': datos['ciclo_vegetativo'],
-        'ciclo_productivo': max(0, datos['ciclo_total'] - datos['ciclo_vegetativo']),
-        'ciclo_total': datos['ciclo_total'],
-        'filtro_periodo': filtro_periodo,
-        'periodo_inicio': periodo_inicio,
-        'periodo_fin': periodo_fin
-    }
+        'total_puntos': len(puntos),
+        'puntos': a_columnas(puntos, COLUMNAS_CURVA, indices)
+    })
+
+@reportes.route('/api/curvas')
+@login_required
+def api_curvas():
+    """Curvas de varias variedades (`variedad_id` repetido) en arreglos por columna."""
+    variedad_ids = _variedades_solicitadas()
+    if not variedad_ids:
+        return jsonify({'error': 'Indique al menos un variedad_id'}), 400
+    maximo = get_config_value('CURVAS_MAXIMO_VARIEDADES', CURVAS_MAXIMO_VARIEDADES)
+    if len(variedad_ids) > maximo:
+        return jsonify({'error': f'Se comparan como máximo {maximo} variedades'}), 400
+
+    variedades, datos = _curvas_solicitadas(variedad_ids)
+    curvas = []
+    for variedad in variedades:
+        curva = datos[variedad.variedad_id]
+        puntos = curva['puntos_curva']
+        curvas.append({
+            'variedad_id': variedad.variedad_id,
+            'variedad': variedad.variedad,
+            'ciclo_vegetativo': curva['ciclo_vegetativo'],
+            'ciclo_total': curva['ciclo_total'],
+            'siembras_con_datos': curva['siembras_con_datos'],
+            'promedio_produccion': curva['promedio_produccion'],
+            'total_puntos': len(puntos),
+            'puntos': a_columnas(puntos, COLUMNAS_CURVA, _reducir_serie(puntos, 'dia', 'indice_promedio'))
+        })
+
+    return jsonify({'curvas': curvas})
+
+@reportes.route('/api/produccion_por_variedad')
+@login_required
+def api_produccion_por_variedad():
+    """Producción por variedad en arreglos por columna; `limite` conserva las N primeras."""
+    data = obtener_produccion_por_variedad(_periodo_solicitado())
+    limite = request.args.get('limite', type=int)
+    total = len(data)
+    if limite and limite > 0:
+        data = data[:limite]
     
-    return render_template('reportes/curva_produccion.html',
-                         title=f'Curva de Producción: {variedad.variedad}',
-                         variedad=variedad,
-                         puntos_curva=datos['puntos_curva'],
-                         grafico_curva=grafico_curva,
-                         datos_adicionales=datos_adicionales)
+    return jsonify({
+        'total': total,
+        'columnas': a_columnas(data, ('variedad_id', 'variedad', 'flor', 'color', 'total_tallos'))
+    })
+
+@reportes.route('/api/produccion_por_bloque')
+@login_required
+def api_produccion_por_bloque():
+    """Producción por bloque en arreglos por columna."""
+    data = obtener_produccion_por_bloque(_periodo_solicitado())
+    for r in data:
+        r['promedio_tallos'] = round(r['promedio_tallos'], 2)
+    
+    return jsonify({
+        'total': len(data),
+        'columnas': a_columnas(
+            data, ('bloque_id', 'bloque', 'total_tallos', 'total_siembras', 'promedio_tallos')
+        )
+    })
+
+@reportes.route('/api/dias_produccion')
+@login_required
+def api_dias_produccion():
+    """
+    Días de producción de todas las variedades en arreglos planos por columna.
+    La columna `variedad` es el índice de cada fila dentro de `variedades`.
+    """
+    data = obtener_dias_produccion()
+    variedades = list(data)
+    filas = [
+        dict(fila, variedad=posicion)
+        for posicion, nombre in enumerate(variedades)
+        for fila in data[nombre]
+    ]
+    
+    return jsonify({
+        'variedades': variedades,
+        'columnas': a_columnas(
+            filas,
+            ('variedad', 'num_corte', 'dias_promedio', 'dias_minimo', 'dias_maximo', 'total_siembras')
+        )
+    })
+
+@reportes.route('/api/pronostico')
+@login_required
+def api_pronostico():
+    """
+    Pronóstico de siembras activas en arreglos por columna. La columna
+    `tallos` tiene una lista por fila con los tallos de cada semana.
+    """
+    datos = pronosticar(request.args.get('semanas', type=int))
+    
+    return jsonify({
+        'desde': datos['desde'].isoformat(),
+        'hasta': datos['hasta'].isoformat(),
+        'semanas': [s['semana'] for s in datos['semanas']],
+        'totales_semana': datos['totales_semana'],
+        'siembras_activas': datos['siembras_activas'],
+        'siembras_sin_curva': datos['siembras_sin_curva'],
+        'columnas': a_columnas(
+            datos['filas'], ('bloque_id', 'bloque', 'variedad_id', 'variedad', 'flor', 'tallos', 'total')
+        )
+    })
+
+# ================ TRABAJOS EN SEGUNDO PLANO ================
+
+@reportes.route('/api/trabajos', methods=['POST'])
+@login_required
+def api_encolar_trabajo():
+    """
+    Encola un reporte en segundo plano y devuelve el id del trabajo.
+
+    Cuerpo JSON: {"tipo": ..., "parametros": {...}}. Si ya existe un
+    resultado para los mismos parámetros y datos, se devuelve ese trabajo.
+    """
+    cuerpo = request.get_json(silent=True) or {}
+    try:
+        trabajo = encolar(cuerpo.get('tipo'), cuerpo.get('parametros'), current_user.usuario_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    respuesta = estado_trabajo(trabajo)
+    respuesta['url_estado'] = url_for('reportes.api_estado_trabajo', trabajo_id=trabajo.trabajo_id)
+    return jsonify(respuesta), 200 if trabajo.terminado else 202
+
+@reportes.route('/api/trabajos/<trabajo_id>')
+@login_required
+def api_estado_trabajo(trabajo_id):
+    """Estado y progreso de un trabajo; incluye la URL del resultado al terminar."""
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    respuesta = estado_trabajo(trabajo)
+    if trabajo.estado == 'terminado':
+        respuesta['url_resultado'] = url_for('reportes.api_resultado_trabajo', trabajo_id=trabajo_id)
+    return jsonify(respuesta)
+
+@reportes.route('/api/trabajos/<trabajo_id>/resultado')
+@login_required
+def api_resultado_trabajo(trabajo_id):
+    """Resultado de un trabajo terminado."""
+    trabajo = obtener_trabajo(trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    if trabajo.estado != 'terminado':
+        return jsonify(estado_trabajo(trabajo)), 409
+    
+    return Response(trabajo.resultado, mimetype='application/json')
 
 # ================ OTRAS VISTAS ================
 
+@reportes.route('/chart/<clave>.png')
+@login_required
+def grafico(clave):
+    """Sirve un gráfico de la caché por su hash de contenido."""
+    if not CLAVE_VALIDA.match(clave):
+        abort(404)
+    
+    ruta = ruta_grafico(clave)
+    if not tocar(ruta):
+        abort(404)
+    
+    # El contenido de una clave nunca cambia: ETag fuerte y caché de larga duración,
+    # solo en el navegador porque la ruta requiere sesión
+    response = send_file(ruta, mimetype='image/png', etag=clave,
+                         max_age=get_config_value('CACHE_GRAFICOS_MAX_AGE', CACHE_GRAFICOS_MAX_AGE),
+                         conditional=True)
+    response.cache_control.immutable = True
+    response.cache_control.private = True
+    return response
+
 @reportes.route('/exportar_datos')
 @login_required
 def exportar_datos():
+    """
+    Exporta siembras o cortes en streaming.
+    `formato` puede ser 'xlsx' (por defecto), 'csv', 'parquet' o 'arrow'.
+    """
     tipo_reporte = request.args.get('tipo', 'siembras')
+    formato = request.args.get('formato', 'xlsx')
+    
+    if tipo_reporte not in EXPORTACIONES:
+        return jsonify({'error': 'Tipo de reporte no válido'})
+    
+    nombre = f'{tipo_reporte}_{datetime.now().strftime("%Y%m%d")}'
+    
+    if formato == 'csv':
+        return Response(
+            stream_with_context(generar_csv(tipo_reporte)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={nombre}.csv'}
+        )
     
-    if tipo_reporte == 'siembras':
-        results = db.session.query(
-            Siembra.siembra_id,
-            Bloque.bloque,
-            Cama.cama,
-            Lado.lado,
-            Variedad.variedad,
-            Flor.flor,
-            Color.color,
-            Siembra.fecha_siembra,
-            Siembra.fecha_inicio_corte,
-            Siembra.estado
-        ).join(BloqueCamaLado)\
-         .join(Bloque)\
-         .join(Cama)\
-         .join(Lado)\
-         .join(Variedad)\
-         .join(FlorColor)\
-         .join(Flor)\
-         .join(Color)\
-         .all()
-        
-        df = pd.DataFrame([{
-            'ID Siembra': r.siembra_id,
-            'Bloque': r.bloque,
-            'Cama': r.cama,
-            'Lado': r.lado,
-            'Variedad': r.variedad,
-            'Flor': r.flor,
-            'Color': r.color,
-            'Fecha Siembra': r.fecha_siembra.strftime('%d/%m/%Y'),
-            'Fecha Inicio Corte': r.fecha_inicio_corte.strftime('%d/%m/%Y') if r.fecha_inicio_corte else '',
-            'Estado': r.estado
-        } for r in results])
-        
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Siembras', index=False)
-        output.seek(0)
-        
+    if formato == 'xlsx':
         return send_file(
-            output,
+            escribir_xlsx(tipo_reporte),
             as_attachment=True,
-            download_name=f'siembras_{datetime.now().strftime("%Y%m%d")}.xlsx',
+            download_name=f'{nombre}.xlsx',
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
     
-    elif tipo_reporte == 'cortes':
-        results = db.session.query(
-            Corte.corte_id,
-            Siembra.siembra_id,
-            Bloque.bloque,
-            Cama.cama,
-            Lado.lado,
-            Variedad.variedad,
-            Corte.num_corte,
-            Corte.fecha_corte,
-            Corte.cantidad_tallos,
-            Siembra.fecha_siembra,
-            func.datediff(Corte.fecha_corte, Siembra.fecha_siembra).label('dias_desde_siembra')
-        ).join(Siembra)\
-         .join(BloqueCamaLado)\
-         .join(Bloque)\
-         .join(Cama)\
-         .join(Lado)\
-         .join(Variedad)\
-         .order_by(Siembra.siembra_id, Corte.num_corte)\
-         .all()
-        
-        df = pd.DataFrame([{
-            'ID Corte': r.corte_id,
-            'ID Siembra': r.siembra_id,
-            'Bloque': r.bloque,
-            'Cama': r.cama,
-            'Lado': r.lado,
-            'Variedad': r.variedad,
-            'Corte #': r.num_corte,
-            'Fecha Corte': r.fecha_corte.strftime('%d/%m/%Y'),
-            'Cantidad Tallos': r.cantidad_tallos,
-            'Fecha Siembra': r.fecha_siembra.strftime('%d/%m/%Y'),
-            'Días desde Siembra': r.dias_desde_siembra
-        } for r in results])
-        
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Cortes', index=False)
-        output.seek(0)
-        
+    if formato in FORMATOS_COLUMNARES:
+        if pa is None:
+            return jsonify({'error': 'La exportación Parquet/Arrow requiere pyarrow'})
+        extension, mimetype = FORMATOS_COLUMNARES[formato]
         return send_file(
-            output,
+            escribir_columnar(tipo_reporte, formato),
             as_attachment=True,
-            download_name=f'cortes_{datetime.now().strftime("%Y%m%d")}.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            download_name=f'{nombre}.{extension}',
+            mimetype=mimetype
         )
     
-    return jsonify({'error': 'Tipo de reporte no válido'})
+    return jsonify({'error': 'Formato de exportación no válido'})
 
 @reportes.route('/diagnostico_importacion')
 @login_required
@@ -408,74 +587,13 @@ def diagnostico_importacion():
     Genera un diagnóstico del estado de los datos importados en el sistema,
     mostrando estadísticas y posibles problemas con los datos.
     """
-    # Estadísticas generales
-    stats = {
-        "total_siembras": Siembra.query.count(),
-        "total_cortes": Corte.query.count(),
-        "total_variedades": Variedad.query.count()
-    }
-    
-    # Identificar siembras sin cortes (potencialmente incompletas)
-    siembras_sin_cortes = db.session.query(func.count(Siembra.siembra_id))\
-        .outerjoin(Corte)\
-        .group_by(Siembra.siembra_id)\
-        .having(func.count(Corte.corte_id) == 0)\
-        .count()
-    
-    # Identificar cortes con índices extremadamente altos (posibles errores)
-    cortes_indices_altos = 0
-    for corte in Corte.query.all():
-        siembra = Siembra.query.get(corte.siembra_id)
-        if not siembra or not siembra.area or not siembra.densidad:
-            continue
-        
-        # Calcular plantas totales
-        plantas_totales = siembra.area.area * siembra.densidad.valor
-        if plantas_totales <= 0:
-            continue
-        
-        # Calcular índice
-        indice = (corte.cantidad_tallos / plantas_totales) * 100
-        
-        # Comprobar si el índice es extremadamente alto (sobre 30%)
-        if indice > 30:
-            cortes_indices_altos += 1
-    
-    # Variedades con siembras registradas
-    variedades_con_siembras = db.session.query(Variedad)\
-        .join(Siembra)\
-        .group_by(Variedad.variedad_id)\
-        .count()
-    
-    # Variedades con suficientes datos para curvas de producción
-    variedades_con_curvas = []
-    for variedad in Variedad.query.all():
-        siembras_query = Siembra.query.filter_by(variedad_id=variedad.variedad_id)
-        siembras_count = siembras_query.count()
-        
-        if siembras_count >= 3:  # Mínimo 3 siembras para tener datos significativos
-            cortes_count = db.session.query(func.count(Corte.corte_id))\
-                .join(Siembra)\
-                .filter(Siembra.variedad_id == variedad.variedad_id)\
-                .scalar() or 0
-            
-            if cortes_count >= 10:  # Mínimo 10 cortes en total para tener suficientes datos
-                variedades_con_curvas.append({
-                    'variedad_id': variedad.variedad_id,
-                    'variedad': variedad.variedad,
-                    'flor': variedad.flor_color.flor.flor,
-                    'color': variedad.flor_color.color.color,
-                    'siembras': siembras_count,
-                    'cortes': cortes_count
-                })
-    
-    # Ordenar variedades por número de cortes (más cortes primero)
-    variedades_con_curvas = sorted(variedades_con_curvas, key=lambda x: x['cortes'], reverse=True)
+    trabajo = encolar('diagnostico_importacion', usuario_id=current_user.usuario_id)
+    if trabajo.estado != 'terminado':
+        return render_template('reportes/trabajo.html',
+                               title='Diagnóstico de Importación de Datos',
+                               trabajo=trabajo)
+    diagnostico = obtener_resultado(trabajo)
     
     return render_template('reportes/diagnostico_importacion.html',
                         title='Diagnóstico de Importación de Datos',
-                        stats=stats,
-                        siembras_sin_cortes=siembras_sin_cortes,
-                        cortes_indices_altos=cortes_indices_altos,
-                        variedades_con_siembras=variedades_con_siembras,
-                        variedades_con_curvas=variedades_con_curvas)
\ No newline at end of file
+                        **diagnostico)
\ No newline at end of file
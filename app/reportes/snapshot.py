@@ -0,0 +1,457 @@
+"""
+Instantánea columnar en memoria de siembras y cortes.
+
+Sirve dos consumidores: el pronóstico de producción (pronostico.py), que
+recorre las siembras activas, y el índice de referencias de
+Corte.obtener_predicciones (IndiceReferencias).
+
+La curva de producción, los días de producción y la producción por bloque
+no se leen de aquí: las ediciones hechas en otros procesos solo se ven tras
+SNAPSHOT_EDAD_MAXIMA segundos, un retraso aceptable para un pronóstico o una
+predicción pero no para los reportes, que se resuelven con consultas
+agrupadas (obtener_datos_curvas, obtener_dias_produccion) y desde las tablas
+de resumen mantenidas en mantenimiento.py (acumulado_curva, resumen_semanal).
+
+Los datos se guardan como arreglos NumPy tipados (una columna por atributo),
+se construyen una vez por proceso y se refrescan de forma incremental leyendo
+solo las filas con `fecha_registro` posterior a la última marca. Cada refresco
+publica un EstadoProduccion nuevo e inmutable; los lectores toman una sola
+referencia al estado y nunca ven columnas de dos refrescos distintos. Las
+ediciones y eliminaciones de siembras y cortes confirmadas en este proceso
+marcan solo esas filas, que el siguiente refresco vuelve a leer (o quita si
+ya no existen); las de áreas, densidades y ubicaciones, o las de más de
+SNAPSHOT_RECARGA_MAXIMA filas, invalidan la instantánea completa. Las hechas
+en otros procesos se detectan por diferencia de conteos o por antigüedad máxima.
+"""
+
+import threading
+import time
+from itertools import chain
+import numpy as np
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Siembra, Corte, Area, Densidad, BloqueCamaLado
+from .utils import get_config_value
+
+SNAPSHOT_EDAD_MAXIMA = 900  # segundos
+# Filas editadas a partir de las cuales se reconstruye en lugar de releerlas una a una
+SNAPSHOT_RECARGA_MAXIMA = 1000
+
+SNAPSHOT_PENDIENTES_KEY = 'snapshot_pendientes'
+
+def agrupar(claves, valores=None):
+    """
+    Agrupa valores por clave de forma vectorizada.
+
+    Args:
+        claves: Arreglo de claves enteras
+        valores: Arreglo de valores a sumar (opcional)
+
+    Returns:
+        Tupla (claves_unicas, conteos, sumas)
+    """
+    claves_unicas, inversa = np.unique(claves, return_inverse=True)
+    conteos = np.bincount(inversa, minlength=len(claves_unicas))
+    if valores is None:
+        return claves_unicas, conteos, None
+    sumas = np.bincount(inversa, weights=valores, minlength=len(claves_unicas))
+    return claves_unicas, conteos, sumas
+
+def _columna(valores, dtype):
+    """Arreglo de solo lectura con los valores dados."""
+    arreglo = np.asarray(valores, dtype=dtype)
+    arreglo.flags.writeable = False
+    return arreglo
+
+class EstadoProduccion:
+    """
+    Columnas de producción de un refresco; no se modifican después de crearse.
+
+    Columnas de siembras (ordenadas por siembra_id):
+        s_id, s_variedad, s_bloque, s_fecha (ordinal), s_plantas, s_activa
+    Columnas de cortes (ordenadas por corte_id):
+        c_id, c_siembra, c_num, c_fecha (ordinal), c_dia (días desde siembra),
+        c_tallos y c_pos (posición de la siembra de cada corte en las columnas s_*)
+    """
+
+    COLUMNAS_SIEMBRAS = {
+        's_id': np.int32, 's_variedad': np.int32, 's_bloque': np.int16,
+        's_fecha': np.int32, 's_plantas': np.float64, 's_activa': bool
+    }
+    COLUMNAS_CORTES = {
+        'c_id': np.int32, 'c_siembra': np.int32, 'c_num': np.int16,
+        'c_fecha': np.int32, 'c_tallos': np.int32
+    }
+
+    def __init__(self, version, columnas=None, marca_siembras=None, marca_cortes=None, construida_en=0.0):
+        columnas = columnas or {}
+        for nombre, dtype in chain(self.COLUMNAS_SIEMBRAS.items(), self.COLUMNAS_CORTES.items()):
+            setattr(self, nombre, _columna(columnas.get(nombre, ()), dtype))
+        self.version = version
+        self.marca_siembras = marca_siembras
+        self.marca_cortes = marca_cortes
+        self.construida_en = construida_en
+
+        # Relacionar cada corte con su siembra; los cortes sin siembra se descartan
+        posiciones = np.minimum(np.searchsorted(self.s_id, self.c_siembra), max(len(self.s_id) - 1, 0))
+        validos = self.s_id[posiciones] == self.c_siembra if len(self.s_id) else np.zeros(len(posiciones), dtype=bool)
+        self.consistente = bool(validos.all())
+        if not self.consistente:
+            for nombre, dtype in self.COLUMNAS_CORTES.items():
+                setattr(self, nombre, _columna(getattr(self, nombre)[validos], dtype))
+            posiciones = posiciones[validos]
+        self.c_pos = _columna(posiciones, np.int64)
+        self.c_dia = _columna(self.c_fecha - self.s_fecha[posiciones], np.int32)
+
+        self._referencias = None
+        self._referencias_lock = threading.Lock()
+
+    def columnas(self):
+        """Dict {nombre: arreglo} con las columnas base del estado."""
+        return {nombre: getattr(self, nombre) for nombre in chain(self.COLUMNAS_SIEMBRAS, self.COLUMNAS_CORTES)}
+
+    def rendimiento_por_variedad(self):
+        """
+        Índice total de un ciclo (tallos / plantas * 100) por variedad, con las
+        siembras finalizadas que tienen cortes; para variedades sin siembras
+        finalizadas se usan todas las que tienen cortes.
+
+        Returns:
+            Dict {variedad_id: índice total (%)}
+        """
+        tallos = np.bincount(self.c_pos, weights=self.c_tallos, minlength=len(self.s_id))
+        con_cortes = np.bincount(self.c_pos, minlength=len(self.s_id)) > 0
+        base = con_cortes & (self.s_plantas > 0)
+
+        rendimiento = {}
+        for mascara in (base, base & ~self.s_activa):
+            variedades, _, suma_tallos = agrupar(self.s_variedad[mascara], tallos[mascara])
+            _, _, suma_plantas = agrupar(self.s_variedad[mascara], self.s_plantas[mascara])
+            rendimiento.update(
+                (int(v), float(t / p * 100)) for v, t, p in zip(variedades, suma_tallos, suma_plantas)
+            )
+        return rendimiento
+
+    def referencias(self):
+        """Índice de referencias de predicción de este estado (se construye una sola vez)."""
+        with self._referencias_lock:
+            if self._referencias is None:
+                self._referencias = IndiceReferencias(self)
+            return self._referencias
+
+class ProduccionSnapshot:
+    """
+    Instantánea de producción del proceso.
+
+    Guarda una referencia al EstadoProduccion vigente; refrescar() construye
+    el siguiente bajo un candado y lo publica reemplazando la referencia.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estado = EstadoProduccion(0)
+        self._invalida = True
+        # Filas editadas o eliminadas pendientes de releer; con su propio candado
+        # para no esperar a un refresco en curso
+        self._pendientes_lock = threading.Lock()
+        self._siembras_pendientes = set()
+        self._cortes_pendientes = set()
+
+    @property
+    def estado(self):
+        """Estado publicado por el último refresco."""
+        return self._estado
+
+    # ---------------- Mantenimiento ----------------
+
+    def invalidar(self, siembra_ids=None, corte_ids=None):
+        """
+        Marca cambios para el próximo refresco.
+
+        Sin argumentos, la instantánea se reconstruye completa; con ids, solo
+        esas siembras y cortes se vuelven a leer.
+        """
+        if siembra_ids is None and corte_ids is None:
+            self._invalida = True
+            return
+        with self._pendientes_lock:
+            self._siembras_pendientes.update(siembra_ids or ())
+            self._cortes_pendientes.update(corte_ids or ())
+            maximo = get_config_value('SNAPSHOT_RECARGA_MAXIMA', SNAPSHOT_RECARGA_MAXIMA)
+            if len(self._siembras_pendientes) + len(self._cortes_pendientes) > maximo:
+                self._invalida = True
+
+    def _tomar_pendientes(self):
+        """Devuelve y limpia las siembras y cortes pendientes de releer."""
+        with self._pendientes_lock:
+            pendientes = self._siembras_pendientes, self._cortes_pendientes
+            self._siembras_pendientes, self._cortes_pendientes = set(), set()
+        return pendientes
+
+    def refrescar(self, forzar=False):
+        """
+        Actualiza la instantánea con los cambios de la base de datos.
+
+        Args:
+            forzar: Si True, reconstruye desde cero
+
+        Returns:
+            EstadoProduccion vigente tras el refresco
+        """
+        with self._lock:
+            estado = self._estado
+            edad = time.monotonic() - estado.construida_en
+            edad_maxima = get_config_value('SNAPSHOT_EDAD_MAXIMA', SNAPSHOT_EDAD_MAXIMA)
+            if forzar or self._invalida or edad > edad_maxima:
+                return self._publicar(self._reconstruir(estado.version + 1))
+
+            siembra_ids, corte_ids = self._tomar_pendientes()
+            if siembra_ids or corte_ids:
+                estado = self._recargar(estado, siembra_ids, corte_ids)
+                if not estado.consistente:
+                    return self._publicar(self._reconstruir(estado.version + 1))
+
+            total_siembras = db.session.query(func.count(Siembra.siembra_id)).scalar() or 0
+            total_cortes = db.session.query(func.count(Corte.corte_id)).scalar() or 0
+
+            if total_siembras == len(estado.s_id) and total_cortes == len(estado.c_id):
+                return self._publicar(estado)
+
+            nuevo = self._cargar(estado, estado.marca_siembras, estado.marca_cortes)
+            if not nuevo.consistente or total_siembras != len(nuevo.s_id) or total_cortes != len(nuevo.c_id):
+                # Hubo eliminaciones o filas fuera de las marcas
+                nuevo = self._reconstruir(estado.version + 1)
+            return self._publicar(nuevo)
+
+    def _publicar(self, estado):
+        self._estado = estado
+        return estado
+
+    def _reconstruir(self, version):
+        """Carga completa de siembras y cortes."""
+        # Se limpia antes de leer: una invalidación durante la carga se conserva
+        self._invalida = False
+        self._tomar_pendientes()
+        return self._cargar(EstadoProduccion(version - 1, construida_en=time.monotonic()), None, None)
+
+    @staticmethod
+    def _consultas():
+        """Consultas de siembras y cortes con las columnas de la instantánea."""
+        siembras_query = db.session.query(
+            Siembra.siembra_id,
+            Siembra.variedad_id,
+            BloqueCamaLado.bloque_id,
+            Siembra.fecha_siembra,
+            (Area.area * Densidad.valor).label('plantas'),
+            Siembra.estado,
+            Siembra.fecha_registro
+        ).join(BloqueCamaLado, Siembra.bloque_cama_id == BloqueCamaLado.bloque_cama_id)\
+         .join(Area, Siembra.area_id == Area.area_id)\
+         .join(Densidad, Siembra.densidad_id == Densidad.densidad_id)
+
+        cortes_query = db.session.query(
+            Corte.corte_id,
+            Corte.siembra_id,
+            Corte.num_corte,
+            Corte.fecha_corte,
+            Corte.cantidad_tallos,
+            Corte.fecha_registro
+        )
+        return siembras_query, cortes_query
+
+    @classmethod
+    def _unir_filas(cls, columnas, siembras, cortes):
+        """Une en `columnas` las filas de siembras y cortes leídas con _consultas."""
+        if siembras:
+            cls._unir(columnas, EstadoProduccion.COLUMNAS_SIEMBRAS, {
+                's_id': [s.siembra_id for s in siembras],
+                's_variedad': [s.variedad_id for s in siembras],
+                's_bloque': [s.bloque_id or 0 for s in siembras],
+                's_fecha': [s.fecha_siembra.toordinal() for s in siembras],
+                's_plantas': [float(s.plantas or 0) for s in siembras],
+                's_activa': [s.estado == 'Activa' for s in siembras]
+            })
+        if cortes:
+            cls._unir(columnas, EstadoProduccion.COLUMNAS_CORTES, {
+                'c_id': [c.corte_id for c in cortes],
+                'c_siembra': [c.siembra_id for c in cortes],
+                'c_num': [c.num_corte for c in cortes],
+                'c_fecha': [c.fecha_corte.toordinal() for c in cortes],
+                'c_tallos': [c.cantidad_tallos for c in cortes]
+            })
+
+    def _cargar(self, base, marca_siembras, marca_cortes):
+        """
+        Estado nuevo con las columnas de `base` más las filas registradas desde las marcas dadas.
+
+        Returns:
+            EstadoProduccion con versión base.version + 1; no es consistente si
+            algún corte referencia una siembra que no está en la instantánea
+        """
+        siembras_query, cortes_query = self._consultas()
+        if marca_siembras is not None:
+            siembras_query = siembras_query.filter(Siembra.fecha_registro >= marca_siembras)
+        if marca_cortes is not None:
+            cortes_query = cortes_query.filter(Corte.fecha_registro >= marca_cortes)
+
+        siembras = siembras_query.all()
+        cortes = cortes_query.all()
+        columnas = base.columnas()
+        self._unir_filas(columnas, siembras, cortes)
+        if siembras:
+            marca_siembras = max(s.fecha_registro for s in siembras)
+        if cortes:
+            marca_cortes = max(c.fecha_registro for c in cortes)
+
+        return EstadoProduccion(base.version + 1, columnas, marca_siembras, marca_cortes, base.construida_en)
+
+    def _recargar(self, base, siembra_ids, corte_ids):
+        """
+        Estado nuevo con las siembras y cortes dados leídos de nuevo; los que
+        ya no existen se quitan.
+
+        Returns:
+            EstadoProduccion con versión base.version + 1 y las marcas de `base`
+        """
+        siembras_query, cortes_query = self._consultas()
+        siembras = siembras_query.filter(Siembra.siembra_id.in_(list(siembra_ids))).all() if siembra_ids else []
+        cortes = cortes_query.filter(Corte.corte_id.in_(list(corte_ids))).all() if corte_ids else []
+
+        columnas = base.columnas()
+        for ids, tipos in ((siembra_ids, EstadoProduccion.COLUMNAS_SIEMBRAS),
+                           (corte_ids, EstadoProduccion.COLUMNAS_CORTES)):
+            if ids:
+                identificador = next(iter(tipos))
+                conservar = ~np.isin(columnas[identificador], np.fromiter(ids, dtype=np.int64, count=len(ids)))
+                columnas.update((nombre, columnas[nombre][conservar]) for nombre in tipos)
+        self._unir_filas(columnas, siembras, cortes)
+
+        return EstadoProduccion(base.version + 1, columnas, base.marca_siembras, base.marca_cortes,
+                                base.construida_en)
+
+    @staticmethod
+    def _unir(columnas, tipos, nuevas):
+        """
+        Une en `columnas` las filas existentes y las nuevas, sin duplicados y
+        ordenadas por la primera columna (el identificador); si un
+        identificador está en ambas, queda la fila nueva.
+        """
+        # Las nuevas van primero: np.unique conserva la primera aparición
+        unidas = {
+            nombre: np.concatenate([np.asarray(nuevas[nombre], dtype=dtype), columnas[nombre]])
+            for nombre, dtype in tipos.items()
+        }
+        ids = next(iter(unidas.values()))
+        _, orden = np.unique(ids, return_index=True)
+        columnas.update((nombre, columna[orden]) for nombre, columna in unidas.items())
+
+class IndiceReferencias:
+    """
+    Índice de cada corte ordenado por (variedad, días desde siembra).
+
+    Sirve las referencias de Corte.obtener_prediccion: los cortes de una
+    variedad dentro de ±N días se obtienen con dos búsquedas binarias en
+    lugar de recorrer las siembras y sus cortes.
+    """
+
+
+    def __init__(self, estado):
+        self.version = estado.version
+        plantas = np.floor(estado.s_plantas[estado.c_pos])  # Igual que int(Siembra.total_plantas)
+        tallos = estado.c_tallos.astype(np.float64)
+        cocientes = np.divide(tallos, plantas, out=np.zeros_like(tallos), where=plantas > 0) * 100
+        # round() de Python para reproducir Corte.indice_sobre_total
+        indices = np.fromiter((round(x, 2) for x in cocientes.tolist()), dtype=np.float64, count=len(cocientes))
+
+        variedades = estado.s_variedad[estado.c_pos]
+        orden = np.lexsort((estado.c_dia, variedades))
+        self.claves = self._clave(variedades[orden], estado.c_dia[orden])
+        self.siembras = estado.c_siembra[orden]
+        self.cortes = estado.c_id[orden]
+        self.indices = indices[orden]
+
+    @staticmethod
+    def _clave(variedades, dias):
+        """Clave entera ordenable de (variedad, día)."""
+        return (np.asarray(variedades, dtype=np.int64) << 32) + (np.asarray(dias, dtype=np.int64) + 2 ** 31)
+
+    def ventana(self, variedad_id, dia, radio=5, excluir_siembra=None):
+        """
+        Índices de los cortes de la variedad con días desde siembra en [dia - radio, dia + radio].
+
+        Args:
+            excluir_siembra: siembra_id cuyos cortes no se incluyen
+
+        Returns:
+            Arreglo de índices (%) ordenado por (siembra, corte), el orden en
+            que los sumaba el recorrido por siembras
+        """
+        inicio = np.searchsorted(self.claves, self._clave(variedad_id, dia - radio), side='left')
+        fin = np.searchsorted(self.claves, self._clave(variedad_id, dia + radio), side='right')
+        siembras = self.siembras[inicio:fin]
+        orden = np.lexsort((self.cortes[inicio:fin], siembras))
+        if excluir_siembra is not None:
+            orden = orden[siembras[orden] != excluir_siembra]
+        return self.indices[inicio:fin][orden]
+
+    def prediccion(self, variedad_id, dia, indice_actual, excluir_siembra=None, radio=5):
+        """
+        Estadísticas de referencia para un corte (formato de Corte.obtener_prediccion).
+
+        Returns:
+            Dict con índice actual, promedio, máximo, mínimo, diferencia y número
+            de referencias, o None si no hay cortes de referencia
+        """
+        indices = self.ventana(variedad_id, dia, radio, excluir_siembra).tolist()
+        if not indices:
+            return None
+        promedio = sum(indices) / len(indices)
+        return {
+            'indice_actual': indice_actual,
+            'indice_promedio': round(promedio, 2),
+            'indice_maximo': round(max(indices), 2),
+            'indice_minimo': round(min(indices), 2),
+            'diferencia': round(indice_actual - promedio, 2),
+            'num_referencias': len(indices)
+        }
+
+# Instantánea compartida por el proceso
+snapshot = ProduccionSnapshot()
+
+def obtener_snapshot():
+    """Devuelve el estado de la instantánea del proceso, refrescado con los últimos cambios."""
+    return snapshot.refrescar()
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_cambios(session, flush_context):
+    """Recoge las siembras y cortes editados o eliminados, pendientes hasta confirmar."""
+    pendientes = None
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, (Siembra, Corte, Area, Densidad, BloqueCamaLado)):
+            pendientes = pendientes or session.info.setdefault(
+                SNAPSHOT_PENDIENTES_KEY, {'siembras': set(), 'cortes': set(), 'completa': False}
+            )
+            if isinstance(obj, Siembra):
+                pendientes['siembras'].add(obj.siembra_id)
+            elif isinstance(obj, Corte):
+                pendientes['cortes'].add(obj.corte_id)
+            else:
+                pendientes['completa'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_por_cambios(session):
+    """Marca en la instantánea los cambios confirmados, para que el próximo refresco no lea datos anteriores."""
+    pendientes = session.info.pop(SNAPSHOT_PENDIENTES_KEY, None)
+    if pendientes is None:
+        return
+    if pendientes['completa']:
+        snapshot.invalidar()
+    else:
+        snapshot.invalidar(pendientes['siembras'], pendientes['cortes'])
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_cambios(session, previous_transaction):
+    """Olvida los cambios de una transacción revertida completa."""
+    if previous_transaction.parent is None:
+        session.info.pop(SNAPSHOT_PENDIENTES_KEY, None)
@@ -0,0 +1,232 @@
+"""
+Trabajos de reportes en segundo plano.
+
+Los reportes pesados se ejecutan en un pool de hilos del propio proceso, sin
+broker externo: la solicitud registra el trabajo en `trabajo_reporte` y
+devuelve su id, y el navegador consulta el estado hasta que termina. El
+resultado queda guardado y se reutiliza para el mismo tipo y parámetros
+mientras la versión de datos (mantenimiento.version_datos) no cambie.
+
+Como el estado vive en la base de datos, cualquier proceso de la aplicación
+puede responder la consulta de estado de un trabajo lanzado por otro.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import TrabajoReporte
+from .cache_graficos import claves_graficos
+from .charts import trabajos_graficos_dias_produccion
+from .data_processing import obtener_dias_produccion, obtener_diagnostico_importacion
+from .mantenimiento import version_datos
+from .utils import get_config_value
+
+# Hilos de trabajo (0 para ejecutar dentro de la misma solicitud)
+TRABAJOS_HILOS = 2
+# Segundos tras los cuales un trabajo sin terminar se da por perdido
+TRABAJOS_TIEMPO_MAXIMO = 1800
+# Gráficos por lote, para informar del progreso entre lotes
+TRABAJOS_GRAFICOS_POR_LOTE = 8
+
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+# ================ TIPOS DE TRABAJO ================
+
+def _dias_produccion(parametros, progreso):
+    """Días de producción por variedad; deja sus gráficos en la caché."""
+    data = obtener_dias_produccion(**parametros)
+    progreso(20, 'Días de producción calculados')
+
+    graficos = list(trabajos_graficos_dias_produccion(data).items())
+    por_lote = get_config_value('TRABAJOS_GRAFICOS_POR_LOTE', TRABAJOS_GRAFICOS_POR_LOTE)
+    for inicio in range(0, len(graficos), por_lote):
+        lote = graficos[inicio:inicio + por_lote]
+        claves_graficos(dict(lote))
+        hechos = inicio + len(lote)
+        progreso(20 + 80 * hechos // len(graficos), f'Gráficos {hechos} de {len(graficos)}')
+
+    return data
+
+def _diagnostico_importacion(parametros, progreso):
+    """Diagnóstico de calidad de los datos importados."""
+    return obtener_diagnostico_importacion(**parametros)
+
+# {tipo: (función(parametros, progreso), {parámetro: conversión})}
+TIPOS_TRABAJO = {
+    'dias_produccion': (
+        _dias_produccion, {'dias_min': int, 'dias_max': int, 'min_cortes_variedad': int}
+    ),
+    'diagnostico_importacion': (
+        _diagnostico_importacion, {'min_siembras': int, 'min_cortes': int}
+    ),
+}
+
+# ================ UTILIDADES ================
+
+def normalizar_parametros(tipo, parametros=None):
+    """
+    Valida el tipo y convierte los parámetros de un trabajo.
+
+    Raises:
+        ValueError: Si el tipo o algún parámetro no es válido
+    """
+    if tipo not in TIPOS_TRABAJO:
+        raise ValueError(f"Tipo de trabajo no válido: {tipo}")
+    _, admitidos = TIPOS_TRABAJO[tipo]
+
+    normalizados = {}
+    for nombre, valor in (parametros or {}).items():
+        if nombre not in admitidos:
+            raise ValueError(f"Parámetro no válido para {tipo}: {nombre}")
+        if valor is None or valor == '':
+            continue
+        try:
+            normalizados[nombre] = admitidos[nombre](valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valor no válido para {nombre}: {valor}")
+    return normalizados
+
+def clave_trabajo(tipo, parametros):
+    """Hash SHA-256 del tipo y los parámetros normalizados."""
+    contenido = json.dumps([tipo, parametros], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+def _obtener_ejecutor():
+    """Pool de hilos del proceso, creado la primera vez (None si está desactivado)."""
+    global _ejecutor
+    hilos = int(get_config_value('TRABAJOS_HILOS', TRABAJOS_HILOS))
+    if hilos <= 0:
+        return None
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='trabajo-reporte')
+        return _ejecutor
+
+def _actualizar(trabajo_id, **valores):
+    """Escribe el estado de un trabajo en su propia transacción."""
+    tabla = TrabajoReporte.__table__
+    db.session.execute(tabla.update().where(tabla.c.trabajo_id == trabajo_id).values(**valores))
+    db.session.commit()
+
+# ================ EJECUCIÓN ================
+
+def _ejecutar(app, trabajo_id):
+    """Ejecuta un trabajo pendiente y guarda su resultado o su error."""
+    with app.app_context():
+        trabajo = db.session.get(TrabajoReporte, trabajo_id)
+        if trabajo is None or trabajo.estado != 'pendiente':
+            return
+        funcion, _ = TIPOS_TRABAJO[trabajo.tipo]
+        parametros = dict(trabajo.parametros or {})
+        _actualizar(trabajo_id, estado='en_proceso', fecha_inicio=datetime.utcnow(),
+                    mensaje='En proceso')
+
+        ultimo = [0]
+        def progreso(porcentaje, mensaje=None):
+            porcentaje = max(0, min(int(porcentaje), 99))
+            if porcentaje > ultimo[0]:
+                ultimo[0] = porcentaje
+                _actualizar(trabajo_id, progreso=porcentaje, mensaje=mensaje)
+
+        try:
+            resultado = funcion(parametros, progreso)
+            _actualizar(
+                trabajo_id, estado='terminado', progreso=100, mensaje=None,
+                resultado=json.dumps(resultado, ensure_ascii=False, default=str),
+                fecha_fin=datetime.utcnow()
+            )
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Error en el trabajo {trabajo_id} ({trabajo.tipo})")
+            _actualizar(trabajo_id, estado='error', mensaje=str(e)[:255], fecha_fin=datetime.utcnow())
+
+def encolar(tipo, parametros=None, usuario_id=None, en_linea=False):
+    """
+    Devuelve el trabajo vigente para el tipo y los parámetros, o lo encola.
+
+    Se reutiliza un trabajo de la misma clave y versión de datos que esté
+    terminado o aún en curso; los anteriores ya terminados se eliminan.
+    Con `en_linea` el trabajo nuevo se ejecuta antes de volver (CLI).
+
+    Returns:
+        TrabajoReporte (con estado 'terminado' si el resultado ya existía)
+
+    Raises:
+        ValueError: Si el tipo o algún parámetro no es válido
+    """
+    parametros = normalizar_parametros(tipo, parametros)
+    clave = clave_trabajo(tipo, parametros)
+    version = version_datos()
+    tiempo_maximo = get_config_value('TRABAJOS_TIEMPO_MAXIMO', TRABAJOS_TIEMPO_MAXIMO)
+    limite = datetime.utcnow() - timedelta(seconds=tiempo_maximo)
+
+    existentes = TrabajoReporte.query.filter_by(clave=clave)\
+        .order_by(TrabajoReporte.fecha_creacion.desc())\
+        .all()
+    for trabajo in existentes:
+        if trabajo.version_datos == version and trabajo.estado != 'error' \
+                and (trabajo.terminado or trabajo.fecha_creacion >= limite):
+            return trabajo
+
+    # Resultados de versiones anteriores, errores y trabajos perdidos
+    for trabajo in existentes:
+        if trabajo.terminado or trabajo.fecha_creacion < limite:
+            db.session.delete(trabajo)
+
+    trabajo = TrabajoReporte(
+        trabajo_id=uuid.uuid4().hex,
+        tipo=tipo,
+        parametros=parametros,
+        clave=clave,
+        version_datos=version,
+        estado='pendiente',
+        progreso=0,
+        usuario_id=usuario_id
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    ejecutor = None if en_linea else _obtener_ejecutor()
+    if ejecutor is None:
+        _ejecutar(app, trabajo.trabajo_id)
+        db.session.refresh(trabajo)
+    else:
+        ejecutor.submit(_ejecutar, app, trabajo.trabajo_id)
+    return trabajo
+
+def obtener_trabajo(trabajo_id):
+    """Trabajo por id con su estado más reciente (None si no existe)."""
+    trabajo = db.session.get(TrabajoReporte, trabajo_id)
+    if trabajo is not None:
+        db.session.refresh(trabajo)
+    return trabajo
+
+def obtener_resultado(trabajo):
+    """Resultado deserializado de un trabajo terminado (None si aún no lo tiene)."""
+    if trabajo.estado != 'terminado' or trabajo.resultado is None:
+        return None
+    return json.loads(trabajo.resultado)
+
+def estado_trabajo(trabajo):
+    """Estado de un trabajo como dict serializable a JSON."""
+    return {
+        'trabajo_id': trabajo.trabajo_id,
+        'tipo': trabajo.tipo,
+        'parametros': trabajo.parametros or {},
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        'fecha_inicio': trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None
+    }
@@ -2,6 +2,7 @@ from datetime import datetime
 import numpy as np
 from flask import current_app
 from sqlalchemy import func
+from app.utils.number_utils import filtrar_outliers_iqr, filtrar_outliers_iqr_agrupado, percentiles_por_segmento
 
 def get_config_value(key, default):
     """Obtiene valores de configuración de forma segura"""
@@ -18,20 +19,58 @@ def calc_indice_aprovechamiento(tallos, plantas):
     """Calcula el índice de aprovechamiento en porcentaje"""
     return (tallos / plantas * 100) if plantas > 0 else 0
 
-def filtrar_outliers_iqr(valores, factor=1.5):
-    """Filtra valores atípicos usando el rango intercuartil (IQR)"""
-    if not valores or len(valores) < 5:
-        return valores
-        
-    valores_arr = np.array(valores)
-    q1 = np.percentile(valores_arr, 25)
-    q3 = np.percentile(valores_arr, 75)
-    iqr = q3 - q1
-    
-    if iqr == 0:
-        return valores
-        
-    limite_inferior = q1 - (factor * iqr)
-    limite_superior = q3 + (factor * iqr)
-    
-    return valores_arr[(valores_arr >= limite_inferior) & (valores_arr <= limite_superior)].tolist()
\ No newline at end of file
+def lttb(x, y, umbral):
+    """
+    Reduce una serie con Largest-Triangle-Three-Buckets conservando su forma.
+
+    Args:
+        x, y: Coordenadas de la serie, con x ordenado
+        umbral: Número de puntos deseado
+
+    Returns:
+        Arreglo con los índices de los puntos seleccionados (incluye primero y último)
+    """
+    n = len(x)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # umbral-2 grupos entre el primer y el último punto
+    limites = np.linspace(1, n - 1, umbral - 1).astype(np.int64)
+    seleccion = np.empty(umbral, dtype=np.int64)
+    seleccion[0], seleccion[-1] = 0, n - 1
+
+    anterior = 0
+    for i in range(umbral - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        siguiente_fin = limites[i + 2] if i + 2 < len(limites) else n
+        promedio_x = x[fin:siguiente_fin].mean()
+        promedio_y = y[fin:siguiente_fin].mean()
+
+        # Área del triángulo (anterior, candidato, promedio del grupo siguiente)
+        areas = np.abs(
+            (x[anterior] - promedio_x) * (y[inicio:fin] - y[anterior])
+            - (x[anterior] - x[inicio:fin]) * (promedio_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        seleccion[i + 1] = anterior
+
+    return seleccion
+
+def a_columnas(filas, campos, indices=None):
+    """
+    Convierte una lista de dicts en arreglos por columna.
+
+    Args:
+        filas: Lista de dicts
+        campos: Campos a incluir
+        indices: Posiciones de las filas a conservar (opcional)
+
+    Returns:
+        dict {campo: [valores]}
+    """
+    if indices is not None:
+        filas = [filas[i] for i in indices]
+    return {campo: [fila[campo] for fila in filas] for campo in campos}
@@ -4,7 +4,7 @@ from datetime import datetime
 from . import bp
 from .forms import SiembraForm, InicioCorteForm
 from .services import SiembraService
-from app.models import Siembra, Area, Densidad, Color, Variedad, FlorColor
+from app.models import Siembra, Corte, Area, Densidad, Color, Variedad, FlorColor
 from app import db
 from sqlalchemy import func
 
@@ -273,4 +273,9 @@ def finalizar(id):
 @login_required
 def detalles(id):
     siembra = Siembra.query.get_or_404(id)
-    return render_template('siembras/detalles.html', title='Detalles de Siembra', siembra=siembra)
\ No newline at end of file
+    cortes = siembra.cortes.order_by(Corte.num_corte).all()
+    # Predicciones de todos los cortes con una sola lectura del índice de referencias
+    predicciones = Corte.obtener_predicciones(cortes)
+    return render_template('siembras/detalles.html', title='Detalles de Siembra', siembra=siembra,
+                           cortes=cortes, predicciones=predicciones,
+                           acumulados=siembra.indices_acumulados())
\ No newline at end of file
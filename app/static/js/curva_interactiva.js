@@ -33,11 +33,39 @@ const CurvaProduccionInteractiva = () => {
       
       // Si no hay datos y existe el endpoint de API, intentar cargarlos por AJAX
       if (puntosCurvaData.length === 0 && window.VARIEDAD_ID) {
-        // Usar datos de ejemplo por ahora
-        const datosEjemplo = generarDatosEjemplo(window.VARIEDAD_ID);
-        setPuntosCurva(datosEjemplo.puntos);
-        setCiclos(datosEjemplo.ciclos);
-        setInfoVariedad(datosEjemplo.variedad);
+        // Cargar la curva en arreglos por columna desde la API
+        fetch(`/reportes/api/curva_produccion/${window.VARIEDAD_ID}?puntos=200`)
+          .then(respuesta => {
+            if (!respuesta.ok) throw new Error(`HTTP ${respuesta.status}`);
+            return respuesta.json();
+          })
+          .then(datos => {
+            const columnas = datos.puntos;
+            const puntos = columnas.dia.map((dia, i) => ({
+              dia,
+              indice_promedio: columnas.indice_promedio[i],
+              min_indice: columnas.min_indice[i],
+              max_indice: columnas.max_indice[i],
+              num_datos: columnas.num_datos[i]
+            }));
+            setPuntosCurva(procesarPuntosCurva(puntos));
+            setCiclos({
+              vegetativo: datos.ciclo_vegetativo,
+              productivo: Math.max(0, datos.ciclo_total - datos.ciclo_vegetativo),
+              total: datos.ciclo_total
+            });
+            setInfoVariedad({ ...variedadData, nombre: variedadData.nombre || datos.variedad });
+          })
+          .catch(err => {
+            console.error("Error al cargar la curva desde la API:", err);
+            // Usar datos de ejemplo si la API no responde
+            const datosEjemplo = generarDatosEjemplo(window.VARIEDAD_ID);
+            setPuntosCurva(datosEjemplo.puntos);
+            setCiclos(datosEjemplo.ciclos);
+            setInfoVariedad(datosEjemplo.variedad);
+          })
+          .finally(() => setCargando(false));
+        return;
       } else {
         // Usar datos proporcionados por Flask
         setPuntosCurva(procesarPuntosCurva(puntosCurvaData));
@@ -10,7 +10,8 @@ from app.utils.data_utils import (
     safe_float,
     calc_indice_aprovechamiento,
     calc_plantas_totales,
-    filtrar_outliers_iqr
+    filtrar_outliers_iqr,
+    filtrar_outliers_iqr_agrupado
 )
 
 from app.utils.base_importer import BaseImporter
@@ -33,5 +34,6 @@ __all__ = [
     'safe_float',
     'calc_indice_aprovechamiento',
     'calc_plantas_totales',
-    'filtrar_outliers_iqr'
+    'filtrar_outliers_iqr',
+    'filtrar_outliers_iqr_agrupado'
 ]
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Rangos de fechas para filtrar por año, mes y semana ISO.
+
+Los filtros de tiempo se expresan como intervalos semiabiertos
+[inicio, fin) sobre la columna de fecha, en lugar de aplicar funciones como
+YEAR(), MONTH() o YEARWEEK() a la columna: así la base de datos puede
+resolverlos con un rango sobre el índice de la fecha (idx_fecha_siembra,
+idx_fecha_corte) en vez de recorrer la tabla completa.
+"""
+
+from datetime import date, timedelta
+from sqlalchemy import and_
+
+def anio_semana(fecha):
+    """Clave YYYYWW (año y semana ISO) de una fecha."""
+    anio, semana, _ = fecha.isocalendar()
+    return anio * 100 + semana
+
+def semanas_iso(anio):
+    """Número de semanas ISO (52 o 53) de un año."""
+    return date(anio, 12, 28).isocalendar()[1]
+
+def lunes_semana(anio, semana):
+    """Lunes de la semana ISO dada; las semanas fuera del año continúan en el siguiente."""
+    return date.fromisocalendar(anio, 1, 1) + timedelta(weeks=semana - 1)
+
+def rango_anio(anio):
+    """Rango [1 de enero, 1 de enero del año siguiente)."""
+    return date(anio, 1, 1), date(anio + 1, 1, 1)
+
+def rango_mes(anio, mes):
+    """Rango [día 1 del mes, día 1 del mes siguiente)."""
+    if mes == 12:
+        return date(anio, 12, 1), date(anio + 1, 1, 1)
+    return date(anio, mes, 1), date(anio, mes + 1, 1)
+
+def rango_semana(anio, semana):
+    """Rango [lunes, lunes siguiente) de una semana ISO."""
+    inicio = lunes_semana(anio, semana)
+    return inicio, inicio + timedelta(days=7)
+
+def rango_periodos(inicio, fin):
+    """
+    Rango de fechas de los periodos YYYYWW entre `inicio` y `fin` (ambos incluidos).
+
+    Returns:
+        Tupla (lunes de la semana inicial, lunes siguiente a la semana final)
+    """
+    anio_fin, semana_fin = divmod(fin, 100)
+    return (
+        lunes_semana(*divmod(inicio, 100)),
+        lunes_semana(anio_fin, min(semana_fin, semanas_iso(anio_fin)) + 1)
+    )
+
+def rango_semanas(semanas):
+    """Fechas (lunes de la primera, domingo de la última) que cubren las semanas YYYYWW dadas."""
+    lunes = [date.fromisocalendar(s // 100, s % 100, 1) for s in semanas]
+    return min(lunes), max(lunes) + timedelta(days=6)
+
+def en_rango(columna, rango):
+    """Condición SQL `inicio <= columna < fin` para un rango de fechas."""
+    inicio, fin = rango
+    return and_(columna >= inicio, columna < fin)
@@ -13,7 +13,8 @@ from app.utils.number_utils import (
     to_float as _to_float,
     calc_percentage,
     calc_plants_from_area_and_density,
-    filtrar_outliers_iqr as _filtrar_outliers_iqr
+    filtrar_outliers_iqr as _filtrar_outliers_iqr,
+    filtrar_outliers_iqr_agrupado
 )
 
 def safe_decimal(value, default=None):
@@ -147,30 +147,103 @@ def calc_plants_from_area_and_density(area, density):
     
     return to_int(area_dec * density_dec)
 
+def _percentil_ordenado(valores_ordenados, inicios, conteos, percentil):
+    """
+    Percentil con interpolación lineal (igual que np.percentile) para cada
+    segmento de un arreglo ya ordenado dentro de cada grupo.
+    """
+    posicion = (conteos - 1) * (percentil / 100)
+    bajo = np.floor(posicion).astype(np.int64)
+    alto = np.ceil(posicion).astype(np.int64)
+    t = posicion - bajo
+    a = valores_ordenados[inicios + bajo]
+    b = valores_ordenados[inicios + alto]
+    diferencia = b - a
+    return np.where(t >= 0.5, b - diferencia * (1 - t), a + diferencia * t)
+
+def percentiles_por_segmento(valores_ordenados, inicios, conteos, percentiles):
+    """
+    Varios percentiles de cada segmento de un arreglo ya ordenado por
+    (grupo, valor), calculados para todos los grupos a la vez.
+    
+    Args:
+        valores_ordenados: Valores ordenados dentro de cada grupo
+        inicios: Posición inicial de cada segmento
+        conteos: Tamaño de cada segmento
+        percentiles: Percentiles a calcular (0-100)
+        
+    Returns:
+        Lista con un arreglo por percentil, con un valor por segmento
+    """
+    valores_ordenados = np.asarray(valores_ordenados, dtype=np.float64)
+    inicios = np.asarray(inicios, dtype=np.int64)
+    conteos = np.asarray(conteos, dtype=np.int64)
+    return [_percentil_ordenado(valores_ordenados, inicios, conteos, p) for p in percentiles]
+
+def filtrar_outliers_iqr_agrupado(valores, grupos, factor=1.5):
+    """
+    Filtra valores atípicos por IQR dentro de cada grupo en una sola pasada.
+    
+    Ordena por (grupo, valor) con np.lexsort, calcula los cuartiles de todos
+    los segmentos a la vez y construye la máscara completa. Grupos con menos
+    de 5 valores o IQR nulo se conservan completos.
+    
+    Args:
+        valores: Arreglo de valores numéricos
+        grupos: Arreglo de claves de grupo (misma longitud)
+        factor: Multiplicador para determinar límites (típicamente 1.5)
+        
+    Returns:
+        Máscara booleana (en el orden original) con los valores conservados
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    grupos = np.asarray(grupos)
+    if len(valores) == 0:
+        return np.zeros(0, dtype=bool)
+    
+    orden = np.lexsort((valores, grupos))
+    valores_ordenados = valores[orden]
+    grupos_ordenados = grupos[orden]
+    
+    # Límites de cada segmento
+    inicios = np.flatnonzero(np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]])
+    conteos = np.diff(np.r_[inicios, len(valores)])
+    
+    q1 = _percentil_ordenado(valores_ordenados, inicios, conteos, 25)
+    q3 = _percentil_ordenado(valores_ordenados, inicios, conteos, 75)
+    iqr = q3 - q1
+    conservar_grupo = (conteos < 5) | (iqr == 0)
+    
+    # Expandir límites de grupo a cada valor
+    limite_inferior = np.repeat(q1 - factor * iqr, conteos)
+    limite_superior = np.repeat(q3 + factor * iqr, conteos)
+    conservar = np.repeat(conservar_grupo, conteos) | (
+        (valores_ordenados >= limite_inferior) & (valores_ordenados <= limite_superior)
+    )
+    
+    mascara = np.empty(len(valores), dtype=bool)
+    mascara[orden] = conservar
+    return mascara
+
 def filtrar_outliers_iqr(valores, factor=1.5):
     """
     Filtra valores atípicos usando el método del rango intercuartil (IQR).
     
+    Caso de un solo grupo de filtrar_outliers_iqr_agrupado; para filtrar
+    muchos grupos usar directamente la versión agrupada.
+    
     Args:
         valores: Lista/array de valores numéricos
         factor: Multiplicador para determinar límites (típicamente 1.5)
         
     Returns:
-        Lista de valores filtrados
+        Lista de valores filtrados (la entrada sin cambios si no se descarta ninguno)
     """
-    if not valores or len(valores) < 5:
+    if valores is None or len(valores) < 5:
         return valores
-        
-    valores_arr = np.array(valores, dtype=np.float64)
-    q1 = np.percentile(valores_arr, 25)
-    q3 = np.percentile(valores_arr, 75)
-    iqr = q3 - q1
     
-    if iqr == 0:
+    valores_arr = np.asarray(valores)
+    mascara = filtrar_outliers_iqr_agrupado(valores_arr, np.zeros(len(valores_arr), dtype=np.int8), factor)
+    if mascara.all():
         return valores
-        
-    lower_bound = q1 - (factor * iqr)
-    upper_bound = q3 + (factor * iqr)
-    
-    filtered = valores_arr[(valores_arr >= lower_bound) & (valores_arr <= upper_bound)]
-    return filtered.tolist()
\ No newline at end of file
+    return valores_arr[mascara].tolist()
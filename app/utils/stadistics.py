@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from decimal import Decimal
 import numpy as np
-from app.utils.number_utils import to_decimal, to_int
+from app.utils.number_utils import to_decimal, to_int, filtrar_outliers_iqr, filtrar_outliers_iqr_agrupado
 from app.utils.data_utils import calc_indice_aprovechamiento, calc_plantas_totales
 
 class ProductionStatistics:
@@ -64,9 +64,13 @@ class ProductionStatistics:
             # Número de cortes
             datos['num_cortes'].append(len(cortes_ordenados))
         
-        # Filtrar outliers
-        datos['ciclo_vegetativo'] = ProductionStatistics._filtrar_outliers(datos['ciclo_vegetativo'])
-        datos['ciclo_total'] = ProductionStatistics._filtrar_outliers(datos['ciclo_total'])
+        # Filtrar outliers de ambos ciclos en una sola pasada (grupo 0: vegetativo, 1: total)
+        num_veg = len(datos['ciclo_vegetativo'])
+        ciclos = np.array(datos['ciclo_vegetativo'] + datos['ciclo_total'])
+        grupos = np.repeat([0, 1], [num_veg, len(datos['ciclo_total'])])
+        mascara = filtrar_outliers_iqr_agrupado(ciclos, grupos)
+        datos['ciclo_vegetativo'] = ciclos[:num_veg][mascara[:num_veg]].tolist()
+        datos['ciclo_total'] = ciclos[num_veg:][mascara[num_veg:]].tolist()
         
         # Calcular promedios
         ciclo_veg_prom = np.mean(datos['ciclo_vegetativo']) if datos['ciclo_vegetativo'] else 65
@@ -125,16 +129,24 @@ class ProductionStatistics:
             'num_datos': len(siembras)
         }]
         
-        for dia, indices in sorted(datos_por_dia.items()):
-            indices_filtrados = ProductionStatistics._filtrar_outliers(indices) if len(indices) >= 5 else indices
+        if datos_por_dia:
+            # Un solo filtrado IQR para todos los días (días con menos de 5 datos se conservan)
+            dias = np.array(sorted(datos_por_dia))
+            conteos = np.array([len(datos_por_dia[dia]) for dia in dias])
+            indices = np.concatenate([datos_por_dia[dia] for dia in dias])
+            mascara = filtrar_outliers_iqr_agrupado(indices, np.repeat(dias, conteos))
             
-            if indices_filtrados:
+            inicio = 0
+            for dia, conteo in zip(dias, conteos):
+                fin = inicio + conteo
+                indices_filtrados = indices[inicio:fin][mascara[inicio:fin]]
+                inicio = fin
                 puntos.append({
-                    'dia': dia,
+                    'dia': int(dia),
                     'indice_promedio': round(np.mean(indices_filtrados), 2),
-                    'min_indice': round(min(indices_filtrados), 2),
-                    'max_indice': round(max(indices_filtrados), 2),
-                    'num_datos': len(indices)
+                    'min_indice': round(float(indices_filtrados.min()), 2),
+                    'max_indice': round(float(indices_filtrados.max()), 2),
+                    'num_datos': int(conteo)
                 })
         
         return sorted(puntos, key=lambda p: p['dia'])
@@ -142,16 +154,4 @@ class ProductionStatistics:
     @staticmethod
     def _filtrar_outliers(valores: List[float], factor: float = 1.5) -> List[float]:
         """Filtra outliers usando el método IQR."""
-        if not valores or len(valores) < 5:
-            return valores
-            
-        arr = np.array(valores)
-        q1, q3 = np.percentile(arr, [25, 75])
-        iqr = q3 - q1
-        
-        if iqr == 0:
-            return valores
-            
-        lower = q1 - (factor * iqr)
-        upper = q3 + (factor * iqr)
-        return arr[(arr >= lower) & (arr <= upper)].tolist()
\ No newline at end of file
+        return filtrar_outliers_iqr(valores, factor)
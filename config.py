@@ -29,6 +29,13 @@ class Config:
         'echo_pool': False    # Desactivar echo de pool en producción
     }
     # Configuración de caché
-    CACHE_TYPE = 'SimpleCache'
+    # 'SimpleCache' por proceso; 'FileSystemCache' comparte CACHE_DIR entre workers
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(basedir, 'uploads', 'cache_dashboard'))
+    CACHE_GRAFICOS_DIR = os.environ.get('CACHE_GRAFICOS_DIR', os.path.join(basedir, 'uploads', 'cache_graficos'))
+    # Curvas de la vista completa leídas de acumulado_curva en lugar de los cortes.
+    # Son más rápidas, pero promedian todos los cortes de cada día sin el filtro
+    # IQR de outliers de la curva calculada desde los cortes; por eso es opcional.
+    CURVA_DESDE_ACUMULADO = os.environ.get('CURVA_DESDE_ACUMULADO', '0') == '1'
     SEND_FILE_MAX_AGE_DEFAULT = 43200  # 12 horas en segundos
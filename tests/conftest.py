@@ -0,0 +1,114 @@
+"""
+Fixtures de las pruebas: aplicación con SQLite en memoria y datos mínimos.
+
+La aplicación se construye con la extensión de base de datos pero sin los
+blueprints de create_app, para probar las funciones de datos sin depender
+de plantillas ni de MySQL. Las funciones de MySQL que usan los hooks de
+mantenimiento (DATEDIFF, YEARWEEK...) se registran en cada conexión SQLite.
+"""
+
+from datetime import date, timedelta
+import random
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from app import db
+from app.models import (
+    Documento, Usuario, Flor, Color, FlorColor, Variedad, Bloque, Cama, Lado,
+    BloqueCamaLado, Area, Densidad, Siembra, Corte
+)
+from app.reportes.mantenimiento import reconstruir_resumenes
+
+class TestConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+def _fecha(valor):
+    return date.fromisoformat(valor[:10]) if isinstance(valor, str) else valor
+
+def _registrar_funciones_mysql(conexion, registro):
+    conexion.create_function('datediff', 2, lambda a, b: None if a is None or b is None else (_fecha(a) - _fecha(b)).days)
+    conexion.create_function('week', 2, lambda a, modo: None if a is None else _fecha(a).isocalendar()[1])
+    conexion.create_function('yearweek', 2, lambda a, modo: None if a is None else
+                             _fecha(a).isocalendar()[0] * 100 + _fecha(a).isocalendar()[1])
+    conexion.create_function('greatest', 2, max)
+    conexion.create_function('least', 2, min)
+
+@pytest.fixture
+def app():
+    app = Flask('app')
+    app.config.from_object(TestConfig)
+    db.init_app(app)
+    with app.app_context():
+        event.listen(db.engine, 'connect', _registrar_funciones_mysql)
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        event.remove(db.engine, 'connect', _registrar_funciones_mysql)
+
+@pytest.fixture
+def session(app):
+    return db.session
+
+@pytest.fixture
+def contar_consultas(app):
+    """Lista con las sentencias SQL ejecutadas mientras dura la prueba."""
+    sentencias = []
+
+    def registrar(conexion, cursor, sentencia, parametros, contexto, multiples):
+        sentencias.append(sentencia)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    yield sentencias
+    event.remove(db.engine, 'before_cursor_execute', registrar)
+
+@pytest.fixture
+def produccion(session):
+    """
+    Dos variedades con doce siembras de 50 o 100 plantas y entre tres y seis
+    cortes cada una, entre 45 y 140 días después de la siembra. Los resúmenes
+    se construyen desde cero; desde ahí los mantienen los hooks.
+    """
+    azar = random.Random(7)
+    session.add(Documento(doc_id=1, documento='CC'))
+    usuario = Usuario(nombre_1='Ana', apellido_1='Gómez', cargo='Supervisor', num_doc=1,
+                      documento_id=1, username='ana')
+    flor, color = Flor(flor='CLAVEL', flor_abrev='CL'), Color(color='ROJO', color_abrev='R')
+    session.add_all([usuario, flor, color])
+    session.flush()
+
+    flor_color = FlorColor(flor_id=flor.flor_id, color_id=color.color_id)
+    bloques = [Bloque(bloque_id=1, bloque='01'), Bloque(bloque_id=2, bloque='02')]
+    cama, lado = Cama(cama='1'), Lado(lado='A')
+    session.add_all([flor_color, *bloques, cama, lado])
+    session.flush()
+
+    variedades = [Variedad(variedad=f'V{i}', flor_color_id=flor_color.flor_color_id) for i in (1, 2)]
+    camas = [BloqueCamaLado(bloque_id=b.bloque_id, cama_id=cama.cama_id, lado_id=lado.lado_id) for b in bloques]
+    areas = [Area(siembra='A1', area=10), Area(siembra='A2', area=20)]
+    densidad = Densidad(densidad='D1', valor=5)
+    session.add_all([*variedades, *camas, *areas, densidad])
+    session.flush()
+
+    siembras = []
+    for i in range(12):
+        fecha = date(2024, 1, 1) + timedelta(days=azar.randint(0, 120))
+        siembra = Siembra(bloque_cama_id=camas[i % 2].bloque_cama_id,
+                          variedad_id=variedades[i % 2].variedad_id,
+                          area_id=azar.choice(areas).area_id, densidad_id=densidad.densidad_id,
+                          fecha_siembra=fecha, estado='Activa', usuario_id=usuario.usuario_id)
+        session.add(siembra)
+        session.flush()
+        dias = sorted(azar.sample(range(45, 141), azar.randint(3, 6)))
+        for num, dia in enumerate(dias, start=1):
+            session.add(Corte(siembra_id=siembra.siembra_id, num_corte=num,
+                              fecha_corte=fecha + timedelta(days=dia),
+                              cantidad_tallos=azar.randint(1, 30), usuario_id=usuario.usuario_id))
+        siembras.append(siembra)
+    session.commit()
+    reconstruir_resumenes()
+    return {'usuario': usuario, 'variedades': variedades, 'siembras': siembras, 'areas': areas}
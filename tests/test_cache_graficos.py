@@ -0,0 +1,27 @@
+import os
+import pytest
+from app.reportes.charts import generar_grafico_curvas, generar_grafico_barras
+from app.reportes.cache_graficos import claves_graficos, urls_graficos, ruta_grafico
+
+@pytest.fixture
+def cache(app, tmp_path):
+    app.config['CACHE_GRAFICOS_DIR'] = str(tmp_path)
+    app.config['GRAFICOS_PROCESOS'] = 0
+    return tmp_path
+
+def _png(directorio):
+    return [nombre for nombre in os.listdir(directorio) if nombre.endswith('.png')]
+
+def test_grafico_valido_se_guarda(cache):
+    claves = claves_graficos({'barras': (generar_grafico_barras, (['A', 'B'], [1, 2], 'x', 'y', 't'))})
+    assert os.path.exists(ruta_grafico(claves['barras']))
+    assert _png(cache) == [f"{claves['barras']}.png"]
+
+def test_grafico_de_error_no_se_guarda(app, cache):
+    trabajos = {'curvas': (generar_grafico_curvas, ([],))}
+
+    assert claves_graficos(trabajos) == {}
+    with app.test_request_context():
+        url = urls_graficos(trabajos)['curvas']
+    assert url.startswith('data:image/png;base64,')
+    assert _png(cache) == []
@@ -0,0 +1,92 @@
+from datetime import date
+import pytest
+from app.models import (
+    Documento, Usuario, Flor, Color, FlorColor, Variedad, Bloque, Cama, Lado,
+    BloqueCamaLado, Area, Densidad, Siembra, Corte
+)
+from app.main.dashboard_utils import calculate_statistics
+
+def _filtros(time='todo', year=2024, month=1, week=None, variety_id=None):
+    return {'time': time, 'year': year, 'month': month, 'week': week, 'variety_id': variety_id}
+
+@pytest.fixture
+def datos(session):
+    """
+    Tres siembras con plantas y tallos conocidos:
+
+    - V1, 2024-03-05 (semana ISO 10), Activa, 50 plantas, cortes de 10 y 20 tallos
+    - V1, 2024-07-10, Finalizada, 100 plantas, un corte de 40 tallos
+    - V2, 2023-11-20, Activa, 50 plantas, sin cortes
+    """
+    session.add(Documento(doc_id=1, documento='CC'))
+    usuario = Usuario(nombre_1='Ana', apellido_1='Gómez', cargo='Supervisor', num_doc=1,
+                      documento_id=1, username='ana')
+    flor, color = Flor(flor='CLAVEL', flor_abrev='CL'), Color(color='ROJO', color_abrev='R')
+    session.add_all([usuario, flor, color])
+    session.flush()
+
+    flor_color = FlorColor(flor_id=flor.flor_id, color_id=color.color_id)
+    bloque, cama, lado = Bloque(bloque_id=1, bloque='01'), Cama(cama='1'), Lado(lado='A')
+    session.add_all([flor_color, bloque, cama, lado])
+    session.flush()
+
+    v1 = Variedad(variedad='V1', flor_color_id=flor_color.flor_color_id)
+    v2 = Variedad(variedad='V2', flor_color_id=flor_color.flor_color_id)
+    bloque_cama = BloqueCamaLado(bloque_id=bloque.bloque_id, cama_id=cama.cama_id, lado_id=lado.lado_id)
+    area_pequena, area_grande = Area(siembra='A1', area=10), Area(siembra='A2', area=20)
+    densidad = Densidad(densidad='D1', valor=5)
+    session.add_all([v1, v2, bloque_cama, area_pequena, area_grande, densidad])
+    session.flush()
+
+    def siembra(variedad, fecha, estado, area, tallos):
+        s = Siembra(bloque_cama_id=bloque_cama.bloque_cama_id, variedad_id=variedad.variedad_id,
+                    area_id=area.area_id, densidad_id=densidad.densidad_id, fecha_siembra=fecha,
+                    estado=estado, usuario_id=usuario.usuario_id)
+        session.add(s)
+        session.flush()
+        for num, cantidad in enumerate(tallos, start=1):
+            session.add(Corte(siembra_id=s.siembra_id, num_corte=num, fecha_corte=date(2024, 12, num),
+                              cantidad_tallos=cantidad, usuario_id=usuario.usuario_id))
+
+    siembra(v1, date(2024, 3, 5), 'Activa', area_pequena, [10, 20])
+    siembra(v1, date(2024, 7, 10), 'Finalizada', area_grande, [40])
+    siembra(v2, date(2023, 11, 20), 'Activa', area_pequena, [])
+    session.commit()
+    return {'v1': v1.variedad_id, 'v2': v2.variedad_id}
+
+CASOS = [
+    # (filtros, activas, finalizadas, variedades, promedio de cortes, aprovechamiento, tallos)
+    (_filtros(), 2, 1, 2, 1.0, 35.0, 70),
+    (_filtros(time='year', year=2024), 1, 1, 1, 1.5, 46.67, 70),
+    (_filtros(time='mes', year=2024, month=3), 1, 0, 1, 2.0, 60.0, 30),
+    (_filtros(time='semana', year=2024, week=10), 1, 0, 1, 2.0, 60.0, 30),
+    (_filtros(time='anio', year=2022), 0, 0, 0, 0, 0, 0),
+]
+
+@pytest.mark.parametrize('filtros, activas, finalizadas, variedades, promedio, indice, tallos', CASOS)
+def test_calculate_statistics_una_consulta(datos, contar_consultas, filtros, activas, finalizadas,
+                                           variedades, promedio, indice, tallos):
+    contar_consultas.clear()
+    stats = calculate_statistics(filtros, None)
+
+    assert len(contar_consultas) == 1
+    assert stats == {
+        'active_plantings': activas,
+        'historical_plantings': finalizadas,
+        'total_plantings': activas + finalizadas,
+        'total_varieties': variedades,
+        'avg_cuts': promedio,
+        'utilization_index': indice,
+        'total_stems': tallos,
+        'filters': filtros,
+        'selected_variety': None
+    }
+
+def test_calculate_statistics_filtra_variedad(datos, contar_consultas):
+    filtros = _filtros(variety_id=datos['v2'])
+    contar_consultas.clear()
+    stats = calculate_statistics(filtros, None)
+
+    assert len(contar_consultas) == 1
+    assert (stats['active_plantings'], stats['historical_plantings'], stats['total_varieties']) == (1, 0, 1)
+    assert (stats['avg_cuts'], stats['utilization_index'], stats['total_stems']) == (0.0, 0.0, 0)
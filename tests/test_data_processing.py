@@ -0,0 +1,22 @@
+from app.reportes.data_processing import (
+    obtener_curvas, obtener_datos_curvas, obtener_datos_curvas_acumuladas
+)
+
+def test_curva_por_defecto_desde_cortes_con_filtro_iqr(app, produccion, contar_consultas):
+    variedad_ids = [v.variedad_id for v in produccion['variedades']]
+    contar_consultas.clear()
+    curvas = obtener_curvas(variedad_ids)
+
+    assert [s for s in contar_consultas if 'FROM cortes' in s or 'JOIN cortes' in s]
+    assert curvas == obtener_datos_curvas(variedad_ids)
+
+def test_curva_desde_acumulado_con_opcion(app, produccion, contar_consultas):
+    app.config['CURVA_DESDE_ACUMULADO'] = True
+    variedad_ids = [v.variedad_id for v in produccion['variedades']]
+    contar_consultas.clear()
+    curvas = obtener_curvas(variedad_ids)
+
+    assert not [s for s in contar_consultas if 'FROM cortes' in s or 'JOIN cortes' in s]
+    assert curvas == obtener_datos_curvas_acumuladas(variedad_ids)
+    # Las bandas solo se calculan desde los cortes
+    assert obtener_curvas(variedad_ids, bandas=True) == obtener_datos_curvas(variedad_ids)
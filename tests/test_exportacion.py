@@ -0,0 +1,74 @@
+import csv
+import io
+from datetime import datetime
+import pytest
+from openpyxl import load_workbook
+from app.reportes.exportacion import EXPORTACIONES, generar_csv, escribir_xlsx
+
+TIPOS = list(EXPORTACIONES)
+
+@pytest.fixture
+def esperadas(app, produccion):
+    """Filas de cada exportación leídas directamente de su consulta, con lotes pequeños."""
+    app.config['EXPORTACION_LOTE'] = 7
+    filas = {tipo: [tuple(fila) for fila in EXPORTACIONES[tipo]['consulta']()] for tipo in TIPOS}
+    assert all(len(f) > app.config['EXPORTACION_LOTE'] for f in filas.values())
+    return filas
+
+def _titulos(tipo):
+    return [titulo for titulo, _, _ in EXPORTACIONES[tipo]['columnas']]
+
+@pytest.mark.parametrize('tipo', TIPOS)
+def test_csv_ida_y_vuelta(esperadas, tipo):
+    fragmentos = list(generar_csv(tipo, filas_por_fragmento=5))
+    assert len(fragmentos) > 1
+    texto = ''.join(fragmentos)
+    assert texto.startswith('\ufeff')
+
+    lector = csv.reader(io.StringIO(texto[1:]))
+    assert next(lector) == _titulos(tipo)
+    tipos = [tipo_columna for _, _, tipo_columna in EXPORTACIONES[tipo]['columnas']]
+    leidas = [
+        tuple(
+            None if valor == '' else
+            datetime.strptime(valor, '%d/%m/%Y').date() if tipo_columna == 'fecha' else
+            int(valor) if tipo_columna == 'entero' else valor
+            for valor, tipo_columna in zip(fila, tipos)
+        )
+        for fila in lector
+    ]
+    assert leidas == esperadas[tipo]
+
+@pytest.mark.parametrize('tipo', TIPOS)
+def test_xlsx_ida_y_vuelta(esperadas, tipo):
+    with escribir_xlsx(tipo) as archivo:
+        libro = load_workbook(archivo, read_only=True)
+        hoja = libro[EXPORTACIONES[tipo]['hoja']]
+        filas = list(hoja.iter_rows(values_only=True))
+        libro.close()
+
+    assert list(filas[0]) == _titulos(tipo)
+    leidas = [
+        tuple(valor.date() if isinstance(valor, datetime) else valor for valor in fila)
+        for fila in filas[1:]
+    ]
+    assert leidas == esperadas[tipo]
+
+@pytest.mark.parametrize('formato', ['parquet', 'arrow'])
+@pytest.mark.parametrize('tipo', TIPOS)
+def test_columnar_ida_y_vuelta(esperadas, tipo, formato):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    from app.reportes.exportacion import escribir_columnar, esquema_arrow
+
+    with escribir_columnar(tipo, formato) as archivo:
+        if formato == 'parquet':
+            tabla = pq.read_table(archivo)
+            assert pq.ParquetFile(archivo).metadata.num_row_groups > 1
+        else:
+            tabla = pa.ipc.open_stream(archivo).read_all()
+
+    assert tabla.schema.equals(esquema_arrow(tipo))
+    campos = [campo for _, campo, _ in EXPORTACIONES[tipo]['columnas']]
+    leidas = [tuple(fila[campo] for campo in campos) for fila in tabla.to_pylist()]
+    assert leidas == esperadas[tipo]
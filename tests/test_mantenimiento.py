@@ -0,0 +1,155 @@
+from datetime import date, timedelta
+import pytest
+from app.models import (
+    Variedad, BloqueCamaLado, Siembra, Corte, AcumuladoCurva, ResumenCalidadVariedad,
+    ResumenCurvaVariedad, ResumenSemanal
+)
+from app.reportes.data_processing import obtener_datos_curvas_acumuladas, _resumenes_siembras
+from app.reportes.mantenimiento import reconstruir_resumenes, version_datos
+
+# Tablas mantenidas por los hooks que se comparan con una reconstrucción completa
+TABLAS = [AcumuladoCurva, ResumenCalidadVariedad, ResumenCurvaVariedad, ResumenSemanal]
+
+def _filas(session, modelo):
+    """Filas de una tabla ordenadas, con los reales redondeados."""
+    columnas = modelo.__table__.columns
+    filas = session.query(*columnas).all()
+    return sorted(
+        tuple(round(v, 6) if isinstance(v, float) else v for v in fila) for fila in filas
+    )
+
+def _tablas(session):
+    return {modelo.__tablename__: _filas(session, modelo) for modelo in TABLAS}
+
+def _cortes(siembra):
+    return siembra.cortes.order_by(Corte.num_corte).all()
+
+def _assert_igual_a_reconstruccion(session):
+    mantenidas = _tablas(session)
+    reconstruir_resumenes()
+    assert mantenidas == _tablas(session)
+
+def test_insertar_siembra_y_cortes(produccion, session):
+    siembra = produccion['siembras'][0]
+    nueva = Siembra(bloque_cama_id=siembra.bloque_cama_id, variedad_id=produccion['variedades'][1].variedad_id,
+                    area_id=siembra.area_id, densidad_id=siembra.densidad_id,
+                    fecha_siembra=date(2024, 6, 3), estado='Activa', usuario_id=produccion['usuario'].usuario_id)
+    session.add(nueva)
+    session.flush()
+    for num, dia in enumerate((70, 98, 131), start=1):
+        session.add(Corte(siembra_id=nueva.siembra_id, num_corte=num,
+                          fecha_corte=nueva.fecha_siembra + timedelta(days=dia),
+                          cantidad_tallos=12, usuario_id=produccion['usuario'].usuario_id))
+    # Un corte más sobre una siembra existente, en un día que ya tiene acumulado
+    dia_existente = (_cortes(siembra)[0].fecha_corte - siembra.fecha_siembra).days
+    session.add(Corte(siembra_id=siembra.siembra_id, num_corte=len(_cortes(siembra)) + 1,
+                      fecha_corte=siembra.fecha_siembra + timedelta(days=dia_existente),
+                      cantidad_tallos=5, usuario_id=produccion['usuario'].usuario_id))
+    session.commit()
+
+    _assert_igual_a_reconstruccion(session)
+
+def test_editar_corte_mueve_dia_y_tallos(produccion, session):
+    corte = _cortes(produccion['siembras'][3])[1]
+    corte.fecha_corte += timedelta(days=4)
+    corte.cantidad_tallos += 7
+    session.commit()
+
+    _assert_igual_a_reconstruccion(session)
+
+def test_editar_siembra_cambia_variedad_fecha_y_area(produccion, session):
+    siembra = produccion['siembras'][4]
+    siembra.variedad_id = produccion['variedades'][1].variedad_id
+    siembra.fecha_siembra -= timedelta(days=10)
+    siembra.area_id = next(a.area_id for a in produccion['areas'] if a.area_id != siembra.area_id)
+    session.commit()
+
+    _assert_igual_a_reconstruccion(session)
+
+def test_eliminar_corte_y_siembra(produccion, session):
+    session.delete(_cortes(produccion['siembras'][5])[-1])
+    session.commit()
+    _assert_igual_a_reconstruccion(session)
+
+    siembra = produccion['siembras'][6]
+    for corte in _cortes(siembra):
+        session.delete(corte)
+    session.delete(siembra)
+    session.commit()
+    _assert_igual_a_reconstruccion(session)
+
+def test_variedad_nueva_en_varios_flush(produccion, session):
+    base = produccion['siembras'][0]
+    variedad = Variedad(variedad='V3', flor_color_id=produccion['variedades'][0].flor_color_id)
+    session.add(variedad)
+    session.flush()
+    siembra = Siembra(bloque_cama_id=base.bloque_cama_id, variedad_id=variedad.variedad_id,
+                      area_id=base.area_id, densidad_id=base.densidad_id,
+                      fecha_siembra=date(2024, 4, 1), estado='Activa', usuario_id=produccion['usuario'].usuario_id)
+    session.add(siembra)
+    session.flush()
+    # Primer corte en otro flush: la fila de la variedad ya existe y solo se suma
+    for num, (dia, tallos) in enumerate(((64, 3), (90, 45)), start=1):
+        session.add(Corte(siembra_id=siembra.siembra_id, num_corte=num,
+                          fecha_corte=siembra.fecha_siembra + timedelta(days=dia),
+                          cantidad_tallos=tallos, usuario_id=produccion['usuario'].usuario_id))
+        session.flush()
+    session.commit()
+
+    _assert_igual_a_reconstruccion(session)
+
+def test_resumen_semanal_excluye_camas_sin_bloque(produccion, session):
+    sin_bloque = BloqueCamaLado(bloque_id=None, cama_id=None, lado_id=None)
+    session.add(sin_bloque)
+    session.flush()
+    siembra = produccion['siembras'][0]
+    huerfana = Siembra(bloque_cama_id=sin_bloque.bloque_cama_id, variedad_id=siembra.variedad_id,
+                       area_id=siembra.area_id, densidad_id=siembra.densidad_id,
+                       fecha_siembra=date(2024, 5, 6), estado='Activa', usuario_id=produccion['usuario'].usuario_id)
+    session.add(huerfana)
+    session.flush()
+    session.add(Corte(siembra_id=huerfana.siembra_id, num_corte=1, fecha_corte=date(2024, 7, 22),
+                      cantidad_tallos=9, usuario_id=produccion['usuario'].usuario_id))
+    session.commit()
+
+    assert not session.query(ResumenSemanal).filter(ResumenSemanal.bloque_id.is_(None)).count()
+    _assert_igual_a_reconstruccion(session)
+
+def test_version_avanza_una_vez_por_transaccion(produccion, session):
+    inicial = version_datos()
+    assert inicial > 0
+    corte = _cortes(produccion['siembras'][2])[0]
+    corte.cantidad_tallos += 1
+    session.flush()
+    corte.cantidad_tallos += 1
+    session.commit()
+    assert version_datos() == inicial + 1
+
+    corte.cantidad_tallos += 1
+    session.rollback()
+    assert version_datos() == inicial + 1
+
+def test_curvas_acumuladas_no_leen_cortes(produccion, session, contar_consultas):
+    variedad_ids = [v.variedad_id for v in produccion['variedades']]
+    contar_consultas.clear()
+    curvas = obtener_datos_curvas_acumuladas(variedad_ids)
+
+    assert not [s for s in contar_consultas if 'FROM cortes' in s or 'JOIN cortes' in s]
+    # Los ciclos y totales coinciden con los calculados desde los cortes
+    desde_cortes = _resumenes_siembras(variedad_ids)
+    for variedad_id in variedad_ids:
+        resumen = {k: v for k, v in curvas[variedad_id].items() if k != 'puntos_curva'}
+        assert resumen == pytest.approx(desde_cortes[variedad_id])
+
+def test_umbral_de_indice_alto_desde_la_configuracion(app, produccion, session):
+    app.config['INDICE_ALTO_DIAGNOSTICO'] = 0
+    reconstruir_resumenes()
+    for fila in session.query(ResumenCalidadVariedad):
+        assert fila.num_cortes_indice_alto == fila.num_cortes
+
+    siembra = produccion['siembras'][1]
+    session.add(Corte(siembra_id=siembra.siembra_id, num_corte=len(_cortes(siembra)) + 1,
+                      fecha_corte=siembra.fecha_siembra + timedelta(days=120),
+                      cantidad_tallos=1, usuario_id=produccion['usuario'].usuario_id))
+    session.commit()
+    _assert_igual_a_reconstruccion(session)
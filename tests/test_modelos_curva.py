@@ -0,0 +1,40 @@
+from datetime import timedelta
+from app.models import AcumuladoCurva, ModeloCurva, Corte
+from app.reportes import modelos_curva
+from app.reportes.modelos_curva import huellas_datos, obtener_modelos
+
+def test_huella_sin_acumulado_cambia_con_los_cortes(produccion, session):
+    variedad_id = produccion['variedades'][0].variedad_id
+    session.query(AcumuladoCurva).delete()
+    session.commit()
+    antes = huellas_datos([variedad_id])[variedad_id]
+
+    siembra = produccion['siembras'][0]
+    session.add(Corte(siembra_id=siembra.siembra_id, num_corte=99,
+                      fecha_corte=siembra.fecha_siembra + timedelta(days=120),
+                      cantidad_tallos=4, usuario_id=produccion['usuario'].usuario_id))
+    session.commit()
+    # El hook ya sumó el corte al acumulado: se vacía de nuevo como si no se hubiera poblado
+    session.query(AcumuladoCurva).delete()
+    session.commit()
+
+    assert huellas_datos([variedad_id])[variedad_id] != antes
+
+def test_ajustes_de_las_vistas_se_guardan(produccion, session, monkeypatch):
+    variedad_ids = [v.variedad_id for v in produccion['variedades']]
+    modelos_curva._ajustes_en_memoria.clear()
+    curvas = obtener_modelos(variedad_ids)
+
+    huellas = huellas_datos(variedad_ids)
+    guardados = {m.variedad_id: m.version_datos for m in ModeloCurva.query}
+    assert guardados == huellas
+
+    # Otro proceso (sin ajustes en memoria) los reutiliza sin volver a ajustar
+    modelos_curva._ajustes_en_memoria.clear()
+    def sin_ajuste(*args, **kwargs):
+        raise AssertionError('no debería volver a ajustar')
+    monkeypatch.setattr(modelos_curva, 'ajustar_modelo', sin_ajuste)
+    reutilizadas = obtener_modelos(variedad_ids)
+    for variedad_id in variedad_ids:
+        assert reutilizadas[variedad_id].ciclo_total == curvas[variedad_id].ciclo_total
+        assert reutilizadas[variedad_id].metodo == curvas[variedad_id].metodo
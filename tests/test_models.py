@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+import pytest
+from app.models import Area, Densidad, Siembra, Corte
+
+@pytest.fixture
+def siembras(produccion, session):
+    """Las siembras de `produccion` más una finalizada, una sin cortes y una con área y densidad decimales."""
+    base = produccion['siembras'][0]
+    area, densidad = Area(siembra='A3', area=10.5), Densidad(densidad='D2', valor=5.5)
+    session.add_all([area, densidad])
+    session.flush()
+
+    def siembra(**valores):
+        valores = {'area_id': base.area_id, 'densidad_id': base.densidad_id, 'estado': 'Activa', **valores}
+        nueva = Siembra(bloque_cama_id=base.bloque_cama_id, variedad_id=base.variedad_id,
+                        usuario_id=produccion['usuario'].usuario_id, **valores)
+        session.add(nueva)
+        session.flush()
+        return nueva
+
+    finalizada = siembra(fecha_siembra=date(2024, 2, 1), fecha_fin_corte=date(2024, 6, 15), estado='Finalizada')
+    session.add(Corte(siembra_id=finalizada.siembra_id, num_corte=1, fecha_corte=date(2024, 5, 1),
+                      cantidad_tallos=8, usuario_id=produccion['usuario'].usuario_id))
+    siembra(fecha_siembra=date.today() - timedelta(days=20))
+    decimal = siembra(fecha_siembra=date(2024, 3, 4), area_id=area.area_id, densidad_id=densidad.densidad_id)
+    session.add(Corte(siembra_id=decimal.siembra_id, num_corte=1, fecha_corte=date(2024, 5, 20),
+                      cantidad_tallos=13, usuario_id=produccion['usuario'].usuario_id))
+    session.commit()
+    return Siembra.query.order_by(Siembra.siembra_id).all()
+
+def test_expresiones_sql_igual_a_propiedades(siembras, session):
+    filas = session.query(
+        Siembra.siembra_id,
+        Siembra.dias_ciclo.label('dias_ciclo'),
+        Siembra.total_plantas.label('total_plantas'),
+        Siembra.total_tallos.label('total_tallos'),
+        Siembra.indice_aprovechamiento.label('indice_aprovechamiento')
+    ).order_by(Siembra.siembra_id).all()
+
+    assert [f.siembra_id for f in filas] == [s.siembra_id for s in siembras]
+    for fila, siembra in zip(filas, siembras):
+        assert fila.dias_ciclo == siembra.dias_ciclo
+        assert fila.total_plantas == siembra.total_plantas
+        assert fila.total_tallos == siembra.total_tallos
+        assert fila.indice_aprovechamiento == pytest.approx(siembra.indice_aprovechamiento)
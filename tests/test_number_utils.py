@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from app.utils.number_utils import filtrar_outliers_iqr, filtrar_outliers_iqr_agrupado, percentiles_por_segmento
+
+def _grupos_aleatorios(semilla):
+    """Valores con outliers en grupos de 1 a 40 elementos, desordenados."""
+    azar = np.random.default_rng(semilla)
+    conteos = azar.integers(1, 41, size=30)
+    grupos = np.repeat(np.arange(len(conteos)), conteos)
+    valores = azar.normal(50, 10, size=len(grupos))
+    valores[azar.random(len(grupos)) < 0.1] *= 4
+    # Grupos con valores repetidos (IQR nulo)
+    valores[grupos == 3] = 7.0
+    orden = azar.permutation(len(grupos))
+    return valores[orden], grupos[orden]
+
+def _mascara_esperada(valores, grupos, factor=1.5):
+    mascara = np.ones(len(valores), dtype=bool)
+    for grupo in np.unique(grupos):
+        en_grupo = grupos == grupo
+        datos = valores[en_grupo]
+        if len(datos) < 5:
+            continue
+        q1, q3 = np.percentile(datos, [25, 75], method='linear')
+        iqr = q3 - q1
+        if iqr == 0:
+            continue
+        mascara[en_grupo] = (datos >= q1 - factor * iqr) & (datos <= q3 + factor * iqr)
+    return mascara
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_filtrar_outliers_iqr_agrupado_igual_a_percentil_por_grupo(semilla):
+    valores, grupos = _grupos_aleatorios(semilla)
+    assert np.array_equal(filtrar_outliers_iqr_agrupado(valores, grupos), _mascara_esperada(valores, grupos))
+    assert np.array_equal(filtrar_outliers_iqr_agrupado(valores, grupos, factor=3),
+                          _mascara_esperada(valores, grupos, factor=3))
+
+def test_filtrar_outliers_iqr_un_grupo():
+    valores = [10, 11, 12, 13, 14, 100]
+    assert filtrar_outliers_iqr(valores) == [10, 11, 12, 13, 14]
+    assert filtrar_outliers_iqr(valores[:4]) == valores[:4]
+    assert filtrar_outliers_iqr_agrupado([], []).shape == (0,)
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_percentiles_por_segmento_igual_a_percentil_por_grupo(semilla):
+    valores, grupos = _grupos_aleatorios(semilla)
+    orden = np.lexsort((valores, grupos))
+    valores_ordenados, grupos_ordenados = valores[orden], grupos[orden]
+    inicios = np.flatnonzero(np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]])
+    conteos = np.diff(np.r_[inicios, len(valores)])
+    percentiles = [0, 10, 25, 50, 75, 90, 100]
+
+    resultado = percentiles_por_segmento(valores_ordenados, inicios, conteos, percentiles)
+
+    for segmento, grupo in enumerate(grupos_ordenados[inicios]):
+        esperados = np.percentile(valores[grupos == grupo], percentiles, method='linear')
+        assert np.allclose([por_percentil[segmento] for por_percentil in resultado], esperados)
@@ -0,0 +1,51 @@
+from datetime import timedelta
+import numpy as np
+import pytest
+from app.models import Area
+from app.reportes.snapshot import snapshot, ProduccionSnapshot
+
+def _cortes(siembra):
+    return siembra.cortes.all()
+
+@pytest.fixture
+def estado(produccion):
+    snapshot.invalidar()
+    yield snapshot.refrescar()
+    snapshot.invalidar()
+
+def _assert_igual_a_reconstruccion(estado):
+    completo = ProduccionSnapshot().refrescar()
+    for nombre, columna in completo.columnas().items():
+        assert np.array_equal(getattr(estado, nombre), columna), nombre
+    assert np.array_equal(estado.c_dia, completo.c_dia)
+
+def test_edicion_relee_solo_las_filas_cambiadas(estado, produccion, session):
+    siembra = produccion['siembras'][1]
+    siembra.fecha_siembra -= timedelta(days=3)
+    corte = _cortes(produccion['siembras'][2])[0]
+    corte.cantidad_tallos += 5
+    session.delete(_cortes(produccion['siembras'][3])[-1])
+    session.commit()
+
+    nuevo = snapshot.refrescar()
+    assert nuevo is not estado
+    # Recarga parcial: la instantánea no se reconstruyó
+    assert nuevo.construida_en == estado.construida_en
+    _assert_igual_a_reconstruccion(nuevo)
+
+def test_edicion_revertida_no_marca_cambios(estado, produccion, session):
+    corte = _cortes(produccion['siembras'][2])[0]
+    corte.cantidad_tallos += 5
+    session.flush()
+    session.rollback()
+
+    assert snapshot.refrescar() is estado
+
+def test_edicion_de_area_reconstruye(estado, produccion, session):
+    area = session.get(Area, produccion['areas'][0].area_id)
+    area.area = 12
+    session.commit()
+
+    nuevo = snapshot.refrescar()
+    assert nuevo.construida_en > estado.construida_en
+    _assert_igual_a_reconstruccion(nuevo)